@@ -0,0 +1,359 @@
+# backend/alert_fanout.py
+
+import os
+import time
+import bisect
+import logging
+import threading
+from collections import OrderedDict, deque
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger("ai_ml_cyberdefense.alert_fanout")
+logger.setLevel(logging.INFO)
+
+ALERT_FLUSH_INTERVAL = float(os.environ.get("ALERT_FLUSH_INTERVAL", 0.15))   # seconds between alerts_batch
+ALERT_RING_SIZE = int(os.environ.get("ALERT_RING_SIZE", 8192))               # pending events before the oldest drop
+ALERT_CLIENT_QUEUE = int(os.environ.get("ALERT_CLIENT_QUEUE", 512))          # per-socket backlog (oldest dropped)
+ALERT_BATCH_MAX = int(os.environ.get("ALERT_BATCH_MAX", 200))                # items per socket per flush
+
+
+def alert_source(payload: Dict[str, Any]) -> Optional[str]:
+    meta = payload.get("meta")
+    if isinstance(meta, dict) and meta.get("src_ip"):
+        return meta["src_ip"]
+    return payload.get("src_ip") or payload.get("ip") or payload.get("session_id")
+
+
+def alert_prob(payload: Dict[str, Any]) -> Optional[float]:
+    for k in ("prob", "prob_attack", "p"):
+        v = payload.get(k)
+        if isinstance(v, (int, float)):
+            return float(v)
+    pred = payload.get("prediction")
+    if isinstance(pred, dict):
+        for k in ("bot_prob", "confidence"):
+            v = pred.get(k)
+            if isinstance(v, (int, float)):
+                return float(v)
+    return None
+
+
+def alert_model(event: str, payload: Dict[str, Any]) -> str:
+    return payload.get("type") or ("mouse" if event == "mouse_prediction" else "external")
+
+
+def alert_label(payload: Dict[str, Any]) -> Optional[str]:
+    label = payload.get("label")
+    if label is None and isinstance(payload.get("prediction"), dict):
+        label = payload["prediction"].get("label")
+    return str(label).lower() if label is not None else None
+
+
+class AlertFilter:
+    """What a dashboard socket wants: any of `models`, prob >= `min_prob`, source
+    starting with `src_prefix`, any of `labels`. None / empty means "don't care"."""
+
+    __slots__ = ("models", "min_prob", "src_prefix", "labels", "key")
+
+    MAX_VALUES = 16
+
+    def __init__(self, models: Optional[Iterable[str]] = None, min_prob: Optional[float] = None,
+                 src_prefix: Optional[str] = None, labels: Optional[Iterable[str]] = None):
+        self.models: FrozenSet[str] = frozenset(models or ())
+        self.min_prob = float(min_prob) if min_prob is not None else None
+        self.src_prefix = src_prefix or ""
+        self.labels: FrozenSet[str] = frozenset(str(l).lower() for l in (labels or ()))
+        self.key = (self.models, self.min_prob, self.src_prefix, self.labels)
+
+    @classmethod
+    def from_request(cls, data) -> "AlertFilter":
+        """Validate a client's subscribe payload; raises ValueError."""
+        if data is None:
+            data = {}
+        if not isinstance(data, dict):
+            raise ValueError("subscription must be an object")
+
+        def _names(v, field):
+            if v is None:
+                return []
+            if isinstance(v, str):
+                v = [v]
+            if not isinstance(v, (list, tuple)) or len(v) > cls.MAX_VALUES or not all(isinstance(x, str) and 0 < len(x) <= 64 for x in v):
+                raise ValueError("%s must be a name or a list of at most %d names" % (field, cls.MAX_VALUES))
+            return v
+
+        min_prob = data.get("min_prob")
+        if min_prob is not None:
+            if isinstance(min_prob, bool) or not isinstance(min_prob, (int, float)) or not 0.0 <= min_prob <= 1.0:
+                raise ValueError("min_prob must be a number in [0, 1]")
+        src_prefix = data.get("src_prefix")
+        if src_prefix is not None and (not isinstance(src_prefix, str) or len(src_prefix) > 64):
+            raise ValueError("src_prefix must be a string")
+        return cls(_names(data.get("models", data.get("model")), "models"), min_prob, src_prefix,
+                   _names(data.get("labels", data.get("label")), "labels"))
+
+    def accepts(self, prob: Optional[float], label: Optional[str]) -> bool:
+        # model and source prefix are matched by the index; these are checked per group
+        if self.min_prob is not None and (prob is None or prob < self.min_prob):
+            return False
+        if self.labels and label not in self.labels:
+            return False
+        return True
+
+    def to_dict(self) -> dict:
+        return {"models": sorted(self.models), "min_prob": self.min_prob, "src_prefix": self.src_prefix,
+                "labels": sorted(self.labels)}
+
+
+class _Group:
+    __slots__ = ("flt", "sids")
+
+    def __init__(self, flt: AlertFilter):
+        self.flt = flt
+        self.sids: Set[str] = set()
+
+
+class SubscriptionIndex:
+    """Sockets grouped by identical filter, indexed by (model, source prefix).
+
+    Matching an alert probes (model, p) and (any model, p) for p in the alert source's
+    prefixes of the lengths actually subscribed to - a few dict lookups regardless of
+    how many sockets are subscribed. Each probe yields groups ordered by min_prob, so
+    the scan stops at the first threshold above the alert's prob; labels are checked
+    once per remaining group, never once per socket.
+    """
+
+    def __init__(self):
+        self._groups: Dict[tuple, _Group] = {}
+        self._by_sid: Dict[str, tuple] = {}
+        # (model or None, src_prefix) -> ([min_prob ascending], [filter key in the same order])
+        self._index: Dict[Tuple[Optional[str], str], Tuple[List[float], List[tuple]]] = {}
+        self._prefix_lens: Dict[int, int] = {}     # prefix length -> groups using it
+        self._lens: List[int] = []
+
+    def __len__(self):
+        return len(self._by_sid)
+
+    def _index_keys(self, flt: AlertFilter):
+        return [(m, flt.src_prefix) for m in flt.models] if flt.models else [(None, flt.src_prefix)]
+
+    def add(self, sid: str, flt: AlertFilter):
+        self.remove(sid)
+        group = self._groups.get(flt.key)
+        if group is None:
+            group = self._groups[flt.key] = _Group(flt)
+            t = flt.min_prob or 0.0
+            for k in self._index_keys(flt):
+                thresholds, keys = self._index.setdefault(k, ([], []))
+                i = bisect.bisect_right(thresholds, t)
+                thresholds.insert(i, t)
+                keys.insert(i, flt.key)
+            n = len(flt.src_prefix)
+            self._prefix_lens[n] = self._prefix_lens.get(n, 0) + 1
+            self._lens = sorted(self._prefix_lens)
+        group.sids.add(sid)
+        self._by_sid[sid] = flt.key
+
+    def remove(self, sid: str):
+        key = self._by_sid.pop(sid, None)
+        if key is None:
+            return
+        group = self._groups[key]
+        group.sids.discard(sid)
+        if group.sids:
+            return
+        del self._groups[key]
+        for k in self._index_keys(group.flt):
+            entry = self._index.get(k)
+            if entry is not None:
+                i = entry[1].index(key)
+                del entry[0][i], entry[1][i]
+                if not entry[1]:
+                    del self._index[k]
+        n = len(group.flt.src_prefix)
+        self._prefix_lens[n] -= 1
+        if not self._prefix_lens[n]:
+            del self._prefix_lens[n]
+            self._lens = sorted(self._prefix_lens)
+
+    def filter_of(self, sid: str) -> Optional[AlertFilter]:
+        key = self._by_sid.get(sid)
+        return self._groups[key].flt if key is not None else None
+
+    def match(self, model: str, src: Optional[str], prob: Optional[float], label: Optional[str]) -> Set[str]:
+        src = src or ""
+        index = self._index
+        out: Set[str] = set()
+        for n in self._lens:
+            if n > len(src):
+                break
+            p = src[:n]
+            for m in (model, None):
+                entry = index.get((m, p))
+                if entry is None:
+                    continue
+                thresholds, keys = entry
+                # groups with min_prob <= prob are a prefix of the list
+                end = bisect.bisect_right(thresholds, prob if prob is not None else 0.0)
+                for key in keys[:end]:
+                    group = self._groups[key]
+                    if group.flt.accepts(prob, label):
+                        out |= group.sids
+        return out
+
+
+class _Client:
+    __slots__ = ("queue", "dropped")
+
+    def __init__(self, maxlen: int):
+        self.queue = deque(maxlen=maxlen)
+        self.dropped = 0
+
+
+class AlertFanout:
+    """Coalesced, rate-limited Socket.IO delivery of alerts to dashboards.
+
+    publish() only appends to a bounded ring, so detection code never waits on socket
+    writes. A background task drains the ring every `interval` seconds, merges events
+    with the same (event, model, source, label) into one counted summary, queues the summaries
+    per connected socket (bounded; the oldest are dropped when a client falls behind)
+    and sends each socket one `alerts_batch` of at most `batch_max` items. Each summary
+    goes only to the sockets whose subscription (SubscriptionIndex) matches it; a
+    socket that never subscribed gets everything.
+
+
+        {"ts": ..., "dropped": n, "items": [{"event": "new_alert", "model": ...,
+          "src": ..., "label": ..., "count": k, "first_ts": ..., "last_ts": ..., "max_prob": ...,
+          "payload": <payload that had max_prob (the latest one if none had a prob)>}, ...]}
+
+    The label is part of the merge key so a label subscription is matched against
+    what each merged event actually said, and min_prob against a payload that has it.
+    """
+
+    def __init__(self, socketio, interval: float = ALERT_FLUSH_INTERVAL, ring_size: int = ALERT_RING_SIZE,
+                 queue_max: int = ALERT_CLIENT_QUEUE, batch_max: int = ALERT_BATCH_MAX):
+        self.socketio = socketio
+        self.interval = interval
+        self.queue_max = queue_max
+        self.batch_max = batch_max
+        self._ring = deque(maxlen=ring_size)
+        self._clients: Dict[str, _Client] = {}
+        self._subs = SubscriptionIndex()
+        self._lock = threading.Lock()
+        self._task_pid = None
+        self.published = 0
+        self.ring_dropped = 0
+        self.batches = 0
+
+    # ---- producers ----
+    def publish(self, event: str, payload: Dict[str, Any]):
+        with self._lock:
+            if len(self._ring) == self._ring.maxlen:
+                self.ring_dropped += 1
+            self._ring.append((event, payload, time.time()))
+            self.published += 1
+        self._ensure_task()
+
+    # ---- sockets ----
+    def add_client(self, sid: str, flt: Optional[AlertFilter] = None):
+        with self._lock:
+            self._clients[sid] = _Client(self.queue_max)
+            self._subs.add(sid, flt or AlertFilter())
+        self._ensure_task()
+
+    def subscribe(self, sid: str, flt: AlertFilter):
+        with self._lock:
+            if sid not in self._clients:
+                self._clients[sid] = _Client(self.queue_max)
+            self._subs.add(sid, flt)
+        self._ensure_task()
+
+    def unsubscribe(self, sid: str):
+        """Stop alerts to `sid` (the socket stays connected; subscribe again to resume)."""
+        with self._lock:
+            self._subs.remove(sid)
+            client = self._clients.get(sid)
+            if client is not None:
+                client.queue.clear()
+
+    def remove_client(self, sid: str):
+        with self._lock:
+            self._clients.pop(sid, None)
+            self._subs.remove(sid)
+
+    # ---- flushing ----
+    def _ensure_task(self):
+        # started lazily (and again after a fork) so a preloading master runs no loop
+        if self._task_pid == os.getpid():
+            return
+        with self._lock:
+            if self._task_pid == os.getpid():
+                return
+            self._task_pid = os.getpid()
+        self.socketio.start_background_task(self._run)
+
+    def _run(self):
+        while True:
+            self.socketio.sleep(self.interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.warning("alert fan-out flush failed: %s", e)
+
+    @staticmethod
+    def coalesce(events) -> list:
+        merged = OrderedDict()
+        for event, payload, ts in events:
+            model = alert_model(event, payload)
+            src = alert_source(payload)
+            label = alert_label(payload)
+            key = (event, model, src, label)
+            prob = alert_prob(payload)
+            item = merged.get(key)
+            if item is None:
+                merged[key] = {"event": event, "model": model, "src": src, "label": label, "count": 1,
+                               "first_ts": ts, "last_ts": ts, "max_prob": prob, "payload": payload}
+            else:
+                item["count"] += 1
+                item["last_ts"] = ts
+                if prob is not None and (item["max_prob"] is None or prob >= item["max_prob"]):
+                    item["max_prob"] = prob
+                    item["payload"] = payload
+                elif item["max_prob"] is None:
+                    item["payload"] = payload
+        return list(merged.values())
+
+    def flush(self) -> int:
+        with self._lock:
+            events = list(self._ring)
+            self._ring.clear()
+        items = self.coalesce(events) if events else []
+        sent = 0
+        now = time.time()
+        with self._lock:
+            clients = self._clients
+            for item in items:
+                for sid in self._subs.match(item["model"], item["src"], item["max_prob"], item["label"]):
+                    client = clients.get(sid)
+                    if client is None:
+                        continue
+                    if len(client.queue) == client.queue.maxlen:
+                        client.dropped += 1
+                    client.queue.append(item)
+            clients = list(clients.items())
+        for sid, client in clients:
+            q = client.queue
+            if not q:
+                continue
+            n = min(len(q), self.batch_max)
+            batch = [q.popleft() for _ in range(n)]
+            self.socketio.emit("alerts_batch", {"ts": now, "dropped": client.dropped, "items": batch}, to=sid)
+            client.dropped = 0
+            sent += 1
+        if sent:
+            self.batches += sent
+        return sent
+
+    def stats(self) -> dict:
+        return {"clients": len(self._clients), "subscribed": len(self._subs), "pending": len(self._ring), "published": self.published,
+                "ring_dropped": self.ring_dropped, "batches": self.batches}
@@ -0,0 +1,95 @@
+# backend/alert_ring.py
+
+import time
+import threading
+from array import array
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+
+def iso_to_ts(value: str) -> float:
+    """ISO-8601 -> epoch seconds; naive values are UTC (what datetime.utcnow() produced)."""
+    dt = datetime.fromisoformat(value)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+class AlertRing:
+    """Fixed-capacity ring of alerts ordered by a numeric timestamp.
+
+    Slots are preallocated, so memory stays flat however long the process runs: once
+    full, each append overwrites the oldest alert. Timestamps are kept non-decreasing
+    (a clock step backwards is clamped to the previous value), which lets since() find
+    its start with a binary search over the logical order: O(log n + limit).
+    """
+
+    def __init__(self, capacity: int = 10000):
+        self.capacity = max(1, int(capacity))
+        self._ts = array("d", bytes(8 * self.capacity))
+        self._items: List[Optional[Dict[str, Any]]] = [None] * self.capacity
+        self._start = 0     # physical slot of the oldest alert
+        self._count = 0
+        self._seq = 0       # alerts ever appended; also the id of the newest one
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._count
+
+    def append(self, alert: Dict[str, Any], ts: Optional[float] = None, fill: bool = True) -> Dict[str, Any]:
+        """Store `alert`; with `fill`, set "id" and "timestamp" (ISO, UTC) when they are unset."""
+        if ts is None:
+            ts = time.time()
+        with self._lock:
+            if self._count:
+                last = self._ts[(self._start + self._count - 1) % self.capacity]
+                if ts < last:
+                    ts = last
+            self._seq += 1
+            if fill:
+                if alert.get("id") is None:
+                    alert["id"] = str(self._seq)
+                if not alert.get("timestamp"):
+                    alert["timestamp"] = datetime.utcfromtimestamp(ts).isoformat()
+            if self._count < self.capacity:
+                slot = (self._start + self._count) % self.capacity
+                self._count += 1
+            else:
+                slot = self._start
+                self._start = (self._start + 1) % self.capacity
+            self._ts[slot] = ts
+            self._items[slot] = alert
+        return alert
+
+    def _lower_bound(self, ts: float) -> int:
+        # first logical index whose timestamp is >= ts
+        lo, hi = 0, self._count
+        cap, start, tss = self.capacity, self._start, self._ts
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if tss[(start + mid) % cap] < ts:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def oldest_ts(self) -> Optional[float]:
+        with self._lock:
+            return self._ts[self._start] if self._count else None
+
+    def latest(self, limit: int, since: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Newest-first alerts with timestamp >= since, at most `limit` of them."""
+        if limit <= 0:
+            return []
+        with self._lock:
+            n = self._count
+            lo = self._lower_bound(since) if since is not None else 0
+            lo = max(lo, n - limit)
+            cap, start, items = self.capacity, self._start, self._items
+            return [items[(start + i) % cap] for i in range(n - 1, lo - 1, -1)]
+
+    def clear(self):
+        with self._lock:
+            self._items = [None] * self.capacity
+            self._start = 0
+            self._count = 0
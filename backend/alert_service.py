@@ -0,0 +1,220 @@
+# backend/alert_service.py
+
+import os
+import time
+import logging
+import threading
+from collections import Counter, OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from backend.alert_ring import AlertRing
+from backend.db import insert_alert, get_alerts_before, get_alerts_after
+
+logger = logging.getLogger("ai_ml_cyberdefense.alert_service")
+logger.setLevel(logging.INFO)
+
+ALERT_HOT_SIZE = int(os.environ.get("ALERT_HOT_SIZE", 5000))               # alerts kept in memory
+ALERT_BUCKET_MINUTES = int(os.environ.get("ALERT_BUCKET_MINUTES", 60))     # per-minute counts kept
+ALERT_SYNC_INTERVAL = float(os.environ.get("ALERT_SYNC_INTERVAL", 2.0))    # tail other workers' inserts; 0 = off
+
+
+def _created_ts(alert: Dict[str, Any]) -> float:
+    try:
+        return datetime.fromisoformat(alert["created_at"]).replace(tzinfo=timezone.utc).timestamp()
+    except Exception:
+        return time.time()
+
+
+def _presentable(alert: Dict[str, Any]) -> Dict[str, Any]:
+    # the dashboard list renders message/timestamp; DB rows carry atype/label/created_at
+    meta = alert.get("meta") if isinstance(alert.get("meta"), dict) else {}
+    alert.setdefault("timestamp", alert.get("created_at"))
+    alert.setdefault("message", meta.get("message") or "%s: %s" % (alert.get("atype"), alert.get("label")))
+    return alert
+
+
+class AlertService:
+    """One read/write path for alerts: a hot in-memory tier written through to the DB.
+
+    record() inserts into the `alerts` table and appends the row to an AlertRing of the
+    last `hot_size` alerts, plus per-minute counts per alert type. Reads of recent
+    windows are answered from the ring; only ranges older than what it covers go to
+    the DB, as keyset queries on the primary key (id < before_id), never OFFSET.
+
+    The ring covers every alert newer than `covered_from`: all of them after warm() if
+    the table held fewer than `hot_size` rows, else the oldest retained one. With
+    several workers, start() tails the table (id > last seen) so alerts inserted by
+    the others reach this worker's ring too - one indexed query per interval instead
+    of one per dashboard poll.
+    """
+
+    def __init__(self, hot_size: int = ALERT_HOT_SIZE, bucket_minutes: int = ALERT_BUCKET_MINUTES):
+        self.hot = AlertRing(hot_size)
+        self.bucket_minutes = bucket_minutes
+        self._buckets = OrderedDict()       # minute start (epoch s) -> Counter(atype)
+        self._covered_from = time.time()    # until warm() says otherwise: only what we saw
+        self._last_id = 0                   # highest DB id seen by warm()/sync()
+        self._own_ids = set()               # ids we inserted since the last sync (skip on tail)
+        self._tailing = False               # only then is _own_ids ever drained
+        self._warmed = False
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.db_errors = 0
+
+    # ---- writes ----
+    def _remember(self, alert: Dict[str, Any], ts: float):
+        self.hot.append(_presentable(alert), ts, fill=False)
+        minute = int(ts // 60) * 60
+        with self._lock:
+            c = self._buckets.get(minute)
+            if c is None:
+                c = self._buckets[minute] = Counter()
+                while len(self._buckets) > self.bucket_minutes:
+                    self._buckets.popitem(last=False)
+            c[alert.get("atype")] += 1
+            oldest = self.hot.oldest_ts()
+            if len(self.hot) == self.hot.capacity and oldest is not None and oldest > self._covered_from:
+                self._covered_from = oldest
+
+    def record(self, atype: str, score: float, label: str, src_ip: Optional[str] = None,
+               dst_ip: Optional[str] = None, meta: Optional[Dict] = None) -> Dict[str, Any]:
+        """insert_alert() + hot tier. A DB failure is logged and the alert is kept in memory only."""
+        try:
+            alert = insert_alert(atype, score, label, src_ip=src_ip, dst_ip=dst_ip, meta=meta)
+            alert["handled"] = False
+            if self._tailing:
+                with self._lock:
+                    if len(self._own_ids) >= self.hot.capacity:
+                        # the tail is stuck (DB errors): forget the oldest, at worst it shows twice
+                        self._own_ids.discard(min(self._own_ids))
+                    self._own_ids.add(alert["id"])
+        except Exception as e:
+            self.db_errors += 1
+            logger.warning("alert not persisted (%s), kept in memory: %s", atype, e)
+            alert = {"id": None, "atype": str(atype), "score": float(score), "label": str(label), "src_ip": src_ip,
+                     "dst_ip": dst_ip, "meta": meta, "handled": False,
+                     "created_at": datetime.utcnow().isoformat()}
+        self._remember(alert, _created_ts(alert))
+        return alert
+
+    # ---- reads ----
+    def recent(self, limit: int = 50, since: Optional[float] = None, before_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Newest-first alerts (created at >= since, id < before_id), at most `limit`."""
+        if limit <= 0:
+            return []
+        since_dt = datetime.utcfromtimestamp(since) if since is not None else None
+        if before_id is None:
+            items = self._hot_latest(limit, since)
+            if len(items) >= limit or (since if since is not None else 0.0) >= self._covered_from:
+                self.hits += 1
+                return items
+            # the window reaches past the hot tier: continue below its oldest DB row
+            ids = [a["id"] for a in items if isinstance(a.get("id"), int)]
+            before_id = min(ids) if ids else None
+        else:
+            items = []
+        self.misses += 1
+        try:
+            rows = get_alerts_before(limit - len(items), before_id=before_id, since=since_dt)
+        except Exception as e:
+            self.db_errors += 1
+            logger.warning("alert DB read failed, serving the hot tier only: %s", e)
+            return items
+        return items + [_presentable(r) for r in rows]
+
+    def _hot_latest(self, limit: int, since: Optional[float]) -> List[Dict[str, Any]]:
+        # the ring's timestamps never go back, so a row tailed from another worker sits at
+        # max(created_at, newest ring ts): its position says "maybe since", created_at decides
+        want = limit
+        while True:
+            items = self.hot.latest(want, since=since)
+            if since is None:
+                return items
+            kept = [a for a in items if _created_ts(a) >= since]
+            if len(kept) >= limit or len(items) < want:
+                return kept[:limit]
+            want += limit - len(kept)
+
+    def histogram(self, minutes: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Per-minute alert counts by type, oldest first."""
+        with self._lock:
+            buckets = list(self._buckets.items())
+        if minutes is not None:
+            cutoff = (int(time.time() // 60) - minutes + 1) * 60
+            buckets = [b for b in buckets if b[0] >= cutoff]
+        return [{"minute": datetime.utcfromtimestamp(m).isoformat(), "total": sum(c.values()), "counts": dict(c)}
+                for m, c in buckets]
+
+    # ---- DB tail ----
+    def warm(self) -> int:
+        """Fill the hot tier with the newest `hot_size` rows of the table."""
+        if len(self.hot):
+            # late (retried) warm-up: older rows can't go behind what the ring already
+            # holds, so only start tailing from the current end of the table
+            rows = get_alerts_before(1)
+            with self._lock:
+                self._last_id = max([self._last_id] + [r["id"] for r in rows])
+                self._own_ids = set()
+                self._warmed = True
+            return 0
+        rows = get_alerts_before(self.hot.capacity)
+        rows.reverse()
+        for r in rows:
+            self._remember(r, _created_ts(r))
+        with self._lock:
+            if rows:
+                self._last_id = max(self._last_id, rows[-1]["id"])
+            self._covered_from = _created_ts(rows[0]) if len(rows) >= self.hot.capacity else 0.0
+            self._warmed = True
+        return len(rows)
+
+    def sync(self, batch: int = 1000) -> int:
+        if not self._warmed:
+            # never tail from id 0: that would stream the whole table through the ring
+            return self.warm()
+        n = 0
+        while True:
+            rows = get_alerts_after(self._last_id, batch)
+            if not rows:
+                break
+            with self._lock:
+                own = self._own_ids
+                self._own_ids = set()
+            for r in rows:
+                if r["id"] in own:
+                    own.discard(r["id"])
+                    continue
+                self._remember(r, _created_ts(r))
+                n += 1
+            with self._lock:
+                # ids we inserted that this batch did not reach yet
+                self._own_ids |= {i for i in own if i > rows[-1]["id"]}
+                self._last_id = rows[-1]["id"]
+            if len(rows) < batch:
+                break
+        return n
+
+    def start(self, interval: float = ALERT_SYNC_INTERVAL) -> Optional[threading.Thread]:
+        if interval <= 0:
+            return None
+        self._tailing = True
+
+        def _loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.sync()
+                except Exception as e:
+                    logger.debug("alert tail sync failed: %s", e)
+
+        t = threading.Thread(target=_loop, name="alert-sync", daemon=True)
+        t.start()
+        return t
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {"hot": len(self.hot), "hot_capacity": self.hot.capacity, "hits": self.hits, "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else None, "db_errors": self.db_errors,
+                "covered_from": datetime.utcfromtimestamp(self._covered_from).isoformat() if self._covered_from else None}
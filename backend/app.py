@@ -1,23 +1,21 @@
 ﻿# backend/app.py
+from backend.startup import STARTUP, preloading_master
+STARTUP.install()   # times every import below; reported at /admin/startup
 import os
-import json
 import time
 import threading
-import joblib
 import logging
 import traceback
 import numpy as np
-from collections import defaultdict, deque
-import xgboost as xgb
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from functools import wraps
-from flask import Flask, request, jsonify, send_from_directory, render_template, abort
+from flask import Flask, request, jsonify, send_from_directory, render_template, abort, Response
+from werkzeug.utils import safe_join
 from flask_cors import CORS
 from flask_socketio import SocketIO, emit
 from dotenv import load_dotenv
 from werkzeug.middleware.proxy_fix import ProxyFix
-import requests
 import time as _time
 
 def _canonical_mouse_resp(out: dict, start_ts: float):
@@ -66,22 +64,34 @@ def _canonical_mouse_resp(out: dict, start_ts: float):
     return out
 
 
-try:
-    from tensorflow.keras.models import load_model as tf_load_model  # type: ignore
-    from tensorflow.keras.preprocessing.sequence import pad_sequences  # type: ignore
-    from tensorflow.keras.utils import custom_object_scope  # type: ignore
-except Exception:
-    tf_load_model = None
-    pad_sequences = None
-    custom_object_scope = None
+# heavy modules (tensorflow, xgboost, joblib/sklearn, requests) are imported on first
+# use by the subsystem that needs them, through STARTUP.lazy_import so the cost shows up
+# under "deferred_imports" at /admin/startup instead of delaying the first request
+def _xgb():
+    return STARTUP.lazy_import("xgboost", "flow scoring (XGBoost)")
+
+def _pad_sequences():
+    # only reached with the LSTM loaded, so tensorflow is already imported by then
+    try:
+        return STARTUP.lazy_import("tensorflow.keras.preprocessing.sequence", "LSTM input padding").pad_sequences
+    except Exception:
+        return None
 
 ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 load_dotenv(os.path.join(ROOT, ".env"))
 
 
-from backend.db import insert_alert, save_mouse, get_latest_alerts
-from backend.auth import auth_bp, jwt, SECRET_KEY  
-from backend.mouse_model import extract_features_from_events, selected_indices
+from backend.db import save_mouse, get_latest_alerts
+from backend.auth import auth_bp, SECRET_KEY, decode_token
+from backend.mouse_model import extract_features_from_events, events_to_array
+from backend.shared_state import state_backend_from_env, make_blocklist, make_ip_limiter, socketio_queue_from_env
+from backend.blocklist_store import BlocklistStore
+from backend.alert_fanout import AlertFanout, AlertFilter
+from backend.alert_service import AlertService
+from backend.model_registry import (MODELS, FLOW_MODELS, MOUSE_MODELS, MODEL_WATCH_INTERVAL, MODEL_SYNC_INTERVAL,
+                                   ReloadError, memory_report, preload_from_env)
+from backend.inference_pool import executor_from_env
+from backend.middleware import is_exempt, is_automation_headers, inject_flow_report_tag, InjectedHTMLCache, StaticHTMLCache
 
 
 APP_DIR = os.path.dirname(__file__)
@@ -101,9 +111,15 @@ app.config.update(
 
 # create limiter instance
 # app.config["RATELIMIT_ENABLED"] = False
-limiter = Limiter(key_func=get_remote_address, default_limits=[app.config.get("RATE_LIMIT", "200 per hour")])
+# RATELIMIT_STORAGE_URI (e.g. redis://host:6379) shares flask-limiter counters between workers
+limiter = Limiter(key_func=get_remote_address, default_limits=[app.config.get("RATE_LIMIT", "200 per hour")],
+                  storage_uri=os.environ.get("RATELIMIT_STORAGE_URI", "memory://"))
 limiter.init_app(app)
 
+@limiter.request_filter
+def _limiter_exempt():
+    return is_exempt(request.path, "limiter")
+
 # CORS / SocketIO CORS
 FRONTEND_ORIGIN = os.environ.get("FRONTEND_ORIGIN", "http://localhost:3000")
 
@@ -123,11 +139,25 @@ CORS(
     expose_headers=["Content-Type", "Access-Control-Allow-Origin", "Access-Control-Allow-Credentials"]
 )
 
-# SocketIO with matching allowed origins
-socketio = SocketIO(app, cors_allowed_origins=_allowed_origins)
+# SocketIO with matching allowed origins.
+# async_mode must match the server: gunicorn.conf.py sets "threading" for its gthread
+# workers (left unset, eventlet would be picked just because it is installed);
+# empty = auto, which suits `python backend/app.py`.
+SOCKETIO_ASYNC_MODE = os.environ.get("SOCKETIO_ASYNC_MODE", "").strip() or None
+# with more than one worker every emit has to go through a queue all workers read
+# (and the load balancer must keep each client on one worker); see gunicorn.conf.py
+SOCKETIO_MESSAGE_QUEUE = socketio_queue_from_env()
+socketio = SocketIO(app, cors_allowed_origins=_allowed_origins, async_mode=SOCKETIO_ASYNC_MODE,
+                    message_queue=SOCKETIO_MESSAGE_QUEUE)
 
 app.extensions = getattr(app, "extensions", {})
 app.extensions["socketio"] = socketio
+# detections publish here; dashboards get coalesced "alerts_batch" messages (backend/alert_fanout.py)
+ALERT_FANOUT = AlertFanout(socketio)
+app.extensions["alert_fanout"] = ALERT_FANOUT
+# alerts: hot in-memory tier + DB write-through; GET /api/alerts reads through it (backend/alert_service.py)
+ALERT_SERVICE = AlertService()
+app.extensions["alert_service"] = ALERT_SERVICE
 
 # ----- import alerts blueprints (robust) -----
 logger = logging.getLogger("ai_ml_cyberdefense")
@@ -178,263 +208,20 @@ if collect_bp:
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("ai_ml_cyberdefense")
 
-# Helpers: robust file finding
-def find_existing_file(candidates):
-    for p in candidates:
-        pabs = os.path.abspath(p)
-        if os.path.exists(pabs):
-            return pabs
-    return None
-
-def find_lstm_scaler_path():
-    candidates = [
-        os.path.join(DATA_DIR, "mouse_lstm_scaler.save"),
-        os.path.join(DATA_DIR, "mouse_lstm_scaler.joblib"),
-        os.path.join(DATA_DIR, "mouse_lstm_scaler.pkl"),
-        os.path.join(os.path.dirname(__file__), "..", "data", "mouse_lstm_scaler.save"),
-        os.path.join(os.path.dirname(__file__), "..", "data", "processed", "mouse_lstm_scaler.save"),
-    ]
-    return find_existing_file(candidates)
-
-def find_lstm_model_path():
-    # PREFER the native Keras format first (.keras) — more robust across TF versions.
-    candidates = [
-        os.path.join(DATA_DIR, "mouse_lstm.keras"),
-        os.path.join(os.path.dirname(__file__), "..", "data", "mouse_lstm.keras"),
-        os.path.join(DATA_DIR, "mouse_lstm.h5"),
-        os.path.join(os.path.dirname(__file__), "..", "data", "mouse_lstm.h5"),
-        os.path.join(os.path.dirname(__file__), "..", "data", "processed", "mouse_lstm.h5"),
-        # also check common container mount
-        "/data/mouse_lstm.keras",
-        "/data/mouse_lstm.h5",
-    ]
-    return find_existing_file(candidates)
-
 # -------------------------
-# Load flow detection models (RF + XGB)
+# Models: flow detection (RF + XGB + scaler) and mouse/bot detection (RF + optional LSTM)
 # -------------------------
-logger.info("Loading flow-detection models...")
-rf, scaler, le, xgb_model = None, None, None, None
-
-flow_paths = {
-    "rf": os.path.join(DATA_DIR, "rf_model.save"),
-    "scaler": os.path.join(DATA_DIR, "scaler_used.save"),
-    "le": os.path.join(DATA_DIR, "label_encoder.save"),
-    "xgb": os.path.join(DATA_DIR, "xgb_model.json"),
-}
-
-try:
-    if os.path.exists(flow_paths["rf"]):
-        rf = joblib.load(flow_paths["rf"])
-        logger.info(" - Loaded RF model")
-except Exception as e:
-    logger.warning(" - Failed loading RF model: %s", e)
-
-import os, joblib
-# FORCE: load the known-correct 18-feature scaler (absolute Windows path)
-import os, joblib
-try:
-    scaler_path = os.path.join("data", "processed", "scaler_used.save")
-    # repo-relative fallback if absolute not present
-    if not os.path.exists(scaler_path):
-        scaler_path = os.path.join(os.path.dirname(__file__), "..", "data", "processed", "scaler_used.save")
-    scaler = None
-    if os.path.exists(scaler_path):
-        scaler = joblib.load(scaler_path)
-        logger.info("Loaded forced flow scaler from %s", scaler_path)
-    else:
-        logger.warning("Forced scaler not found at %s", scaler_path)
-        scaler = None
-except Exception as e:
-    logger.exception("Failed forcing flow scaler load: %s", e)
-    scaler = None
-
-logger.info("SCALER MEAN SHAPE: %s", getattr(scaler, "mean_", None).shape if getattr(scaler, "mean_", None) is not None else "None")
-
-logger.info("EFFECTIVE_SCALER_PATH: %s", scaler_path)
-
-try:
-    if os.path.exists(flow_paths["le"]):
-        le = joblib.load(flow_paths["le"])
-        logger.info(" - Loaded label encoder")
-except Exception as e:
-    logger.warning(" - Failed loading label encoder: %s", e)
-
-try:
-    if os.path.exists(flow_paths["xgb"]):
-        xgb_model = xgb.Booster()
-        xgb_model.load_model(flow_paths["xgb"])
-        logger.info(" - Loaded XGBoost model")
-except Exception as e:
-    logger.warning(" - Failed loading XGBoost model: %s", e)
-
-# -------------------------
-# Load mouse/bot detection models (RF + optional LSTM)
-# -------------------------
-logger.info("Loading mouse/bot-detection models (if present)...")
-mouse_rf = None
-mouse_scaler = None
-mouse_lstm_model = None
-mouse_lstm_scaler = None
-mouse_lstm_meta = None
-
-mouse_paths = {
-    "rf": os.path.join(DATA_DIR, "mouse_rf.save"),
-    "scaler": os.path.join(DATA_DIR, "mouse_scaler.save"),
-    "lstm": None,  # we'll detect via find_lstm_model_path()
-}
-
-# RF & scaler
-try:
-    if os.path.exists(os.path.join(DATA_DIR, "mouse_rf.save")):
-        mouse_rf = joblib.load(os.path.join(DATA_DIR, "mouse_rf.save"))
-        logger.info(" - Loaded mouse RF model")
-except Exception as e:
-    logger.warning(" - Failed loading mouse RF: %s", e)
-
-try:
-    if os.path.exists(os.path.join(DATA_DIR, "mouse_scaler.save")):
-        mouse_scaler = joblib.load(os.path.join(DATA_DIR, "mouse_scaler.save"))
-        logger.info(" - Loaded mouse scaler")
-except Exception as e:
-    logger.warning(" - Failed loading mouse scaler: %s", e)
-
-# --- Robust LSTM loader using backend.keras_custom.get_custom_objects() if present ---
-try:
-    # import helper mapping of custom objects (placeholder implementations)
-    from backend.keras_custom import get_custom_objects as _get_keras_custom_objects  # type: ignore
-except Exception:
-    _get_keras_custom_objects = None
-
-# Load LSTM scaler
-lstm_scaler_path = find_lstm_scaler_path()
-if lstm_scaler_path:
-    try:
-        mouse_lstm_scaler = joblib.load(lstm_scaler_path)
-        logger.info(" - Loaded LSTM scaler from %s shape=%s", lstm_scaler_path, getattr(mouse_lstm_scaler, "mean_", None).shape)
-    except Exception as e:
-        logger.warning(" - Failed loading LSTM scaler: %s", e)
-        mouse_lstm_scaler = None
-else:
-    logger.info(" - No LSTM scaler file found in candidates")
-
-# Load LSTM model (preferred: .keras, fallback: .h5)
-lstm_model_path = find_lstm_model_path()
-if lstm_model_path and tf_load_model:
-    mouse_lstm_model = None
-    tried = []
-    try:
-        # If it's a .keras (native Keras) bundle, try it first (most robust)
-        if lstm_model_path.endswith(".keras"):
-            try:
-                mouse_lstm_model = tf_load_model(lstm_model_path)
-                logger.info(" - Loaded mouse LSTM model (native .keras) from %s", lstm_model_path)
-            except Exception as e_k:
-                tried.append(("keras_native", e_k))
-                logger.warning(" - Loading .keras failed: %s", e_k)
-
-        # If not loaded yet and we have custom objects helper, try with that
-        if mouse_lstm_model is None:
-            if _get_keras_custom_objects is not None:
-                co = _get_keras_custom_objects()
-                # If TF provides custom_object_scope, try using it — some custom ops need the scope.
-                try:
-                    if custom_object_scope is not None:
-                        with custom_object_scope(co):
-                            mouse_lstm_model = tf_load_model(lstm_model_path)
-                        logger.info(" - Loaded mouse LSTM model using custom_object_scope from %s", lstm_model_path)
-                    else:
-                        mouse_lstm_model = tf_load_model(lstm_model_path, custom_objects=co)
-                        logger.info(" - Loaded mouse LSTM model using custom_objects from %s", lstm_model_path)
-                except Exception as e_co:
-                    tried.append(("custom_objects", e_co))
-                    logger.warning(" - Loading with custom_objects failed: %s", e_co)
-                    # try compile=False
-                    try:
-                        if custom_object_scope is not None:
-                            with custom_object_scope(co):
-                                mouse_lstm_model = tf_load_model(lstm_model_path, compile=False)
-                        else:
-                            mouse_lstm_model = tf_load_model(lstm_model_path, custom_objects=co, compile=False)
-                        logger.info(" - Loaded mouse LSTM model with compile=False using custom objects from %s", lstm_model_path)
-                    except Exception as e_co2:
-                        tried.append(("custom_objects_compile_false", e_co2))
-                        logger.warning(" - compile=False with custom_objects failed: %s", e_co2)
-
-        # If still not loaded, try plain load_model (last resort)
-        if mouse_lstm_model is None:
-            try:
-                mouse_lstm_model = tf_load_model(lstm_model_path)
-                logger.info(" - Loaded mouse LSTM model without custom_objects from %s", lstm_model_path)
-            except Exception as e_plain:
-                tried.append(("plain_load", e_plain))
-                logger.warning(" - Plain load_model failed: %s", e_plain)
-                mouse_lstm_model = None
-
-        if mouse_lstm_model is None:
-            # Collate and emit a concise warning with the key failure reasons
-            reasons = "; ".join([f"{k}:{getattr(v,'__class__',v)}" for k, v in tried])
-            logger.warning(" - All attempts to load LSTM model failed: %s", reasons)
-    except Exception as outer_exc:
-        logger.warning(" - Unexpected error while loading LSTM model: %s", outer_exc)
-        mouse_lstm_model = None
-elif lstm_model_path:
-    logger.info(" - LSTM model file found but tensorflow.keras.load_model unavailable in this env; skipping model load.")
-else:
-    logger.info(" - No LSTM model file found in candidates")
-
-# meta JSON
-meta_candidates = [
-    os.path.join(DATA_DIR, "mouse_lstm_meta.json"),
-    os.path.join(os.path.dirname(__file__), "..", "data", "mouse_lstm_meta.json"),
-    os.path.join(os.path.dirname(__file__), "..", "data", "processed", "mouse_lstm_meta.json"),
-]
-meta_path = find_existing_file(meta_candidates)
-if meta_path:
-    try:
-        with open(meta_path, "r") as f:
-            mouse_lstm_meta = json.load(f)
-        logger.info(" - Loaded LSTM meta from %s %s", meta_path, mouse_lstm_meta)
-    except Exception as e:
-        logger.warning(" - Failed loading LSTM meta: %s", e)
-        mouse_lstm_meta = None
-else:
-    logger.info(" - No LSTM meta found in candidates")
-
-# -------------------------
-# Optional: warm up LSTM once at startup to reduce first-request latency
-# -------------------------
-def _warmup_mouse_lstm():
-    try:
-        if mouse_lstm_model is None or mouse_lstm_scaler is None or mouse_lstm_meta is None:
-            logger.info("LSTM warmup skipped (model/scaler/meta missing).")
-            return
-        # determine expected dims from scaler/meta
-        seq_len = int(mouse_lstm_meta.get("seq_len", 8))
-        feat_dim = int(mouse_lstm_meta.get("feat_dim", getattr(mouse_lstm_scaler, "mean_", None).shape[0]))
-        import numpy as _np
-        X_dummy = _np.zeros((1, seq_len, feat_dim), dtype=float)
-        logger.info("Warming mouse LSTM model: seq_len=%s feat_dim=%s", seq_len, feat_dim)
-        t0 = time.time()
-        try:
-            # some TF builds prefer float32 input
-            X_try = X_dummy.astype("float32")
-            # suppress verbose output
-            _ = mouse_lstm_model.predict(X_try, verbose=0)
-        except Exception:
-            _ = mouse_lstm_model.predict(X_dummy, verbose=0)
-        t1 = time.time()
-        logger.info("Mouse LSTM warmup done (%.0f ms)", (t1 - t0) * 1000.0)
-    except Exception as e:
-        logger.warning("Mouse LSTM warmup failed: %s", e)
-
-# start warmup in background thread so it doesn't block startup
-try:
-    if mouse_lstm_model is not None and mouse_lstm_scaler is not None and mouse_lstm_meta is not None:
-        t = threading.Thread(target=_warmup_mouse_lstm, daemon=True)
-        t.start()
-except Exception as e:
-    logger.debug("Failed to start warmup thread: %s", e)
+# nothing is loaded here: each artifact loads on first use (backend/model_registry.py),
+# so workers that only serve auth / static pages never unpickle a forest or build a TF graph.
+# MODEL_PRELOAD=all (or a comma list) loads them in the background at startup instead.
+preload_from_env(MODELS)
+# retrained artifacts dropped into data/processed are hot-reloaded (MODEL_WATCH_INTERVAL > 0)
+# or on POST /admin/models/reload; requests bind their models once, at entry.
+# A reload swaps one process's models; follow() picks up reloads announced by the others.
+# Both threads start in start_background(), at the end of this module.
+# CPU-bound scoring (flow RF/XGB, the mouse window loop) off the request threads:
+# INFERENCE_WORKERS=N runs it in N processes with their own models (backend/inference_pool.py)
+INFERENCE = executor_from_env()
 
 # -------------------------
 # Authentication helper decorator (protect endpoints)
@@ -447,7 +234,7 @@ def require_token(f):
             return jsonify({"error": "Token missing"}), 401
         try:
             token = auth_header.split(" ")[1]
-            decoded = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+            decoded = decode_token(token)
             request.user = decoded
         except Exception as e:
             return jsonify({"error": f"Invalid or expired token: {str(e)}"}), 401
@@ -457,42 +244,49 @@ def require_token(f):
 # -------------------------
 # Blocklist (in-memory)
 # -------------------------
-BLOCKLIST = {}
-BLOCKLIST_LOCK = threading.Lock()
+# exact IPs / flow keys and CIDR prefixes ("10.1.2.0/24"), expired via a min-heap; with
+# STATE_BACKEND=shm|redis the blocklist and per-IP rates are shared by all workers
+STATE_BACKEND = state_backend_from_env()
+BLOCKLIST = make_blocklist(STATE_BACKEND)
 DEFAULT_BLOCK_TTL = int(os.environ.get("BLOCK_TTL", 300))
 
+# snapshot + journal so blocks survive restarts (empty BLOCK_SNAPSHOT_PATH disables);
+# loaded and snapshotted from start_background()
+BLOCK_SNAPSHOT_PATH = os.environ.get("BLOCK_SNAPSHOT_PATH", os.path.join(ROOT, "data", "blocklist.snap"))
+BLOCK_SNAPSHOT_INTERVAL = float(os.environ.get("BLOCK_SNAPSHOT_INTERVAL", 60))
+BLOCK_STORE = None
+if BLOCK_SNAPSHOT_PATH:
+    try:
+        BLOCK_STORE = BlocklistStore(BLOCKLIST, BLOCK_SNAPSHOT_PATH)
+    except Exception as e:
+        logger.warning("Blocklist persistence disabled (%s): %s", BLOCK_SNAPSHOT_PATH, e)
+        BLOCK_STORE = None
+
 def is_blocked(ip=None, key=None):
     now = time.time()
-    with BLOCKLIST_LOCK:
-        if ip:
-            ts = BLOCKLIST.get(ip)
-            if ts and ts > now:
-                return True
-        if key:
-            ts2 = BLOCKLIST.get(key)
-            if ts2 and ts2 > now:
-                return True
+    if ip and BLOCKLIST.is_blocked(ip, now):
+        return True
+    if key and BLOCKLIST.is_blocked(key, now):
+        return True
     return False
 
 def add_block(ip=None, key=None, ttl=DEFAULT_BLOCK_TTL):
     unblock_at = time.time() + float(ttl)
-    with BLOCKLIST_LOCK:
-        if ip:
-            BLOCKLIST[ip] = unblock_at
-        if key:
-            BLOCKLIST[key] = unblock_at
+    target = BLOCK_STORE or BLOCKLIST
+    if ip:
+        target.add(ip, unblock_at)
+    if key:
+        target.add(key, unblock_at)
 
 def remove_block(ip=None, key=None):
-    with BLOCKLIST_LOCK:
-        if ip and ip in BLOCKLIST:
-            del BLOCKLIST[ip]
-        if key and key in BLOCKLIST:
-            del BLOCKLIST[key]
+    target = BLOCK_STORE or BLOCKLIST
+    if ip:
+        target.remove(ip)
+    if key:
+        target.remove(key)
 
 def list_blocks():
-    now = time.time()
-    with BLOCKLIST_LOCK:
-        return {k: v for k, v in BLOCKLIST.items() if v > now}
+    return BLOCKLIST.items()
 
 # -------------------------
 # Simple auth + local checks
@@ -507,20 +301,20 @@ def check_auth_token_present_and_valid():
         return False
     try:
         token = auth_header.split(" ")[1]
-        jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+        decode_token(token)
         return True
     except Exception:
         return False
 
 # -------------------------
-# Quick per-IP sliding window collector config
+# Quick per-IP rate window collector config
 # -------------------------
 _IP_WINDOW_SECONDS = int(os.environ.get("IP_WINDOW_SECONDS", 2))
 _IP_WINDOW_MAX = int(os.environ.get("IP_WINDOW_MAX", 8))
 _IP_HARD_BLOCK_TTL = int(os.environ.get("IP_HARD_BLOCK_TTL", 300))
 
-_ip_requests = defaultdict(lambda: deque(maxlen=1024))
-_ip_lock = threading.Lock()
+# per-IP request rate: fixed-memory sliding-window counters in this worker (backend/ratelimit.py) or shared via STATE_BACKEND
+_ip_limiter = make_ip_limiter(STATE_BACKEND, _IP_WINDOW_SECONDS, _IP_WINDOW_MAX)
 
 FLOWCOLLECTOR_FORWARD = os.environ.get("FLOWCOLLECTOR_FORWARD", None)
 FLOWCOLLECTOR_TOKEN = os.environ.get("FLOWCOLLECTOR_TOKEN", None)
@@ -535,6 +329,7 @@ def forward_to_flowcollector(event):
             headers["Authorization"] = f"Bearer {token}"
         def _send():
             try:
+                requests = STARTUP.lazy_import("requests", "flow collector forwarding")
                 requests.post(FLOWCOLLECTOR_FORWARD, json=event, headers=headers, timeout=2.0)
             except Exception as e:
                 logger.debug("forward_to_flowcollector failed: %s", e)
@@ -545,36 +340,46 @@ def forward_to_flowcollector(event):
 # -------------------------
 # Inject flow_report.js into all HTML responses (so you don't have to modify templates)
 # -------------------------
+_injected_html = InjectedHTMLCache()
+
 @app.after_request
 def inject_flow_report(response):
     try:
-        if response.content_type and response.content_type.startswith("text/html"):
-            body = response.get_data(as_text=True)
-            # avoid double-inject
-            if "id=\"flow-report-js\"" not in body and "</head>" in body:
-                script_tag = '<script id="flow-report-js" src="/static/flow_report.js" defer></script></head>'
-                injected = body.replace("</head>", script_tag)
-                response.set_data(injected)
+        if (response.status_code != 200 or response.direct_passthrough
+                or not (response.content_type or "").startswith("text/html")):
+            # file/streamed bodies are never buffered here (pages go through send_page)
+            return response
+        etag = response.headers.get("ETag")
+        key = (request.path, etag) if etag else None
+        body = _injected_html.get(key) if key else None
+        if body is None:
+            body = inject_flow_report_tag(response.get_data())
+            if key:
+                # b"" remembers "nothing to inject" for this validator
+                _injected_html.put(key, body or b"")
+        if body:
+            response.set_data(body)
     except Exception as e:
         logger.debug("inject_flow_report error: %s", e)
     return response
 
 # -------------------------
-# Before-request blocklist check (fast)
+# Before-request guard (fast): blocklist, then automation check
 # -------------------------
 @app.before_request
-def check_blocklist():
+def request_guard():
     path = request.path or ""
-    if path.startswith("/static") or path.startswith("/socket.io") or path.startswith("/health") or path.startswith("/collect_flow_event"):
-        return None
+    headers = request.headers
 
-    client_ip = request.headers.get("X-Real-IP", request.remote_addr)
-    flow_key = request.headers.get("X-Flow-Key", None) or request.args.get("flow_key")
+    if not is_exempt(path, "blocklist"):
+        client_ip = headers.get("X-Real-IP", request.remote_addr)
+        flow_key = headers.get("X-Flow-Key", None) or request.args.get("flow_key")
+        if is_blocked(ip=client_ip) or (flow_key and is_blocked(key=flow_key)):
+            if not check_auth_token_present_and_valid():
+                return jsonify({"error": "Temporarily blocked due to suspicious activity"}), 403
 
-    if is_blocked(ip=client_ip) or (flow_key and is_blocked(key=flow_key)):
-        if check_auth_token_present_and_valid():
-            return None
-        return jsonify({"error": "Temporarily blocked due to suspicious activity"}), 403
+    if not is_exempt(path, "automation") and is_automation_headers(headers):
+        return jsonify({"error": "Automation detected. Request blocked."}), 403
 
 # -------------------------
 # Alerts ingest endpoint (FlowCollector -> POSTs alerts here)
@@ -587,7 +392,7 @@ def ingest_alert():
     payload = request.get_json(force=True, silent=True) or {}
     try:
         try:
-            insert_alert(
+            ALERT_SERVICE.record(
                 payload.get("type", "external"),
                 float(payload.get("prob", payload.get("p", 0.0))),
                 payload.get("label", "Unknown"),
@@ -599,7 +404,7 @@ def ingest_alert():
             logger.debug("insert_alert failed (continuing)")
 
         try:
-            socketio.emit("new_alert", payload)
+            ALERT_FANOUT.publish("new_alert", payload)
         except Exception as e:
             logger.warning("socketio emit new_alert failed: %s", e)
 
@@ -628,23 +433,18 @@ def collect_and_check():
     if is_blocked(ip=client_ip):
         return jsonify({"error": "blocked", "action": "block"}), 403
 
-    # sliding-window update
-    with _ip_lock:
-        dq = _ip_requests[client_ip]
-        dq.append(now)
-        while dq and dq[0] < now - _IP_WINDOW_SECONDS:
-            dq.popleft()
-        count = len(dq)
+    # rate window update (approximate count of requests in the last window)
+    count = _ip_limiter.hit(client_ip, now)
 
     # immediate hard block decision
     if count >= _IP_WINDOW_MAX:
         add_block(ip=client_ip, ttl=_IP_HARD_BLOCK_TTL)
         try:
-            insert_alert("realtime_rate_block", 1.0, "Blocked", src_ip=client_ip, meta={"count": count, "window": _IP_WINDOW_SECONDS})
+            ALERT_SERVICE.record("realtime_rate_block", 1.0, "Blocked", src_ip=client_ip, meta={"count": count, "window": _IP_WINDOW_SECONDS})
         except Exception:
             logger.debug("insert_alert failed for realtime_rate_block")
         try:
-            socketio.emit("new_alert", {"type":"realtime_rate_block","prob":1.0,"label":"Attack","meta":{"src_ip":client_ip,"count":count}})
+            ALERT_FANOUT.publish("new_alert", {"type":"realtime_rate_block","prob":1.0,"label":"Attack","meta":{"src_ip":client_ip,"count":count}})
         except Exception:
             pass
         return jsonify({"action":"block"}), 403
@@ -679,11 +479,11 @@ def block_client():
             "time": time.time()
         }
         try:
-            insert_alert("manual_block", 1.0, "Blocked", src_ip=ip, dst_ip=None, meta={"reason": reason})
+            ALERT_SERVICE.record("manual_block", 1.0, "Blocked", src_ip=ip, dst_ip=None, meta={"reason": reason})
         except Exception:
             logger.debug("insert_alert for block failed (continuing)")
         try:
-            socketio.emit("new_alert", alert_payload)
+            ALERT_FANOUT.publish("new_alert", alert_payload)
         except Exception:
             logger.debug("socketio emit for block failed")
         return jsonify({"status": "blocked", "entry": alert_payload}), 200
@@ -702,7 +502,7 @@ def unblock_client():
     try:
         remove_block(ip=ip, key=key)
         try:
-            socketio.emit("new_alert", {"type": "unblock", "ip": ip, "key": key, "time": time.time()})
+            ALERT_FANOUT.publish("new_alert", {"type": "unblock", "ip": ip, "key": key, "time": time.time()})
         except Exception:
             pass
         return jsonify({"status": "unblocked", "ip": ip, "key": key}), 200
@@ -724,13 +524,16 @@ def get_blocks():
 
 @app.route("/health")
 def health():
+    STARTUP.healthy()
+    # availability without forcing a load: loaded, or not loaded yet but the artifact exists
     return jsonify({
         "status": "ok",
-        "flow_rf": bool(rf),
-        "flow_xgb": bool(xgb_model),
-        "mouse_rf": bool(mouse_rf),
-        "mouse_lstm": bool(mouse_lstm_model),
-        "scaler": bool(scaler)
+        "flow_rf": MODELS.available("flow_rf"),
+        "flow_xgb": MODELS.available("flow_xgb"),
+        "mouse_rf": MODELS.available("mouse_rf"),
+        "mouse_lstm": MODELS.available("mouse_lstm"),
+        "scaler": MODELS.available("flow_scaler"),
+        "models_loaded": [n for n in MODELS.names() if MODELS.is_loaded(n)]
     })
 
 from flask import current_app
@@ -742,6 +545,8 @@ def predict_flow():
     meta = data.get("meta", {}) or {}
     if features is None:
         return jsonify({"error":"Missing features"}),400
+    # only the scaler is needed here (input width); the models are bound where scoring runs
+    scaler = MODELS.get("flow_scaler")
 
     # load and cache feature order + expected dims
     try:
@@ -792,25 +597,13 @@ def predict_flow():
     except Exception:
         pass
 
+    # scaling + RF/XGB scoring: inline, or in the inference pool (X goes via shared memory)
     try:
-        X_scaled = scaler.transform(X) if scaler is not None else X
-    except Exception:
-        X_scaled = X
-
-    probs = []
-    models_info = {}
-    try:
-        if rf is not None:
-            p_rf = float(rf.predict_proba(X_scaled)[0,1])
-            probs.append(p_rf); models_info["rf"] = p_rf
+        models_info = INFERENCE.run("flow", X)
     except Exception as e:
-        models_info["rf_error"] = str(e)
-    try:
-        if xgb_model is not None:
-            p_x = float(xgb_model.predict(xgb.DMatrix(X_scaled))[0])
-            probs.append(p_x); models_info["xgb"] = p_x
-    except Exception as e:
-        models_info["xgb_error"] = str(e)
+        logger.warning("flow scoring failed: %s", e)
+        models_info = {"error": str(e)}
+    probs = [models_info[k] for k in ("rf", "xgb") if k in models_info]
 
     if not probs:
         return jsonify({"error":"No models available for flow prediction"}),500
@@ -824,8 +617,8 @@ def predict_flow():
 
     out = {"prob_attack": prob_final, "label": label, "meta": meta, "models": models_info}
     try:
-        insert_alert("ensemble_flow", float(prob_final), label, src_ip=meta.get("src_ip"), dst_ip=meta.get("dst_ip"), meta=meta)
-        socketio.emit("new_alert", {"type":"ensemble_flow","prob":prob_final,"label":label,"meta":meta})
+        ALERT_SERVICE.record("ensemble_flow", float(prob_final), label, src_ip=meta.get("src_ip"), dst_ip=meta.get("dst_ip"), meta=meta)
+        ALERT_FANOUT.publish("new_alert", {"type":"ensemble_flow","prob":prob_final,"label":label,"meta":meta})
     except Exception:
         pass
 
@@ -840,6 +633,7 @@ def debug_config():
         p1 = os.path.join(dpath, "feature_order_corrected.json")
         feat_file = p1 
 
+        scaler = MODELS.peek("flow_scaler")
         mean_shape = None
         try:
             mean_attr = getattr(scaler, "mean_", None)
@@ -857,10 +651,7 @@ def debug_config():
         # also expose the effective scaler path if available in this module
         eff_path = None
         try:
-            eff_path = globals().get("scaler_path", None)
-            if eff_path is None:
-                # try common names
-                eff_path = globals().get("EFFECTIVE_SCALER_PATH", None) or globals().get("effective_scaler_path", None)
+            eff_path = MODELS.path("flow_scaler")
         except Exception:
             eff_path = None
 
@@ -869,8 +660,8 @@ def debug_config():
             "feature_file": feat_file,
             "scaler_expected_features": mean_shape,
             "effective_scaler_path": eff_path,
-            "rf_loaded": bool(rf),
-            "xgb_loaded": bool(xgb_model)
+            "rf_loaded": MODELS.peek("flow_rf") is not None,
+            "xgb_loaded": MODELS.peek("flow_xgb") is not None
         })
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -999,12 +790,12 @@ def collect_mouse():
 
             # persist and emit
             try:
-                insert_alert("mouse_heuristic", float(bot), canonical["label"] or ("bot" if bot>=0.5 else "human"), meta={"session_id": sid, **meta})
+                ALERT_SERVICE.record("mouse_heuristic", float(bot), canonical["label"] or ("bot" if bot>=0.5 else "human"), meta={"session_id": sid, **meta})
             except Exception:
                 pass
 
             try:
-                socketio.emit("mouse_prediction", {"session_id": sid, "prediction": canonical, "meta": meta})
+                ALERT_FANOUT.publish("mouse_prediction", {"session_id": sid, "prediction": canonical, "meta": meta})
             except Exception:
                 logger.debug("socketio emit mouse_prediction failed")
         except Exception as e:
@@ -1107,12 +898,12 @@ def predict_mouse():
     }
 
     try:
-        insert_alert("mouse_heuristic", float(bot), out["label"] or ("bot" if bot>=0.5 else "human"), meta={"session_id": payload.get("session_id")})
+        ALERT_SERVICE.record("mouse_heuristic", float(bot), out["label"] or ("bot" if bot>=0.5 else "human"), meta={"session_id": payload.get("session_id")})
     except Exception:
         pass
 
     try:
-        socketio.emit("mouse_prediction", {"session_id": payload.get("session_id"), "prediction": out})
+        ALERT_FANOUT.publish("mouse_prediction", {"session_id": payload.get("session_id"), "prediction": out})
     except Exception:
         logger.debug("socketio emit mouse_prediction failed")
 
@@ -1136,149 +927,10 @@ def _predict_mouse_from_events(events,
     # basic checks
     if events is None or len(events) == 0:
         raise ValueError("No events provided")
-
-    if mouse_lstm_meta and window_size is None:
-        window_size = int(mouse_lstm_meta.get("window", 10))
-    if window_size is None:
-        window_size = 10
-
-    if stride is None:
-        stride = max(1, window_size // 2)
-
-    # if too few raw events, avoid unstable predictions — return low-confidence human
-    if len(events) < min_events:
-        # try a quick heuristic: still allow RF if available but mark low confidence
-        try:
-            feats = extract_features_from_events(events)
-            X_full = np.array(feats).reshape(1, -1)
-
-            try:
-                X = X_full[:, selected_indices]
-            except Exception:
-                X = X_full
-            Xs = mouse_scaler.transform(X) if mouse_scaler is not None else X
-            prob_rf = float(mouse_rf.predict_proba(Xs)[0, 1]) if mouse_rf is not None else None
-        except Exception:
-            prob_rf = None
-
-        confidence = prob_rf if prob_rf is not None else 0.05
-        label = "bot" if confidence >= (threshold + 0.05) else "human"
-        result = {
-            "label": label,
-            "confidence": float(confidence),
-            "models": (["rf"] if prob_rf is not None else []),
-            "details": {"reason": "insufficient_events", "n_events": len(events)}
-        }
-        return _canonical_mouse_resp(result, start_ts)
-
-    # build windows
-    windows = []
-    for i in range(0, max(1, len(events) - window_size + 1), stride):
-        w = events[i:i+window_size]
-        feats = extract_features_from_events(w)
-        windows.append(np.asarray(feats, dtype=float))
-    # if windows is empty (very short), fallback to whole session features
-    if len(windows) == 0:
-        windows = [np.asarray(extract_features_from_events(events), dtype=float)]
-
-    # prepare arrays
-    probs_per_window = []   # list of averaged probs per window
-    model_sources = set()
-    details = {"window_count": len(windows), "per_window": []}
-
-    for w_vec in windows:
-        try:
-            Xw = np.array(w_vec, dtype=float).reshape(1, -1)[:, selected_indices]
-        except Exception:
-            Xw = np.asarray(w_vec).reshape(1, -1)
-
-        try:
-            Xw_sel = Xw[:, selected_indices]
-        except Exception:
-            Xw_sel = Xw
-
-        # RF branch
-        prob_rf = None
-        try:
-            if mouse_rf is not None and mouse_scaler is not None:
-                Xw_rf = mouse_scaler.transform(Xw_sel)
-            elif mouse_rf is not None:
-                Xw_rf = Xw_sel
-            else:
-                Xw_rf = None
-
-            if Xw_rf is not None and mouse_rf is not None:
-                prob_rf = float(mouse_rf.predict_proba(Xw_rf)[0, 1])
-                model_sources.add("rf")
-        except Exception:
-            prob_rf = None
-
-        # LSTM branch (build sequence when possible)
-        prob_lstm = None
-        try:
-            if mouse_lstm_model is not None and mouse_lstm_scaler is not None and mouse_lstm_meta is not None:
-                expected_dim = getattr(mouse_lstm_scaler, "mean_", None).shape[0]
-                if Xw_sel.shape[1] == expected_dim:
-                    # scale and create seq shape (1, seq_len, feat_dim)
-                    seq_len = int(mouse_lstm_meta.get("seq_len", 8))
-                    feat_dim = int(mouse_lstm_meta.get("feat_dim", Xw_sel.shape[1]))
-                    Xw_scaled = mouse_lstm_scaler.transform(Xw_sel)
-                    # pad/truncate simple approach: repeat or zero-pad to reach seq_len
-                    if Xw_scaled.shape[0] >= seq_len:
-                        X_seq = Xw_scaled[:seq_len].reshape(1, seq_len, feat_dim)
-                    else:
-                        pad = np.zeros((seq_len - Xw_scaled.shape[0], feat_dim), dtype=float)
-                        X_seq = np.vstack([Xw_scaled, pad]).reshape(1, seq_len, feat_dim)
-                    p = mouse_lstm_model.predict(X_seq)
-                    prob_lstm = float(p.reshape(-1)[0])
-                    model_sources.add("lstm")
-        except Exception:
-            prob_lstm = None
-
-        # combine available probs for this window
-        window_probs = [p for p in (prob_rf, prob_lstm) if p is not None]
-        avg_p = float(sum(window_probs) / len(window_probs)) if window_probs else None
-        probs_per_window.append(avg_p)
-        details["per_window"].append({"rf": prob_rf, "lstm": prob_lstm, "avg": avg_p})
-
-    # filter None windows (shouldn't happen often)
-    valid_probs = [p for p in probs_per_window if p is not None]
-    if len(valid_probs) == 0:
-        result = {
-            "label": "human",
-            "confidence": 0.05,
-            "models": list(model_sources),
-            "details": {
-                "n_events": len(events),
-                "window_size": window_size,
-                "stride": stride,
-                "n_windows": len(windows),
-                "windows_above_threshold": 0,
-                "per_window": details["per_window"],
-                "reason": "no_valid_model_predictions"
-            }
-        }
-        return _canonical_mouse_resp(result, start_ts)
-
-    avg_confidence = float(sum(valid_probs) / len(valid_probs))
-    windows_above = sum(1 for p in valid_probs if p >= threshold)
-
-    # Hysteresis: require average >= threshold AND at least min_windows_above_thresh windows above threshold
-    label = "bot" if (avg_confidence >= threshold and windows_above >= min_windows_above_thresh) else "human"
-
-    result = {
-        "label": label,
-        "confidence": avg_confidence,
-        "models": list(model_sources),
-        "details": {
-            "n_events": len(events),
-            "window_size": window_size,
-            "stride": stride,
-            "n_windows": len(windows),
-            "windows_above_threshold": int(windows_above),
-            "per_window": details["per_window"]
-        }
-    }
+    # feature extraction + the window loop are CPU-bound: inline, or in the inference pool
+    result = INFERENCE.run("mouse_windows", events_to_array(events), window_size=window_size, stride=stride,
+                           min_events=min_events, threshold=threshold,
+                           min_windows_above_thresh=min_windows_above_thresh)
     return _canonical_mouse_resp(result, start_ts)
 
 # -------------------------
@@ -1326,6 +978,7 @@ def predict_combined():
         models_used = []
         if flow_data is not None:
             try:
+                rf, scaler, xgb_model = MODELS.get_many(*FLOW_MODELS)
                 X_flow = np.array(flow_data).reshape(1, -1)
                 X_flow_scaled = scaler.transform(X_flow) if scaler is not None else X_flow
                 preds = []
@@ -1337,7 +990,7 @@ def predict_combined():
                         logger.debug("flow rf predict failed", exc_info=True)
                 if xgb_model is not None:
                     try:
-                        preds.append(float(xgb_model.predict(xgb.DMatrix(X_flow_scaled))[0]))
+                        preds.append(float(xgb_model.predict(_xgb().DMatrix(X_flow_scaled))[0]))
                         models_used.append("flow_xgb")
                     except Exception:
                         logger.debug("flow xgb predict failed", exc_info=True)
@@ -1349,6 +1002,7 @@ def predict_combined():
         # MOUSE
         prob_mouse = None
         if mouse_events:
+            mouse_rf, mouse_scaler, mouse_lstm_model, mouse_lstm_scaler, mouse_lstm_meta = MODELS.get_many(*MOUSE_MODELS)
             try:
                 feats = extract_features_from_events(mouse_events)
                 X_mouse = np.array(feats).reshape(1, -1)
@@ -1382,6 +1036,7 @@ def predict_combined():
                     seq_len = int(mouse_lstm_meta.get("seq_len", 8))
                     feat_dim = int(mouse_lstm_meta.get("feat_dim", X_mouse.shape[1]))
                     X_scaled = mouse_lstm_scaler.transform(X_mouse)
+                    pad_sequences = _pad_sequences()
                     if pad_sequences is not None:
                         X_seq = pad_sequences([X_scaled], maxlen=seq_len, dtype="float32", padding="post", truncating="post")
                     else:
@@ -1424,9 +1079,9 @@ def predict_combined():
 
         # persist + emit
         try:
-            insert_alert("ensemble_combined", float(bot_prob), label,
+            ALERT_SERVICE.record("ensemble_combined", float(bot_prob), label,
                          src_ip=meta.get("src_ip"), dst_ip=meta.get("dst_ip"), meta=meta)
-            socketio.emit("new_alert", {"type": "ensemble_combined", "prob": bot_prob, "label": label, "meta": meta})
+            ALERT_FANOUT.publish("new_alert", {"type": "ensemble_combined", "prob": bot_prob, "label": label, "meta": meta})
         except Exception as e:
             logger.warning("Failed to insert/emit combined alert: %s", e)
 
@@ -1453,6 +1108,10 @@ def predict_combined():
 # -------------------------
 @app.route("/admin/model_status")
 def admin_model_status():
+    # reads registry state only: artifacts that are not loaded yet report None
+    rf, xgb_model, scaler = MODELS.peek("flow_rf"), MODELS.peek("flow_xgb"), MODELS.peek("flow_scaler")
+    mouse_rf, mouse_scaler = MODELS.peek("mouse_rf"), MODELS.peek("mouse_scaler")
+    mouse_lstm_model, mouse_lstm_scaler = MODELS.peek("mouse_lstm"), MODELS.peek("mouse_lstm_scaler")
     status = {
         "flow_rf": getattr(rf, "n_features_in_", None),
         "flow_xgb": bool(xgb_model),
@@ -1460,15 +1119,20 @@ def admin_model_status():
         "mouse_scaler": getattr(mouse_scaler, "mean_", None).shape if mouse_scaler is not None else None,
         "mouse_lstm_model": bool(mouse_lstm_model),
         "mouse_lstm_scaler": getattr(mouse_lstm_scaler, "mean_", None).shape if mouse_lstm_scaler is not None else None,
-        "mouse_lstm_meta": mouse_lstm_meta,
+        "mouse_lstm_meta": MODELS.peek("mouse_lstm_meta"),
         "flow_scaler": getattr(scaler, "mean_", None).shape if scaler is not None else None
     }
+    # per artifact: state, path, load time, RSS growth while loading
+    status["registry"] = MODELS.status()
+    # this worker's RSS / PSS: with gunicorn preload or MODEL_MMAP=1, PSS drops as workers share pages
+    status["memory"] = memory_report()
+    status["inference"] = INFERENCE.stats()
     status["paths_checked"] = {
         "mouse_lstm_scaler_processed": os.path.abspath(os.path.join(DATA_DIR, "mouse_lstm_scaler.save")),
         "mouse_lstm_scaler_data": os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "data", "mouse_lstm_scaler.save")),
-        "mouse_lstm_model": os.path.abspath(lstm_model_path) if lstm_model_path else None,
+        "mouse_lstm_model": MODELS.path("mouse_lstm"),
         "flow_scaler_candidates": [os.path.abspath(p) for p in [
-            flow_paths.get("scaler"),
+            os.path.join("data", "processed", "scaler_used.save"),
             os.path.join(os.path.dirname(__file__), "..", "data", "scaler_used.save"),
             os.path.join(os.path.dirname(__file__), "..", "data", "processed", "scaler_used.save"),
             os.path.join(os.path.dirname(__file__), "..", "data", "scaler.save"),
@@ -1479,20 +1143,73 @@ def admin_model_status():
     }
     return jsonify(status)
 
+@app.route("/admin/models/reload", methods=["GET"])
+@require_token
+def admin_models_reload_status():
+    return jsonify({"pid": os.getpid(), "last_reload": MODELS.last_reload, "changed": MODELS.changed(),
+                    "versions": {n: st["version"] for n, st in MODELS.status().items()}})
+
+@app.route("/admin/models/reload", methods=["POST"])
+@require_token
+def admin_models_reload():
+    """Load new artifact versions beside the live ones, validate, then swap atomically.
+
+    body: {"models": [...] (default all), "force": false, "wait": false}. Without
+    `wait` the reload runs in the background (202); poll GET for the report.
+
+    This runs in the worker that got the request (its pid is in the report). Once it
+    succeeds it is broadcast through the shared model generation: every other worker
+    and inference process reloads its changed artifacts within MODEL_SYNC_INTERVAL,
+    and GET against a given worker shows that worker's own report.
+    """
+    j = request.get_json(force=True, silent=True) or {}
+    names = j.get("models")
+    if names is not None and (not isinstance(names, list) or not all(isinstance(n, str) for n in names)):
+        return jsonify({"error": "models must be a list of artifact names"}), 400
+    unknown = [n for n in (names or []) if n not in MODELS.names()]
+    if unknown:
+        return jsonify({"error": "unknown models", "unknown": unknown, "known": MODELS.names()}), 400
+    force = bool(j.get("force", False))
+    if j.get("wait"):
+        try:
+            return jsonify(MODELS.reload(names, force=force, broadcast=True)), 200
+        except ReloadError:
+            return jsonify(MODELS.last_reload), 422
+    if MODELS.reload_async(names, force=force, broadcast=True) is None:
+        return jsonify({"error": "a reload is already running", "pid": os.getpid()}), 409
+    return jsonify({"started": True, "pid": os.getpid()}), 202
+
 # -------------------------
 # Serve frontend static files
 # -------------------------
+# HTML pages are served from memory with flow_report.js already injected
+_html_pages = StaticHTMLCache()
+
+def send_page(directory, filename):
+    if not filename.endswith((".html", ".htm")):
+        return send_from_directory(directory, filename)
+    path = safe_join(directory, filename)
+    page = _html_pages.get(path, time.time()) if path else None
+    if page is None:
+        return send_from_directory(directory, filename)
+    resp = Response(page.body, mimetype="text/html")
+    resp.set_etag(page.etag)
+    resp.last_modified = page.mtime
+    resp.cache_control.no_cache = True
+    # 304 on a matching If-None-Match / If-Modified-Since
+    return resp.make_conditional(request)
+
 @app.route("/static/<path:filename>")
 def static_files(filename):
     front = os.path.join(ROOT, "frontend")
-    return send_from_directory(front, filename)
+    return send_page(front, filename)
 
 @app.route("/")
 def render_home():
     index_path = os.path.join(ROOT, "frontend", "index.html")
     if os.path.exists(index_path):
-        return send_from_directory(os.path.join(ROOT, "frontend"), "index.html")
-    return send_from_directory(app.static_folder, 'index.html')
+        return send_page(os.path.join(ROOT, "frontend"), "index.html")
+    return send_page(app.static_folder, 'index.html')
 
 @app.route("/login")
 def render_login():
@@ -1513,7 +1230,7 @@ def render_dashboard():
     tpl = os.path.join(os.path.dirname(__file__), "templates", "dashboard.html")
     if os.path.exists(tpl):
         return render_template("dashboard.html")
-    return send_from_directory(app.static_folder, 'index.html')
+    return send_page(app.static_folder, 'index.html')
 
 @app.route("/mouse_test")
 def render_mouse_test():
@@ -1552,6 +1269,32 @@ def register_socket_handlers(sio):
             socket_emit("connected", {"msg": "Welcome", "sid": getattr(flask_request, "sid", None)})
         except Exception:
             pass
+        sid = getattr(flask_request, "sid", None)
+        if sid:
+            ALERT_FANOUT.add_client(sid)
+
+    @sio.on("disconnect")
+    def _on_disconnect(*args):
+        sid = getattr(flask_request, "sid", None)
+        if sid:
+            ALERT_FANOUT.remove_client(sid)
+
+    # {"models": [...], "min_prob": 0.9, "src_prefix": "10.1.", "labels": [...]}; {} = everything
+    @sio.on("subscribe_alerts")
+    def _on_subscribe_alerts(data=None):
+        sid = getattr(flask_request, "sid", None)
+        try:
+            flt = AlertFilter.from_request(data)
+        except ValueError as e:
+            socket_emit("subscribe_error", {"error": str(e)})
+            return
+        ALERT_FANOUT.subscribe(sid, flt)
+        socket_emit("subscribed", flt.to_dict())
+
+    @sio.on("unsubscribe_alerts")
+    def _on_unsubscribe_alerts(data=None):
+        ALERT_FANOUT.unsubscribe(getattr(flask_request, "sid", None))
+        socket_emit("unsubscribed", {})
 
     @sio.on("ping_models")
     def _on_ping_models(data):
@@ -1569,33 +1312,9 @@ except Exception as _e:
 from flask import request as _flask_request, jsonify as _jsonify
 
 def is_automation(req):
-    ua = req.headers.get("User-Agent", "").lower()
-    webdriver = req.headers.get("X-Requested-With", "")
-    bad_keywords = [
-        "selenium", "webdriver", "headless", "phantomjs",
-        "puppeteer", "playwright", "automation"
-    ]
-
-    if any(k in ua for k in bad_keywords):
-        return True
-
-    if req.headers.get("Sec-Fetch-Mode", "") == "navigate" and "chrome" not in ua:
-        return True
-
-    # Selenium often sends this header
-    if req.headers.get("X-Selenium") == "1":
-        return True
-
-    return False
-
-@app.before_request
-def block_automation():
-    if request.path.startswith("/static") or request.path.startswith("/socket.io"):
-        return None  
+    # checked for every request by request_guard (backend/middleware.py)
+    return is_automation_headers(req.headers)
 
-    if is_automation(request):
-        return jsonify({"error": "Automation detected. Request blocked."}), 403
-    
 @app.route('/db_health')
 def db_health():
     try:
@@ -1610,6 +1329,47 @@ def db_health():
     except Exception as e:
         return {"db": "error", "details": str(e)}, 500
 
+# -------------------------
+# Startup profile
+# -------------------------
+@app.route("/admin/startup")
+def admin_startup():
+    """Import / startup-step / artifact-load timings for this worker, relative to process start."""
+    report = STARTUP.report(top=request.args.get("top", default=25, type=int))
+    report["artifacts"] = {n: {"state": st["state"], "load_ms": st["load_ms"],
+                               "at_ms": STARTUP.offset_ms(st["loaded_at"]) if st["loaded_at"] else None}
+                           for n, st in MODELS.status().items()}
+    return jsonify(report)
+
+# -------------------------
+# Per-process background work
+# -------------------------
+def start_background():
+    """DB warm-up and background threads. Run at import, or, when a preloading gunicorn
+    master imports the app, from post_fork in each worker (see preloading_master())."""
+    global BLOCK_STORE
+    try:
+        with STARTUP.phase("alert hot tier warm"):
+            ALERT_SERVICE.warm()
+    except Exception as e:
+        logger.warning("Alert hot tier not warmed from DB: %s", e)
+    ALERT_SERVICE.start()
+    if BLOCK_STORE is not None:
+        try:
+            with STARTUP.phase("blocklist snapshot load"):
+                BLOCK_STORE.load()
+            BLOCK_STORE.start(BLOCK_SNAPSHOT_INTERVAL)
+        except Exception as e:
+            logger.warning("Blocklist persistence disabled (%s): %s", BLOCK_SNAPSHOT_PATH, e)
+            BLOCK_STORE = None
+    MODELS.watch(MODEL_WATCH_INTERVAL)
+    MODELS.follow(MODEL_SYNC_INTERVAL)
+
+if not preloading_master():
+    start_background()
+
+STARTUP.ready()
+
 # -------------------------
 # Run
 # -------------------------
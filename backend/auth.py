@@ -19,6 +19,11 @@ SECRET_KEY = os.environ.get("SECRET_KEY") or os.environ.get("JWT_SECRET") or os.
 JWT_ALGORITHM = os.environ.get("JWT_ALGORITHM", "HS256")
 JWT_EXPIRES_HOURS = int(os.environ.get("JWT_EXPIRES_HOURS", "8"))
 JWT_REFRESH_EXPIRES_DAYS = int(os.environ.get("JWT_REFRESH_EXPIRES_DAYS", "7"))
+# verified-token cache (backend/token_cache.py); 0 disables
+JWT_CACHE_SIZE = int(os.environ.get("JWT_CACHE_SIZE", "4096"))
+# in-memory refresh-token revocation index (backend/revocation.py)
+REVOKE_BLOOM_CAPACITY = int(os.environ.get("REVOKE_BLOOM_CAPACITY", "100000"))
+REVOKE_SYNC_INTERVAL = float(os.environ.get("REVOKE_SYNC_INTERVAL", "60"))
 
 
 DESIRED_BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", 12))
@@ -29,7 +34,33 @@ logger.setLevel(os.environ.get("AUTH_LOG_LEVEL", "INFO"))
 auth_bp = Blueprint("auth", __name__, template_folder="templates")
 
 # import DB models / helpers (uses backend/db.py)
-from backend.db import get_db_session, User, store_refresh_jti, revoke_refresh_jti, is_refresh_revoked
+from backend.db import (get_db_session, User, store_refresh_jti, revoke_refresh_jti, is_refresh_revoked,
+                        load_revoked_jtis, purge_expired_refresh_tokens)
+from backend.token_cache import TokenCache
+from backend.revocation import RevocationIndex
+from backend.shared_state import generation_from_env
+from backend.startup import preloading_master
+
+# /auth/refresh answers "not revoked" from memory; the DB is only asked on a Bloom hit,
+# or while a revocation made by another worker is not in this worker's filter yet
+REVOCATION_INDEX = RevocationIndex(
+    load_revoked_jtis, is_refresh_revoked,
+    purge=lambda: purge_expired_refresh_tokens(max_age=timedelta(days=JWT_REFRESH_EXPIRES_DAYS)),
+    capacity=REVOKE_BLOOM_CAPACITY, generation=generation_from_env("revocations"))
+
+
+def start_background():
+    """Build the revocation index and start its sync (per process; see preloading_master())."""
+    try:
+        REVOCATION_INDEX.build()
+    except Exception as e:
+        logger.warning("Revocation index unavailable, refresh checks go to the DB until it builds: %s", e)
+    # started even when the first build failed: the sync loop is what retries it
+    REVOCATION_INDEX.start(REVOKE_SYNC_INTERVAL)
+
+
+if not preloading_master():
+    start_background()
 
 # ---------- password policy (server-side) ----------
 ALLOWED_SPECIALS = r"!@#$%^&*()_+\-=\[\]{};':\"\\|,.<>\/\?`~"
@@ -88,15 +119,32 @@ def generate_jwt(payload: dict, expires_delta: Optional[timedelta] = None, typ:
         token = token.decode("utf-8")
     return token
 
+def _decode_token_uncached(token: str) -> dict:
+    return jwt.decode(token, SECRET_KEY, algorithms=[JWT_ALGORITHM])
+
+# repeat tokens (dashboard polling, admin actions) skip the HMAC check until they expire
+TOKEN_CACHE = TokenCache(_decode_token_uncached, max_entries=JWT_CACHE_SIZE)
+
 def decode_token(token: str) -> dict:
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[JWT_ALGORITHM])
+        payload = TOKEN_CACHE.verify(token)
         return payload
     except jwt.ExpiredSignatureError:
         raise
     except jwt.InvalidTokenError:
         raise
 
+def revoke_token(token: str):
+    """Reject `token` (and, for refresh tokens, its jti) for the rest of its lifetime."""
+    try:
+        payload = decode_token(token)
+    except jwt.InvalidTokenError:
+        return
+    exp = payload.get("exp")
+    TOKEN_CACHE.revoke(token, expires_at=float(exp) if exp else None)
+    if payload.get("jti"):
+        TOKEN_CACHE.revoke_jti(payload["jti"], expires_at=float(exp) if exp else None)
+
 #DB helpers: create/verify users
 def create_user(username: str, password: str, email: Optional[str] = None) -> dict:
     session = get_db_session()
@@ -265,7 +313,7 @@ def route_whoami():
         return jsonify({"error": "Token missing"}), 401
     try:
         token = auth_header.split(" ")[1]
-        decoded = jwt.decode(token, SECRET_KEY, algorithms=[JWT_ALGORITHM])
+        decoded = decode_token(token)
         return jsonify({"user": decoded})
     except Exception as e:
         return jsonify({"error": "invalid_token", "detail": str(e)}), 401
@@ -284,7 +332,7 @@ def refresh_token():
         return jsonify({"error":"invalid token"}), 401
 
     jti = payload.get("jti")
-    if not jti or is_refresh_revoked(jti):
+    if not jti or REVOCATION_INDEX.is_revoked(jti):
         return jsonify({"error":"revoked"}), 401
 
     user_id = payload.get("sub")
@@ -306,6 +354,8 @@ def logout():
                 jti = payload.get("jti")
                 if jti:
                     revoke_refresh_jti(jti)
+                    REVOCATION_INDEX.add(jti)
+                    revoke_token(token)
                     return jsonify({"status":"ok"}), 200
             except Exception:
                 pass
@@ -320,7 +370,13 @@ def logout():
     if jti:
         try:
             revoke_refresh_jti(jti)
+            REVOCATION_INDEX.add(jti)
         except Exception as e:
             logger.warning("Failed to revoke refresh jti: %s", e)
-            
+    revoke_token(refresh)
+    # the access token presented with the logout stops working in this worker too
+    auth_header = request.headers.get("Authorization", "")
+    if auth_header and " " in auth_header:
+        revoke_token(auth_header.split(" ", 1)[1])
+
     return jsonify({"status":"ok"}), 200
\ No newline at end of file
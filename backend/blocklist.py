@@ -0,0 +1,199 @@
+# backend/blocklist.py
+
+import heapq
+import socket
+import ipaddress
+import logging
+import threading
+import time
+from array import array
+from operator import itemgetter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger("ai_ml_cyberdefense.blocklist")
+logger.setLevel(logging.INFO)
+
+
+def parse_cidr(entry: str) -> Optional[Tuple[int, int, int]]:
+    """'10.1.2.0/24' -> (32, 24, network int); None for anything that is not a prefix."""
+    if not entry or "/" not in entry:
+        return None
+    try:
+        net = ipaddress.ip_network(entry.strip(), strict=False)
+    except ValueError:
+        return None
+    return net.max_prefixlen, net.prefixlen, int(net.network_address)
+
+
+by_expiry = itemgetter(1)
+
+
+def net_str(bits: int, plen: int, net: int) -> str:
+    addr = ipaddress.IPv4Address(net) if bits == 32 else ipaddress.IPv6Address(net)
+    return "%s/%d" % (addr, plen)
+
+
+def ip_to_int(ip: str) -> Optional[Tuple[int, int]]:
+    # (address bits, value) or None when `ip` is not a literal address
+    try:
+        if ":" in ip:
+            return 128, int.from_bytes(socket.inet_pton(socket.AF_INET6, ip), "big")
+        return 32, int.from_bytes(socket.inet_pton(socket.AF_INET, ip), "big")
+    except (OSError, TypeError, ValueError):
+        return None
+
+
+class Blocklist:
+    """Expiring blocklist of exact keys (IPs, flow keys) and CIDR prefixes.
+
+    Exact entries are a dict (O(1) lookups). Prefixes live in one hash table per
+    (family, prefix length), so a longest-prefix style lookup is a handful of dict
+    probes - one per distinct prefix length in use - regardless of how many prefixes
+    are blocked. Expiry is tracked in a min-heap of (unblock_at, entry); stale heap
+    items left behind by re-blocks or unblocks are skipped when they surface.
+
+    Reads (is_blocked) do not take the lock: single dict lookups are atomic in CPython
+    and an entry that expires mid-check is rejected by its timestamp anyway.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._exact: Dict[str, float] = {}
+        self._nets: Dict[Tuple[int, int], Dict[int, float]] = {}
+        # prefix lengths in use per address width, longest first
+        self._lengths: Dict[int, List[int]] = {32: [], 128: []}
+        self._heap: List[Tuple[float, str]] = []
+        # bulk-loaded entries (load_sorted) expire from this ascending run instead of the heap
+        self._run_ts = array("d")
+        self._run_keys: List[str] = []
+        self._run_pos = 0
+
+    def __len__(self):
+        return len(self._exact) + sum(len(t) for t in self._nets.values())
+
+    def add(self, entry: str, unblock_at: float):
+        cidr = parse_cidr(entry)
+        with self._lock:
+            if cidr is None:
+                self._exact[entry] = unblock_at
+            else:
+                bits, plen, net = cidr
+                entry = net_str(bits, plen, net)
+                table = self._nets.get((bits, plen))
+                if table is None:
+                    table = self._nets[(bits, plen)] = {}
+                    self._lengths[bits] = sorted(self._lengths[bits] + [plen], reverse=True)
+                table[net] = unblock_at
+            heapq.heappush(self._heap, (unblock_at, entry))
+            self._purge_locked(time.time())
+            # re-blocking the same entry leaves old heap items; rebuild when they pile up
+            if len(self._heap) > 2 * len(self) + 1024:
+                self._heap = [(v, k) for k, v in self._iter_locked()]
+                heapq.heapify(self._heap)
+                self._run_ts, self._run_keys, self._run_pos = array("d"), [], 0
+
+    def remove(self, entry: str) -> bool:
+        with self._lock:
+            return self._drop_locked(entry)
+
+    def _drop_locked(self, entry: str, unblock_at: Optional[float] = None) -> bool:
+        # removes `entry`; with unblock_at, only if it still carries that expiry
+        cidr = parse_cidr(entry)
+        if cidr is None:
+            table, k = self._exact, entry
+        else:
+            bits, plen, k = cidr
+            table = self._nets.get((bits, plen))
+            if table is None:
+                return False
+        cur = table.get(k)
+        if cur is None or (unblock_at is not None and cur != unblock_at):
+            return False
+        del table[k]
+        if cidr is not None and not table:
+            del self._nets[(bits, plen)]
+            self._lengths[bits] = [p for p in self._lengths[bits] if p != plen]
+        return True
+
+    def _purge_locked(self, now: float) -> int:
+        heap = self._heap
+        n = 0
+        while heap and heap[0][0] <= now:
+            unblock_at, entry = heapq.heappop(heap)
+            if self._drop_locked(entry, unblock_at):
+                n += 1
+        run_ts, pos = self._run_ts, self._run_pos
+        end = len(run_ts)
+        while pos < end and run_ts[pos] <= now:
+            if self._drop_locked(self._run_keys[pos], run_ts[pos]):
+                n += 1
+            pos += 1
+        if pos and pos == end:
+            self._run_ts, self._run_keys, pos = array("d"), [], 0
+        self._run_pos = pos
+        return n
+
+    def purge(self, now: Optional[float] = None) -> int:
+        """Drop every expired entry; O(k log n) for k expired entries."""
+        with self._lock:
+            return self._purge_locked(time.time() if now is None else now)
+
+    def is_blocked(self, entry: str, now: Optional[float] = None) -> bool:
+        if now is None:
+            now = time.time()
+        ts = self._exact.get(entry)
+        if ts is not None and ts > now:
+            return True
+        if not self._nets:
+            return False
+        addr = ip_to_int(entry)
+        if addr is None:
+            return False
+        bits, value = addr
+        nets = self._nets
+        for plen in self._lengths[bits]:
+            table = nets.get((bits, plen))
+            if table:
+                ts = table.get(value >> (bits - plen) << (bits - plen))
+                if ts is not None and ts > now:
+                    return True
+        return False
+
+    def _iter_locked(self):
+        yield from self._exact.items()
+        for (bits, plen), table in self._nets.items():
+            for net, ts in table.items():
+                yield net_str(bits, plen, net), ts
+
+    def items(self) -> Dict[str, float]:
+        """Live entries -> unblock_at (expired ones are purged first)."""
+        with self._lock:
+            self._purge_locked(time.time())
+            return dict(self._iter_locked())
+
+    def dump(self) -> Tuple[List[Tuple[str, float]], List[Tuple[str, float]]]:
+        """Live (exact, prefix) entries as (entry, unblock_at) lists, unordered.
+
+        Only copies under the lock; sort the result (by_expiry) outside it.
+        """
+        with self._lock:
+            self._purge_locked(time.time())
+            exact = list(self._exact.items())
+            nets = [(net_str(bits, plen, net), ts) for (bits, plen), table in self._nets.items()
+                    for net, ts in table.items()]
+        return exact, nets
+
+    def load_sorted(self, keys: Sequence[str], unblock_at: array):
+        """Bulk-load exact entries whose unblock_at (array('d')) is ascending.
+
+        They are kept as a sorted run next to the heap, so restoring a large snapshot
+        costs one dict build instead of a million heap pushes.
+        """
+        with self._lock:
+            self._exact.update(zip(keys, unblock_at.tolist()))
+            if self._run_pos < len(self._run_ts):
+                # a second bulk load while the first is still live: fold it into the heap
+                for k, v in zip(keys, unblock_at):
+                    heapq.heappush(self._heap, (v, k))
+            else:
+                self._run_ts, self._run_keys, self._run_pos = array("d", unblock_at), list(keys), 0
@@ -0,0 +1,264 @@
+# backend/blocklist_store.py
+
+import os
+import time
+import fcntl
+import struct
+import bisect
+import logging
+import threading
+from array import array
+from typing import Optional
+
+from backend.blocklist import Blocklist, by_expiry
+
+logger = logging.getLogger("ai_ml_cyberdefense.blocklist_store")
+logger.setLevel(logging.INFO)
+
+# snapshot: header, then for the exact and the prefix section each a float64 array of
+# unblock_at (ascending) followed by the "\n"-joined UTF-8 entries in the same order
+_SNAP_MAGIC = b"AICDSNP1"
+_SNAP_HDR = struct.Struct("<8sQQQQ")   # magic, n_exact, exact blob bytes, n_nets, nets blob bytes
+# journal: one record per add_block/remove_block, appended with a single write()
+_J_REC = struct.Struct("<BdH")          # op, unblock_at, entry length
+_J_ADD = 1
+_J_REMOVE = 2
+
+
+class BlocklistStore:
+    """Snapshot + append-only journal persistence for a blocklist.
+
+    Every add/remove goes through the store, which applies it and appends a journal
+    record under a shared flock; restart = load snapshot + replay journal. Replaying
+    is idempotent, so an operation seen by both is harmless.
+
+    snapshot() folds the journal into a new snapshot: it notes the journal size under
+    the exclusive lock, rebuilds the state from the old snapshot plus that journal
+    prefix, writes it to `path` (write-then-rename) unlocked, then drops the prefix.
+    It works from the files rather than from this worker's blocklist, because with
+    the default local state each worker only sees its own blocks. Of the workers
+    sharing `path` only one - whichever holds the non-blocking flock on
+    `path`.lock - snapshots; the others skip until it exits and one of them takes
+    over, so the snapshot and the journal are never rewritten concurrently.
+    """
+
+    def __init__(self, blocklist, path: str, fsync: bool = False):
+        self.blocklist = blocklist
+        self.path = path
+        self.journal_path = path + ".journal"
+        self.fsync = fsync
+        self._pid = None
+        self._fd = -1
+        self._tlock = threading.Lock()
+        self._leader_pid = None
+        self._leader_fd = -1
+        self._leader = False
+
+    def _journal_fd(self) -> int:
+        # one O_APPEND descriptor per process: flock on an inherited descriptor would
+        # not exclude the sibling workers it was shared with
+        if self._pid != os.getpid():
+            d = os.path.dirname(self.journal_path)
+            if d:
+                os.makedirs(d, exist_ok=True)
+            self._fd = os.open(self.journal_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+            self._pid = os.getpid()
+        return self._fd
+
+    # ---- writes ----
+    def _record(self, op: int, entry: str, unblock_at: float):
+        kb = entry.encode("utf-8")
+        if len(kb) > 0xFFFF or "\n" in entry:
+            logger.warning("blocklist entry not journaled (too long or multi-line): %r", entry[:64])
+            return
+        fd = self._journal_fd()
+        with self._tlock:
+            fcntl.flock(fd, fcntl.LOCK_SH)
+            try:
+                if op == _J_ADD:
+                    self.blocklist.add(entry, unblock_at)
+                else:
+                    self.blocklist.remove(entry)
+                os.write(fd, _J_REC.pack(op, unblock_at, len(kb)) + kb)
+                if self.fsync:
+                    os.fsync(fd)
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+
+    def add(self, entry: str, unblock_at: float):
+        self._record(_J_ADD, entry, unblock_at)
+
+    def remove(self, entry: str):
+        self._record(_J_REMOVE, entry, 0.0)
+
+    def _lead(self) -> bool:
+        # the lock is held until the process exits; like the journal descriptor it is
+        # reopened after a fork so that siblings really compete for it
+        if self._leader_pid != os.getpid():
+            self._leader_fd = os.open(self.path + ".lock", os.O_RDWR | os.O_CREAT, 0o600)
+            self._leader_pid = os.getpid()
+            self._leader = False
+        if not self._leader:
+            try:
+                fcntl.flock(self._leader_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return False
+            self._leader = True
+            logger.info("blocklist snapshots are taken by pid %d", os.getpid())
+        return True
+
+    def snapshot(self) -> int:
+        """Fold the journal into a new snapshot; returns the entries written, or -1
+        when another process is the snapshotter."""
+        if not self._lead():
+            return -1
+        t0 = time.time()
+        fd = self._journal_fd()
+        # 1) note how much journal the new snapshot will cover (writers wait only for the stat)
+        with self._tlock:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                st = os.fstat(fd)
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        covered = st.st_size
+
+        # 2) old snapshot + journal prefix -> new snapshot, without holding anything:
+        # only the leader replaces the snapshot or truncates the journal
+        state = Blocklist()
+        now = time.time()
+        self._load_snapshot(now, state)
+        self._replay_journal(now, state, covered)
+        exact, nets = state.dump()
+        exact.sort(key=by_expiry)
+        nets.sort(key=by_expiry)
+        sections = []
+        for entries in (exact, nets):
+            entries = [kv for kv in entries if "\n" not in kv[0]]
+            ts = array("d", [v for _, v in entries])
+            blob = "\n".join(k for k, _ in entries).encode("utf-8")
+            sections.append((len(entries), ts, blob))
+        tmp = "%s.tmp.%d" % (self.path, os.getpid())
+        with open(tmp, "wb") as fh:
+            fh.write(_SNAP_HDR.pack(_SNAP_MAGIC, sections[0][0], len(sections[0][2]), sections[1][0], len(sections[1][2])))
+            for _, ts, blob in sections:
+                fh.write(ts.tobytes())
+                fh.write(blob)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp, self.path)
+
+        # 3) drop the journal prefix the snapshot now covers, keep what came after it
+        with self._tlock:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                try:
+                    same = os.stat(self.journal_path).st_ino == st.st_ino
+                except FileNotFoundError:
+                    same = False
+                if same:
+                    with open(self.journal_path, "rb") as fh:
+                        fh.seek(covered)
+                        tail = fh.read()
+                    os.ftruncate(fd, 0)
+                    if tail:
+                        os.write(fd, tail)
+                else:
+                    # replaced or removed under us: replaying it again is harmless, cutting it is not
+                    logger.warning("blocklist journal %s changed during snapshot; not truncated", self.journal_path)
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        n = sections[0][0] + sections[1][0]
+        logger.info("blocklist snapshot: %d entries in %.1f ms", n, (time.time() - t0) * 1000.0)
+        return n
+
+    # ---- restore ----
+    def load(self) -> int:
+        """Restore snapshot + journal into the blocklist, skipping expired entries."""
+        t0 = time.time()
+        now = t0
+        fd = self._journal_fd()
+        with self._tlock:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                if not isinstance(self.blocklist, Blocklist) and self.blocklist.items():
+                    # shared state already populated (another worker or a persistent backend)
+                    return 0
+                n = self._load_snapshot(now, self.blocklist)
+                n += self._replay_journal(now, self.blocklist)
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        logger.info("blocklist restored: %d entries in %.1f ms", n, (time.time() - t0) * 1000.0)
+        return n
+
+    def _load_snapshot(self, now: float, target) -> int:
+        try:
+            with open(self.path, "rb") as fh:
+                data = fh.read()
+        except FileNotFoundError:
+            return 0
+        if len(data) < _SNAP_HDR.size:
+            logger.warning("blocklist snapshot %s truncated; ignoring", self.path)
+            return 0
+        magic, n_exact, exact_len, n_nets, nets_len = _SNAP_HDR.unpack_from(data, 0)
+        if magic != _SNAP_MAGIC or len(data) < _SNAP_HDR.size + 8 * (n_exact + n_nets) + exact_len + nets_len:
+            logger.warning("blocklist snapshot %s unreadable; ignoring", self.path)
+            return 0
+        off = _SNAP_HDR.size
+        loaded = 0
+        for n, blob_len, exact in ((n_exact, exact_len, True), (n_nets, nets_len, False)):
+            ts = array("d")
+            ts.frombytes(data[off:off + 8 * n])
+            off += 8 * n
+            keys = data[off:off + blob_len].decode("utf-8").split("\n") if n else []
+            off += blob_len
+            # entries are sorted by expiry: everything expired is a prefix
+            start = bisect.bisect_right(ts, now)
+            if exact and isinstance(target, Blocklist):
+                target.load_sorted(keys[start:], ts[start:])
+            else:
+                for k, v in zip(keys[start:], ts[start:]):
+                    target.add(k, v)
+            loaded += n - start
+        return loaded
+
+    def _replay_journal(self, now: float, target, end: Optional[int] = None) -> int:
+        # replays the whole journal, or only its first `end` bytes
+        try:
+            with open(self.journal_path, "rb") as fh:
+                data = fh.read() if end is None else fh.read(end)
+        except FileNotFoundError:
+            return 0
+        off = 0
+        end = len(data)
+        n = 0
+        hs = _J_REC.size
+        while off + hs <= end:
+            op, unblock_at, klen = _J_REC.unpack_from(data, off)
+            if off + hs + klen > end:
+                break   # torn final record
+            entry = data[off + hs:off + hs + klen].decode("utf-8", "replace")
+            off += hs + klen
+            if op == _J_ADD:
+                if unblock_at > now:
+                    target.add(entry, unblock_at)
+                    n += 1
+            elif op == _J_REMOVE:
+                target.remove(entry)
+        return n
+
+    def start(self, interval: float) -> Optional[threading.Thread]:
+        if interval <= 0:
+            return None
+
+        def _loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.snapshot()
+                except Exception as e:
+                    logger.warning("blocklist snapshot failed: %s", e)
+
+        t = threading.Thread(target=_loop, name="blocklist-snapshot", daemon=True)
+        t.start()
+        return t
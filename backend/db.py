@@ -10,7 +10,7 @@ from sqlalchemy import (
     Column, Integer, String, DateTime, Text, create_engine, Boolean, Float, ForeignKey, BigInteger, Index
 )
 from sqlalchemy.orm import declarative_base, sessionmaker
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.exc import SQLAlchemyError, IntegrityError
 from sqlalchemy.types import JSON as SA_JSON, TypeDecorator
 from sqlalchemy import Enum as SA_Enum
 from dotenv import load_dotenv
@@ -21,6 +21,7 @@ logger.setLevel(logging.INFO)
 
 Base = declarative_base()
 DB_SESSION = None
+ENGINE = None     # kept so a forked worker can drop the pool it inherited (gunicorn.conf.py)
 
 class JSONText(TypeDecorator):
     impl = Text
@@ -173,14 +174,18 @@ def store_refresh_jti(jti: str, expires_at: Optional[datetime] = None, meta: Opt
 
     session = get_db_session()
     try:
+        # jtis are fresh uuid4s: insert first, update only if the row already exists
+        try:
+            session.add(RefreshToken(jti=jti, revoked=False, expires_at=expires_at, meta=_json_to_text(meta)))
+            session.commit()
+            return
+        except IntegrityError:
+            session.rollback()
         existing = session.query(RefreshToken).filter(RefreshToken.jti == jti).first()
         if existing:
             existing.revoked = False
             existing.expires_at = expires_at
             existing.meta = _json_to_text(meta)
-        else:
-            rt = RefreshToken(jti=jti, revoked=False, expires_at=expires_at, meta=_json_to_text(meta))
-            session.add(rt)
         session.commit()
     except Exception as e:
         session.rollback()
@@ -226,6 +231,37 @@ def is_refresh_revoked(jti: str) -> bool:
     finally:
         session.close()
 
+def load_revoked_jtis() -> List[str]:
+    """jti of every revoked, not yet expired refresh token (feeds the in-memory revocation index)."""
+    session = get_db_session()
+    try:
+        now = datetime.utcnow()
+        rows = (session.query(RefreshToken.jti)
+                .filter(RefreshToken.revoked.is_(True))
+                .filter((RefreshToken.expires_at.is_(None)) | (RefreshToken.expires_at >= now))
+                .all())
+        return [r[0] for r in rows]
+    finally:
+        session.close()
+
+def purge_expired_refresh_tokens(max_age: Optional[timedelta] = None) -> int:
+    """Delete rows past expires_at; rows without one once older than max_age."""
+    session = get_db_session()
+    try:
+        now = datetime.utcnow()
+        cond = (RefreshToken.expires_at.isnot(None)) & (RefreshToken.expires_at < now)
+        if max_age is not None:
+            cond = cond | ((RefreshToken.expires_at.is_(None)) & (RefreshToken.created_at < now - max_age))
+        n = session.query(RefreshToken).filter(cond).delete(synchronize_session=False)
+        session.commit()
+        return n
+    except Exception as e:
+        session.rollback()
+        logger.exception("purge_expired_refresh_tokens failed: %s", e)
+        raise
+    finally:
+        session.close()
+
 
 def get_database_url() -> str:
     
@@ -257,7 +293,7 @@ def get_database_url() -> str:
 
 def init_db(echo: bool = False):
 
-    global DB_SESSION
+    global DB_SESSION, ENGINE
     database_url = get_database_url()
     safe_url = database_url
     try:
@@ -281,6 +317,7 @@ def init_db(echo: bool = False):
 
     
     Base.metadata.create_all(engine)
+    ENGINE = engine
     DB_SESSION = sessionmaker(bind=engine)
     return DB_SESSION
 
@@ -450,6 +487,53 @@ def get_latest_alerts(limit: int = 100) -> List[Dict]:
         session.close()
 
 
+def _alert_row(r) -> Dict:
+    return {
+        "id": r.id,
+        "atype": r.atype,
+        "score": r.score,
+        "label": r.label,
+        "src_ip": r.src_ip,
+        "dst_ip": r.dst_ip,
+        "meta": _text_to_json(r.meta),
+        "created_at": r.created_at.isoformat() if r.created_at else None,
+        "handled": bool(r.handled)
+    }
+
+
+def get_alerts_before(limit: int = 100, before_id: Optional[int] = None, since: Optional[datetime] = None) -> List[Dict]:
+    """
+    Keyset page, newest first: alerts with id < before_id (and created_at >= since).
+    Rides the primary key, so deep pages cost the same as the first one.
+    """
+    session = get_db_session()
+    try:
+        q = session.query(Alert)
+        if before_id is not None:
+            q = q.filter(Alert.id < before_id)
+        if since is not None:
+            q = q.filter(Alert.created_at >= since)
+        return [_alert_row(r) for r in q.order_by(Alert.id.desc()).limit(limit).all()]
+    except SQLAlchemyError as e:
+        logger.exception("get_alerts_before SQL error: %s", e)
+        raise
+    finally:
+        session.close()
+
+
+def get_alerts_after(after_id: int, limit: int = 1000) -> List[Dict]:
+    """Alerts with id > after_id, oldest first (tailing the table)."""
+    session = get_db_session()
+    try:
+        rows = session.query(Alert).filter(Alert.id > after_id).order_by(Alert.id.asc()).limit(limit).all()
+        return [_alert_row(r) for r in rows]
+    except SQLAlchemyError as e:
+        logger.exception("get_alerts_after SQL error: %s", e)
+        raise
+    finally:
+        session.close()
+
+
 def get_alert_by_id(aid: int) -> Optional[Dict]:
     session = get_db_session()
     try:
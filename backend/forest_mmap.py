@@ -0,0 +1,150 @@
+# backend/forest_mmap.py
+
+import os
+import json
+import shutil
+import logging
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+logger = logging.getLogger("ai_ml_cyberdefense.forest_mmap")
+logger.setLevel(logging.INFO)
+
+_ARRAYS = ("left", "right", "feature", "threshold", "value")
+_FORMAT = 1
+
+
+class MmapForest:
+    """A fitted random forest whose node arrays are memory-mapped .npy files.
+
+    sklearn's Tree copies its node arrays into private memory when unpickled, so
+    every worker holds its own copy of the forest. Here all trees are flattened into
+    five arrays (children, split feature, threshold, per-node class distribution)
+    that are opened with mmap_mode="r": workers on one host read the same page-cache
+    pages, and nothing is unpickled at all.
+
+    predict_proba() walks every tree for every row at once, one tree level per numpy
+    step, and matches sklearn: X is cast to float32 and compared with `<=` against
+    the float64 thresholds; tree outputs are normalised and averaged.
+    """
+
+    def __init__(self, directory: str):
+        with open(os.path.join(directory, "forest.json"), "r") as f:
+            meta = json.load(f)
+        if meta.get("format") != _FORMAT:
+            raise ValueError("%s: unsupported forest export format %r" % (directory, meta.get("format")))
+        self.directory = directory
+        self.meta = meta
+        for name in _ARRAYS:
+            setattr(self, "_" + name, np.load(os.path.join(directory, name + ".npy"), mmap_mode="r"))
+        self._roots = np.asarray(meta["roots"], dtype=np.int64)
+        self.max_depth = int(meta["max_depth"])
+        self.n_features_in_ = int(meta["n_features"])
+        self.classes_ = np.asarray(meta["classes"])
+        self.n_classes_ = len(self.classes_)
+        self.n_estimators = len(self._roots)
+
+    def _leaves(self, X) -> np.ndarray:
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError("X has %s features, the forest expects %d" % (X.shape[1:] or "no", self.n_features_in_))
+        left, right, feature, threshold = self._left, self._right, self._feature, self._threshold
+        node = np.repeat(self._roots[None, :], X.shape[0], axis=0)
+        rows = np.arange(X.shape[0])[:, None]
+        for _ in range(self.max_depth):
+            child = left[node]
+            inner = child != -1
+            if not inner.any():
+                break
+            go_left = X[rows, np.where(inner, feature[node], 0)] <= threshold[node]
+            node = np.where(inner, np.where(go_left, child, right[node]), node)
+        return node
+
+    def predict_proba(self, X) -> np.ndarray:
+        return self._value[self._leaves(X)].mean(axis=1)
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
+def export_forest(model, directory: str, source: Optional[Dict[str, Any]] = None) -> str:
+    """Write `model` (a fitted single-output sklearn forest) as MmapForest files.
+
+    Files go to a temporary sibling first and are renamed into place, so workers
+    exporting the same model at once never see a half-written directory.
+    """
+    trees = [e.tree_ for e in model.estimators_]
+    if getattr(model, "n_outputs_", 1) != 1:
+        raise ValueError("only single-output forests can be exported")
+    sizes = [t.node_count for t in trees]
+    roots = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.int64)
+
+    left, right, feature, threshold, value = [], [], [], [], []
+    for t, off in zip(trees, roots):
+        cl, cr = t.children_left.astype(np.int64), t.children_right.astype(np.int64)
+        leaf = cl == -1
+        left.append(np.where(leaf, -1, cl + off))
+        right.append(np.where(leaf, -1, cr + off))
+        feature.append(t.feature.astype(np.int64))
+        threshold.append(t.threshold.astype(np.float64))
+        v = t.value[:, 0, :].astype(np.float64)
+        totals = v.sum(axis=1, keepdims=True)
+        value.append(v / np.where(totals == 0, 1.0, totals))
+    arrays = {"left": np.concatenate(left), "right": np.concatenate(right), "feature": np.concatenate(feature),
+              "threshold": np.concatenate(threshold), "value": np.concatenate(value)}
+    meta = {"format": _FORMAT, "roots": roots.tolist(), "max_depth": int(max(t.max_depth for t in trees)) + 1,
+            "n_features": int(model.n_features_in_), "classes": np.asarray(model.classes_).tolist(),
+            "source": source or {}}
+
+    tmp = "%s.tmp-%d" % (directory, os.getpid())
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    for name, arr in arrays.items():
+        np.save(os.path.join(tmp, name + ".npy"), np.ascontiguousarray(arr))
+    with open(os.path.join(tmp, "forest.json"), "w") as f:
+        json.dump(meta, f)
+    try:
+        os.rename(tmp, directory)
+    except OSError:
+        # another worker exported the same version first
+        shutil.rmtree(tmp, ignore_errors=True)
+    return directory
+
+
+def load_forest_mmap(path: str, cache_dir: str):
+    """Forest at `path` (a joblib file) as an MmapForest, exporting it on first use.
+
+    The export lives in `cache_dir/<file>-<mtime>-<size>`, so a retrained model gets a
+    new directory; older exports of the same file are removed (workers that still map
+    them keep their pages until they let go). Anything that is not an exportable
+    forest, or an export whose scores disagree with the original, is returned as the
+    plain unpickled model.
+    """
+    st = os.stat(path)
+    base = os.path.basename(path)
+    tag = "%s-%d-%d" % (base, st.st_mtime_ns, st.st_size)
+    directory = os.path.join(cache_dir, tag)
+    if os.path.exists(os.path.join(directory, "forest.json")):
+        return MmapForest(directory)
+
+    import joblib
+    model = joblib.load(path)
+    if not hasattr(model, "estimators_") or not all(hasattr(e, "tree_") for e in model.estimators_):
+        return model
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        export_forest(model, directory, source={"path": path, "mtime_ns": st.st_mtime_ns, "size": st.st_size})
+        forest = MmapForest(directory)
+        X = np.random.RandomState(0).normal(size=(64, forest.n_features_in_))
+        if not np.allclose(forest.predict_proba(X), model.predict_proba(X), atol=1e-9):
+            raise ValueError("exported forest disagrees with the original")
+    except Exception as e:
+        logger.warning("mmap export of %s failed, using the unpickled model: %s", path, e)
+        shutil.rmtree(directory, ignore_errors=True)
+        return model
+    for old in os.listdir(cache_dir):
+        if old.startswith(base + "-") and old != tag and ".tmp-" not in old:
+            shutil.rmtree(os.path.join(cache_dir, old), ignore_errors=True)
+    logger.info("Exported %s to %s (%d trees)", base, directory, forest.n_estimators)
+    return forest
@@ -0,0 +1,410 @@
+# backend/inference_pool.py
+
+import os
+import sys
+import types
+import atexit
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from backend.model_registry import MODELS, FLOW_MODELS, MOUSE_MODELS, MODEL_WATCH_INTERVAL, MODEL_SYNC_INTERVAL
+from backend.mouse_model import extract_features_from_events, selected_indices
+from backend.startup import STARTUP
+
+logger = logging.getLogger("ai_ml_cyberdefense.inference")
+logger.setLevel(logging.INFO)
+
+INFERENCE_WORKERS = int(os.environ.get("INFERENCE_WORKERS", 0))                     # 0 = score on the request thread
+INFERENCE_START_METHOD = os.environ.get("INFERENCE_START_METHOD", "forkserver")     # never "fork" a threaded server
+INFERENCE_TIMEOUT = float(os.environ.get("INFERENCE_TIMEOUT", 10.0))                # seconds per scoring call
+INFERENCE_SHM_SLOT_BYTES = int(os.environ.get("INFERENCE_SHM_SLOT_BYTES", 1 << 20))  # pooled shared-memory block size
+# models each pool process loads before taking work (comma list; default: all flow + mouse)
+INFERENCE_PRELOAD = os.environ.get("INFERENCE_PRELOAD", "")
+
+
+# -------------------------
+# Tasks: run in the pool processes, or inline; models are bound once, at entry
+# -------------------------
+def score_flow(X: np.ndarray) -> Dict[str, Any]:
+    """RF / XGBoost attack probability for the first row of X (features, unscaled)."""
+    rf, scaler, xgb_model = MODELS.get_many(*FLOW_MODELS)
+    try:
+        X_scaled = scaler.transform(X) if scaler is not None else X
+    except Exception:
+        X_scaled = X
+    out = {}
+    try:
+        if rf is not None:
+            out["rf"] = float(rf.predict_proba(X_scaled)[0, 1])
+    except Exception as e:
+        out["rf_error"] = str(e)
+    try:
+        if xgb_model is not None:
+            xgb = STARTUP.lazy_import("xgboost", "flow scoring (XGBoost)")
+            out["xgb"] = float(xgb_model.predict(xgb.DMatrix(X_scaled))[0])
+    except Exception as e:
+        out["xgb_error"] = str(e)
+    return out
+
+
+def score_mouse_windows(events: np.ndarray, window_size=None, stride=None, min_events=40, threshold=0.65,
+                        min_windows_above_thresh=2) -> Dict[str, Any]:
+    """Sliding-window RF (+ LSTM) bot score over an events_to_array() session."""
+    mouse_rf, mouse_scaler, mouse_lstm_model, mouse_lstm_scaler, mouse_lstm_meta = MODELS.get_many(*MOUSE_MODELS)
+
+    if mouse_lstm_meta and window_size is None:
+        window_size = int(mouse_lstm_meta.get("window", 10))
+    if window_size is None:
+        window_size = 10
+
+    if stride is None:
+        stride = max(1, window_size // 2)
+
+    # if too few raw events, avoid unstable predictions — return low-confidence human
+    if len(events) < min_events:
+        # try a quick heuristic: still allow RF if available but mark low confidence
+        try:
+            feats = extract_features_from_events(events)
+            X_full = np.array(feats).reshape(1, -1)
+
+            try:
+                X = X_full[:, selected_indices]
+            except Exception:
+                X = X_full
+            Xs = mouse_scaler.transform(X) if mouse_scaler is not None else X
+            prob_rf = float(mouse_rf.predict_proba(Xs)[0, 1]) if mouse_rf is not None else None
+        except Exception:
+            prob_rf = None
+
+        confidence = prob_rf if prob_rf is not None else 0.05
+        label = "bot" if confidence >= (threshold + 0.05) else "human"
+        return {
+            "label": label,
+            "confidence": float(confidence),
+            "models": (["rf"] if prob_rf is not None else []),
+            "details": {"reason": "insufficient_events", "n_events": len(events)}
+        }
+
+    # build windows
+    windows = []
+    for i in range(0, max(1, len(events) - window_size + 1), stride):
+        w = events[i:i+window_size]
+        feats = extract_features_from_events(w)
+        windows.append(np.asarray(feats, dtype=float))
+    # if windows is empty (very short), fallback to whole session features
+    if len(windows) == 0:
+        windows = [np.asarray(extract_features_from_events(events), dtype=float)]
+
+    # prepare arrays
+    probs_per_window = []   # list of averaged probs per window
+    model_sources = set()
+    details = {"window_count": len(windows), "per_window": []}
+
+    for w_vec in windows:
+        try:
+            Xw = np.array(w_vec, dtype=float).reshape(1, -1)[:, selected_indices]
+        except Exception:
+            Xw = np.asarray(w_vec).reshape(1, -1)
+
+        try:
+            Xw_sel = Xw[:, selected_indices]
+        except Exception:
+            Xw_sel = Xw
+
+        # RF branch
+        prob_rf = None
+        try:
+            if mouse_rf is not None and mouse_scaler is not None:
+                Xw_rf = mouse_scaler.transform(Xw_sel)
+            elif mouse_rf is not None:
+                Xw_rf = Xw_sel
+            else:
+                Xw_rf = None
+
+            if Xw_rf is not None and mouse_rf is not None:
+                prob_rf = float(mouse_rf.predict_proba(Xw_rf)[0, 1])
+                model_sources.add("rf")
+        except Exception:
+            prob_rf = None
+
+        # LSTM branch (build sequence when possible)
+        prob_lstm = None
+        try:
+            if mouse_lstm_model is not None and mouse_lstm_scaler is not None and mouse_lstm_meta is not None:
+                expected_dim = getattr(mouse_lstm_scaler, "mean_", None).shape[0]
+                if Xw_sel.shape[1] == expected_dim:
+                    # scale and create seq shape (1, seq_len, feat_dim)
+                    seq_len = int(mouse_lstm_meta.get("seq_len", 8))
+                    feat_dim = int(mouse_lstm_meta.get("feat_dim", Xw_sel.shape[1]))
+                    Xw_scaled = mouse_lstm_scaler.transform(Xw_sel)
+                    # pad/truncate simple approach: repeat or zero-pad to reach seq_len
+                    if Xw_scaled.shape[0] >= seq_len:
+                        X_seq = Xw_scaled[:seq_len].reshape(1, seq_len, feat_dim)
+                    else:
+                        pad = np.zeros((seq_len - Xw_scaled.shape[0], feat_dim), dtype=float)
+                        X_seq = np.vstack([Xw_scaled, pad]).reshape(1, seq_len, feat_dim)
+                    p = mouse_lstm_model.predict(X_seq)
+                    prob_lstm = float(p.reshape(-1)[0])
+                    model_sources.add("lstm")
+        except Exception:
+            prob_lstm = None
+
+        # combine available probs for this window
+        window_probs = [p for p in (prob_rf, prob_lstm) if p is not None]
+        avg_p = float(sum(window_probs) / len(window_probs)) if window_probs else None
+        probs_per_window.append(avg_p)
+        details["per_window"].append({"rf": prob_rf, "lstm": prob_lstm, "avg": avg_p})
+
+    # filter None windows (shouldn't happen often)
+    valid_probs = [p for p in probs_per_window if p is not None]
+    if len(valid_probs) == 0:
+        return {
+            "label": "human",
+            "confidence": 0.05,
+            "models": list(model_sources),
+            "details": {
+                "n_events": len(events),
+                "window_size": window_size,
+                "stride": stride,
+                "n_windows": len(windows),
+                "windows_above_threshold": 0,
+                "per_window": details["per_window"],
+                "reason": "no_valid_model_predictions"
+            }
+        }
+
+    avg_confidence = float(sum(valid_probs) / len(valid_probs))
+    windows_above = sum(1 for p in valid_probs if p >= threshold)
+
+    # Hysteresis: require average >= threshold AND at least min_windows_above_thresh windows above threshold
+    label = "bot" if (avg_confidence >= threshold and windows_above >= min_windows_above_thresh) else "human"
+
+    return {
+        "label": label,
+        "confidence": avg_confidence,
+        "models": list(model_sources),
+        "details": {
+            "n_events": len(events),
+            "window_size": window_size,
+            "stride": stride,
+            "n_windows": len(windows),
+            "windows_above_threshold": int(windows_above),
+            "per_window": details["per_window"]
+        }
+    }
+
+
+TASKS: Dict[str, Callable[..., Any]] = {
+    "flow": score_flow,
+    "mouse_windows": score_mouse_windows,
+}
+
+
+# -------------------------
+# Pool process side
+# -------------------------
+_attached: Dict[str, shared_memory.SharedMemory] = {}
+
+
+def _init_worker(preload: List[str]):
+    import signal
+    signal.signal(signal.SIGINT, signal.SIG_IGN)    # the server owns Ctrl-C / shutdown
+    MODELS.preload(preload, background=False)
+    MODELS.watch(MODEL_WATCH_INTERVAL)
+    # this process's registry is not the server's: pick up reloads announced by any worker
+    MODELS.follow(MODEL_SYNC_INTERVAL)
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def _run_in_worker(task: str, shm_name: str, shape, dtype: str, pooled: bool, params: Dict[str, Any]):
+    shm = _attached.get(shm_name) if pooled else None
+    if shm is None:
+        shm = shared_memory.SharedMemory(name=shm_name)
+        if pooled:
+            _attached[shm_name] = shm   # pooled blocks are reused: attach once per process
+    try:
+        return TASKS[task](np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf), **params)
+    finally:
+        if not pooled:
+            try:
+                shm.close()
+            except BufferError:
+                pass    # a traceback still references the array; the mapping goes with it
+
+
+# -------------------------
+# Server side
+# -------------------------
+class _ShmArena:
+    """Reusable shared-memory blocks for request payloads.
+
+    Blocks of `slot_bytes` are handed out and returned instead of being created and
+    unlinked per request; a payload larger than a slot gets a one-off block.
+    """
+
+    def __init__(self, slot_bytes: int):
+        self.slot_bytes = slot_bytes
+        self._free: List[shared_memory.SharedMemory] = []
+        self._all: List[shared_memory.SharedMemory] = []
+        self._lock = threading.Lock()
+
+    def lease(self, nbytes: int):
+        if nbytes > self.slot_bytes:
+            return shared_memory.SharedMemory(create=True, size=max(1, nbytes)), False
+        with self._lock:
+            if self._free:
+                return self._free.pop(), True
+        shm = shared_memory.SharedMemory(create=True, size=self.slot_bytes)
+        with self._lock:
+            self._all.append(shm)
+        return shm, True
+
+    def release(self, shm: shared_memory.SharedMemory, pooled: bool):
+        if pooled:
+            with self._lock:
+                self._free.append(shm)
+        else:
+            shm.close()
+            shm.unlink()
+
+    def close(self):
+        with self._lock:
+            blocks, self._all, self._free = self._all, [], []
+        for shm in blocks:
+            try:
+                shm.close()
+                shm.unlink()
+            except Exception:
+                pass
+
+
+class InferenceExecutor:
+    """Runs CPU-bound scoring (TASKS) in a pool of processes that hold their own models.
+
+    Under threaded serving, sklearn / numpy scoring on request threads serialises on
+    the GIL. With `workers` > 0, run() copies the input array into a pooled
+    shared-memory block and sends the pool only its name, shape and dtype; the pool
+    process scores it against models it preloaded at start and returns the small
+    result dict. With `workers` == 0, or if the pool breaks, run() scores inline.
+
+    The pool is created on first use in each server process (never before a gunicorn
+    fork) with a non-fork start method, so children do not inherit the server's
+    threads or locks.
+
+    Each pool process has its own registry, so POST /admin/models/reload in the
+    server does not swap their models directly: the server announces a successful
+    reload through the shared model generation and every pool process reloads its
+    changed artifacts within MODEL_SYNC_INTERVAL (ModelRegistry.follow()). A pool
+    process that rejects the new files keeps scoring with its old bundle.
+    """
+
+    def __init__(self, workers: int = INFERENCE_WORKERS, start_method: str = INFERENCE_START_METHOD,
+                 timeout: float = INFERENCE_TIMEOUT, slot_bytes: int = INFERENCE_SHM_SLOT_BYTES,
+                 preload: Optional[List[str]] = None):
+        self.workers = workers
+        self.start_method = start_method
+        self.timeout = timeout
+        self.preload = preload if preload is not None else list(FLOW_MODELS + MOUSE_MODELS)
+        self._arena = _ShmArena(slot_bytes)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.inline = 0
+        self.failures = 0
+
+    def _get_pool(self) -> Optional[ProcessPoolExecutor]:
+        if self.workers <= 0:
+            return None
+        if self._pool is not None and self._pid == os.getpid():
+            return self._pool
+        with self._lock:
+            if self._pool is None or self._pid != os.getpid():
+                self._arena = _ShmArena(self._arena.slot_bytes)
+                self._pool = self._start_pool()
+                self._pid = os.getpid()
+                logger.info("Inference pool: %d %s processes (preload %s)", self.workers, self.start_method,
+                            ", ".join(self.preload) or "none")
+            return self._pool
+
+    def _start_pool(self) -> ProcessPoolExecutor:
+        ctx = multiprocessing.get_context(self.start_method)
+        if self.start_method == "forkserver":
+            # the fork server imports only this module (numpy, registry) so children start warm
+            ctx.set_forkserver_preload(["backend.inference_pool"])
+        pool = ProcessPoolExecutor(self.workers, mp_context=ctx, initializer=_init_worker, initargs=(self.preload,))
+        # spawn / forkserver children re-run the parent's __main__ (backend.app under
+        # "python -m backend.app": the whole server) unless it is hidden while they start.
+        # The pool starts a process per submit until it has `workers`, so start them all now.
+        main = sys.modules["__main__"]
+        sys.modules["__main__"] = types.ModuleType("__main__")
+        try:
+            for _ in range(self.workers):
+                pool.submit(_ping)
+        finally:
+            sys.modules["__main__"] = main
+        return pool
+
+    def _reset(self, pool: ProcessPoolExecutor):
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def run(self, task: str, array: np.ndarray, **params) -> Any:
+        if task not in TASKS:
+            raise KeyError("unknown inference task %r" % task)
+        pool = self._get_pool()
+        if pool is None:
+            self.inline += 1
+            return TASKS[task](array, **params)
+
+        array = np.ascontiguousarray(array)
+        arena = self._arena
+        shm, pooled = arena.lease(array.nbytes)
+        fut = None
+        try:
+            np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+            self.submitted += 1
+            fut = pool.submit(_run_in_worker, task, shm.name, array.shape, array.dtype.str, pooled, params)
+            return fut.result(timeout=self.timeout)
+        except BrokenProcessPool as e:
+            # a pool process died (OOM, segfault in a native lib): rebuild on the next call
+            self.failures += 1
+            logger.warning("Inference pool broken, scoring inline: %s", e)
+            self._reset(pool)
+            self.inline += 1
+            return TASKS[task](array, **params)
+        finally:
+            if fut is not None and not fut.done():
+                # timed out: the task may still read the block, so it goes back only when done
+                fut.add_done_callback(lambda _f: arena.release(shm, pooled))
+            else:
+                arena.release(shm, pooled)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"workers": self.workers, "start_method": self.start_method, "pool_started": self._pool is not None,
+                "submitted": self.submitted, "inline": self.inline, "failures": self.failures}
+
+    def shutdown(self):
+        pool, self._pool = self._pool, None
+        if pool is not None and self._pid == os.getpid():
+            pool.shutdown(wait=True, cancel_futures=True)
+        self._arena.close()
+
+
+def executor_from_env() -> InferenceExecutor:
+    preload = [n.strip() for n in INFERENCE_PRELOAD.split(",") if n.strip()] or None
+    ex = InferenceExecutor(preload=preload)
+    atexit.register(ex.shutdown)
+    return ex
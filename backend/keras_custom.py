@@ -1,102 +1,123 @@
 # backend/keras_custom.py
 
 from typing import Dict, Any as _Any, Optional
-import tensorflow as tf
-from tensorflow.keras.layers import Layer, Masking as KerasMasking # type: ignore
-from tensorflow.keras.initializers import Initializer # type: ignore
-from tensorflow.keras import backend as K # type: ignore
 
-class Any(Layer):
-    def __init__(self, name: Optional[str] = None, **kwargs):
-        
-        super().__init__(name=name, **kwargs)
+# TensorFlow is imported when the placeholder classes are first needed (loading the
+# LSTM), not when this module is imported: the TF import alone takes seconds.
+_TF_CLASSES: Optional[Dict[str, type]] = None
 
-    def call(self, inputs, **kwargs):
-        return inputs
 
-    def get_config(self):
-        cfg = super().get_config()
-        return cfg
+def _tf_classes() -> Dict[str, type]:
+    global _TF_CLASSES
+    if _TF_CLASSES is not None:
+        return _TF_CLASSES
+    from backend.startup import STARTUP
+    tf = STARTUP.lazy_import("tensorflow", "LSTM custom objects")
+    from tensorflow.keras.layers import Layer, Masking as KerasMasking # type: ignore
+    from tensorflow.keras.initializers import Initializer # type: ignore
 
-    @classmethod
-    def from_config(cls, config):
-        
-        name = config.get("name", None)
-        
-        return cls(name=name)
-
-
-class NotEqual(Layer):
-
-    def __init__(self, value: Optional[float] = None, name: Optional[str] = None, **kwargs):
-        
-        super().__init__(name=name, **kwargs)
-        self.value = value
-
-    def call(self, inputs, **kwargs):
-        try:
-            # If two inputs provided, compare them
-            if isinstance(inputs, (list, tuple)) and len(inputs) >= 2:
-                a = tf.convert_to_tensor(inputs[0])
-                b = tf.convert_to_tensor(inputs[1])
-                out = tf.not_equal(a, b)
-                return tf.cast(out, tf.float32)
-            # Otherwise compare input to configured value (if present)
-            x = tf.convert_to_tensor(inputs)
-            if self.value is not None:
-                cmp_val = tf.cast(tf.constant(self.value), x.dtype)
-                out = tf.not_equal(x, cmp_val)
-                return tf.cast(out, tf.float32)
-            # fallback: return zeros of same shape
-            return tf.zeros_like(tf.cast(x, tf.float32))
-        except Exception:
-            # very safe fallback: scalar zero
-            try:
-                return tf.zeros_like(tf.cast(tf.convert_to_tensor(inputs), tf.float32))
-            except Exception:
-                return tf.constant(0.0, dtype=tf.float32)
+    class Any(Layer):
+        def __init__(self, name: Optional[str] = None, **kwargs):
 
-    def get_config(self):
-        cfg = super().get_config()
-        cfg.update({"value": self.value})
-        return cfg
+            super().__init__(name=name, **kwargs)
 
-    @classmethod
-    def from_config(cls, config):
-        # Keras passes config as dict; extract 'value' if present
-        value = config.get("value", None)
-        name = config.get("name", None)
-        return cls(value=value, name=name)
+        def call(self, inputs, **kwargs):
+            return inputs
 
-# ---------- Masking wrapper ----------
-class MaskingPlaceholder(KerasMasking):
-    def __init__(self, mask_value=None, name: Optional[str] = None, **kwargs):
-        super().__init__(mask_value=mask_value, name=name, **kwargs)
+        def get_config(self):
+            cfg = super().get_config()
+            return cfg
 
-    @classmethod
-    def from_config(cls, config):
-        return cls(mask_value=config.get("mask_value", None), name=config.get("name", None))
+        @classmethod
+        def from_config(cls, config):
 
-# ---------- Initializer placeholders ----------
-class OnesInit(Initializer):
-    def __call__(self, shape, dtype=None):
-        return tf.ones(shape, dtype=dtype or tf.float32)
-    def get_config(self):
-        return {}
+            name = config.get("name", None)
 
-class ZerosInit(Initializer):
-    def __call__(self, shape, dtype=None):
-        return tf.zeros(shape, dtype=dtype or tf.float32)
-    def get_config(self):
-        return {}
+            return cls(name=name)
 
-class OrthogonalInit(Initializer):
-    def __init__(self, gain=1.0):
-        self.gain = gain
-    def __call__(self, shape, dtype=None):
-        return tf.keras.initializers.Orthogonal(gain=self.gain)(shape, dtype=dtype)
-    def get_config(self):
-        return {"gain": self.gain}
+
+    class NotEqual(Layer):
+
+        def __init__(self, value: Optional[float] = None, name: Optional[str] = None, **kwargs):
+
+            super().__init__(name=name, **kwargs)
+            self.value = value
+
+        def call(self, inputs, **kwargs):
+            try:
+                # If two inputs provided, compare them
+                if isinstance(inputs, (list, tuple)) and len(inputs) >= 2:
+                    a = tf.convert_to_tensor(inputs[0])
+                    b = tf.convert_to_tensor(inputs[1])
+                    out = tf.not_equal(a, b)
+                    return tf.cast(out, tf.float32)
+                # Otherwise compare input to configured value (if present)
+                x = tf.convert_to_tensor(inputs)
+                if self.value is not None:
+                    cmp_val = tf.cast(tf.constant(self.value), x.dtype)
+                    out = tf.not_equal(x, cmp_val)
+                    return tf.cast(out, tf.float32)
+                # fallback: return zeros of same shape
+                return tf.zeros_like(tf.cast(x, tf.float32))
+            except Exception:
+                # very safe fallback: scalar zero
+                try:
+                    return tf.zeros_like(tf.cast(tf.convert_to_tensor(inputs), tf.float32))
+                except Exception:
+                    return tf.constant(0.0, dtype=tf.float32)
+
+        def get_config(self):
+            cfg = super().get_config()
+            cfg.update({"value": self.value})
+            return cfg
+
+        @classmethod
+        def from_config(cls, config):
+            # Keras passes config as dict; extract 'value' if present
+            value = config.get("value", None)
+            name = config.get("name", None)
+            return cls(value=value, name=name)
+
+    # ---------- Masking wrapper ----------
+    class MaskingPlaceholder(KerasMasking):
+        def __init__(self, mask_value=None, name: Optional[str] = None, **kwargs):
+            super().__init__(mask_value=mask_value, name=name, **kwargs)
+
+        @classmethod
+        def from_config(cls, config):
+            return cls(mask_value=config.get("mask_value", None), name=config.get("name", None))
+
+    # ---------- Initializer placeholders ----------
+    class OnesInit(Initializer):
+        def __call__(self, shape, dtype=None):
+            return tf.ones(shape, dtype=dtype or tf.float32)
+        def get_config(self):
+            return {}
+
+    class ZerosInit(Initializer):
+        def __call__(self, shape, dtype=None):
+            return tf.zeros(shape, dtype=dtype or tf.float32)
+        def get_config(self):
+            return {}
+
+    class OrthogonalInit(Initializer):
+        def __init__(self, gain=1.0):
+            self.gain = gain
+        def __call__(self, shape, dtype=None):
+            return tf.keras.initializers.Orthogonal(gain=self.gain)(shape, dtype=dtype)
+        def get_config(self):
+            return {"gain": self.gain}
+
+    _TF_CLASSES = {"Any": Any, "NotEqual": NotEqual, "MaskingPlaceholder": MaskingPlaceholder,
+                   "OnesInit": OnesInit, "ZerosInit": ZerosInit, "OrthogonalInit": OrthogonalInit}
+    return _TF_CLASSES
+
+
+def __getattr__(name):
+    # `from backend.keras_custom import NotEqual` keeps working, building the classes on demand
+    if name in ("Any", "NotEqual", "MaskingPlaceholder", "OnesInit", "ZerosInit", "OrthogonalInit"):
+        return _tf_classes()[name]
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
 
 # ---------- DTypePolicy placeholder ----------
 class DTypePolicy:
@@ -122,12 +143,13 @@ def get_custom_objects() -> Dict[str, _Any]:
     Provide mapping for Keras `custom_objects`.
     Add names here if inspect_h5_model reports additional unknown classes.
     """
+    c = _tf_classes()
     return {
-        "Any": Any,
-        "NotEqual": NotEqual,
-        "Masking": MaskingPlaceholder,
-        "Ones": OnesInit,
-        "Zeros": ZerosInit,
-        "Orthogonal": OrthogonalInit,
+        "Any": c["Any"],
+        "NotEqual": c["NotEqual"],
+        "Masking": c["MaskingPlaceholder"],
+        "Ones": c["OnesInit"],
+        "Zeros": c["ZerosInit"],
+        "Orthogonal": c["OrthogonalInit"],
         "DTypePolicy": DTypePolicy,
     }
\ No newline at end of file
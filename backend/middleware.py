@@ -0,0 +1,138 @@
+# backend/middleware.py
+
+import os
+import hashlib
+import re
+import logging
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Optional, Tuple
+
+logger = logging.getLogger("ai_ml_cyberdefense.middleware")
+logger.setLevel(logging.INFO)
+
+# which per-request checks skip which path prefixes; the only place these live
+EXEMPT_PREFIXES = {
+    "blocklist": ("/static", "/socket.io", "/health", "/collect_flow_event"),
+    "automation": ("/static", "/socket.io"),
+    # flask-limiter default limit: assets and socket.io polling are not worth a counter
+    "limiter": ("/static", "/socket.io", "/flow_report.js"),
+}
+
+
+def is_exempt(path: str, check: str) -> bool:
+    return path.startswith(EXEMPT_PREFIXES[check])
+
+
+# ---- automation / headless client detection ----
+AUTOMATION_KEYWORDS = ("selenium", "webdriver", "headless", "phantomjs", "puppeteer", "playwright", "automation")
+_AUTOMATION_RE = re.compile("|".join(re.escape(k) for k in AUTOMATION_KEYWORDS), re.IGNORECASE)
+UA_CACHE_SIZE = int(os.environ.get("UA_CACHE_SIZE", 4096))
+_UA_MAX = 512   # longer User-Agents are judged by their prefix (and cached under it)
+
+
+@lru_cache(maxsize=UA_CACHE_SIZE)
+def ua_verdict(ua: str) -> Tuple[bool, bool]:
+    """(User-Agent names an automation tool, User-Agent mentions chrome)."""
+    return _AUTOMATION_RE.search(ua) is not None, "chrome" in ua.lower()
+
+
+def is_automation_headers(headers) -> bool:
+    bot_ua, chrome = ua_verdict(headers.get("User-Agent", "")[:_UA_MAX])
+    if bot_ua:
+        return True
+    if not chrome and headers.get("Sec-Fetch-Mode", "") == "navigate":
+        return True
+    # Selenium often sends this header
+    return headers.get("X-Selenium") == "1"
+
+
+# ---- flow_report.js injection into HTML ----
+FLOW_REPORT_TAG = b'<script id="flow-report-js" src="/static/flow_report.js" defer></script>'
+
+
+def inject_flow_report_tag(body: bytes) -> Optional[bytes]:
+    """Body with the flow-report script before </head>, or None if nothing to change."""
+    if b'id="flow-report-js"' in body:
+        return None
+    i = body.find(b"</head>")
+    if i < 0:
+        return None
+    return body[:i] + FLOW_REPORT_TAG + body[i:]
+
+
+class InjectedHTMLCache:
+    """LRU of already-injected bodies for responses that carry a validator (ETag),
+    keyed by (path, ETag): a repeat hit swaps in the cached bytes without scanning."""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key) -> Optional[bytes]:
+        with self._lock:
+            body = self._data.get(key)
+            if body is not None:
+                self._data.move_to_end(key)
+            return body
+
+    def put(self, key, body: bytes):
+        with self._lock:
+            self._data[key] = body
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+
+class HTMLPage:
+    __slots__ = ("body", "etag", "mtime", "stat_key")
+
+    def __init__(self, body: bytes, etag: str, mtime: float, stat_key):
+        self.body = body
+        self.etag = etag
+        self.mtime = mtime
+        self.stat_key = stat_key
+
+
+class StaticHTMLCache:
+    """HTML files read once, with the flow-report tag already injected.
+
+    Entries are keyed by absolute path and revalidated against (mtime_ns, size) at most
+    every `recheck` seconds, so editing a page on disk is picked up without a restart.
+    The ETag is a digest of the served (injected) bytes.
+    """
+
+    def __init__(self, max_entries: int = 128, recheck: float = 1.0):
+        self.max_entries = max_entries
+        self.recheck = recheck
+        self._pages = OrderedDict()     # path -> (HTMLPage, next stat time)
+        self._lock = threading.Lock()
+
+    def get(self, path: str, now: float) -> Optional[HTMLPage]:
+        with self._lock:
+            hit = self._pages.get(path)
+            if hit is not None:
+                self._pages.move_to_end(path)
+                if now < hit[1]:
+                    return hit[0]
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        stat_key = (st.st_mtime_ns, st.st_size)
+        page = hit[0] if hit is not None and hit[0].stat_key == stat_key else None
+        if page is None:
+            with open(path, "rb") as fh:
+                raw = fh.read()
+            body = inject_flow_report_tag(raw) or raw
+            etag = hashlib.blake2b(body, digest_size=12).hexdigest()
+            page = HTMLPage(body, etag, st.st_mtime, stat_key)
+            logger.debug("html cache: loaded %s (%d bytes)", path, len(body))
+        with self._lock:
+            self._pages[path] = (page, now + self.recheck)
+            self._pages.move_to_end(path)
+            while len(self._pages) > self.max_entries:
+                self._pages.popitem(last=False)
+        return page
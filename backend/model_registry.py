@@ -0,0 +1,721 @@
+# backend/model_registry.py
+
+import os
+import json
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from backend.startup import STARTUP
+from backend.shared_state import generation_from_env
+
+logger = logging.getLogger("ai_ml_cyberdefense.models")
+logger.setLevel(logging.INFO)
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+DATA_DIR = os.path.join(ROOT, "data", "processed")
+
+# comma-separated artifact names (or "all") loaded in a background thread at startup;
+# empty = everything loads on first use
+MODEL_PRELOAD = os.environ.get("MODEL_PRELOAD", "")
+MOUSE_LSTM_PATH = os.environ.get("MOUSE_LSTM_PATH", "").strip()     # overrides the LSTM search below
+MODEL_WATCH_INTERVAL = float(os.environ.get("MODEL_WATCH_INTERVAL", 0))  # seconds between artifact mtime polls; 0 = off
+MODEL_SYNC_INTERVAL = float(os.environ.get("MODEL_SYNC_INTERVAL", 1.0))    # seconds between checks for reloads announced by other processes; 0 = off
+# serve random forests from memory-mapped .npy exports (backend/forest_mmap.py) so all
+# workers on a host share one copy of the tree arrays
+MODEL_MMAP = os.environ.get("MODEL_MMAP", "0").lower() in ("1", "true", "yes")
+MODEL_MMAP_DIR = os.environ.get("MODEL_MMAP_DIR", os.path.join(DATA_DIR, "mmap"))
+# small labelled inputs a reloaded model must score before it is swapped in
+MODEL_GOLDEN_SET = os.environ.get("MODEL_GOLDEN_SET", os.path.join(DATA_DIR, "golden_set.json"))
+
+_PAGE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def rss_bytes() -> Optional[int]:
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * _PAGE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def memory_report() -> Dict[str, Any]:
+    """This process's RSS / PSS and how much of it is shared (kB, from /proc/self/smaps_rollup).
+
+    PSS splits each shared page between the processes mapping it, so summing PSS over
+    the workers gives their real combined footprint; RSS counts shared pages in full.
+    """
+    out: Dict[str, Any] = {"pid": os.getpid()}
+    try:
+        with open("/proc/self/smaps_rollup") as fh:
+            for line in fh:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == "kB":
+                    key = parts[0].rstrip(":")
+                    if key in ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty"):
+                        out[key.lower() + "_kb"] = int(parts[1])
+    except OSError:
+        rss = rss_bytes()
+        out["rss_kb"] = rss // 1024 if rss is not None else None
+    return out
+
+
+def find_existing_file(candidates) -> Optional[str]:
+    for p in candidates:
+        if not p:
+            continue
+        pabs = os.path.abspath(p)
+        if os.path.exists(pabs):
+            return pabs
+    return None
+
+
+def file_signature(path: Optional[str]):
+    """(path, mtime, size) of an artifact file, or None when there is none."""
+    if not path:
+        return None
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (path, st.st_mtime, st.st_size)
+
+
+class ReloadError(Exception):
+    """A reloaded artifact failed to load, warm up or validate; the old bundle stays live."""
+
+
+class _Entry:
+    __slots__ = ("name", "loader", "locate", "path", "state", "error", "load_ms", "rss_delta", "loaded_at",
+                 "lock", "on_load", "validate", "signature", "version")
+
+    def __init__(self, name: str, loader: Callable[[Optional[str]], Any], locate: Callable[[], Optional[str]],
+                 on_load: Optional[Callable[[Any], None]] = None,
+                 validate: Optional[Callable[[Any, Any, Dict[str, Any]], None]] = None):
+        self.name = name
+        self.loader = loader
+        self.locate = locate
+        self.on_load = on_load
+        self.validate = validate
+        self.signature = None       # file_signature() of what is loaded, to spot a new version
+        self.version = 0            # bumped by every successful reload
+        self.path = None
+        self.state = "unloaded"     # unloaded | loading | loaded | missing | failed
+        self.error = None
+        self.load_ms = None
+        self.rss_delta = None
+        self.loaded_at = None
+        self.lock = threading.Lock()
+
+
+class ModelRegistry:
+    """Model artifacts loaded on first use.
+
+    Each artifact is registered with `locate()` (-> file path or None) and
+    `loader(path)` (-> object). get(name) loads it at most once per process: concurrent
+    first callers wait on the artifact's lock and share the one result (single-flight);
+    a missing file or failed load is remembered as None rather than retried per request.
+
+    Loaded objects live in one dict that is replaced, never mutated, so a reader that
+    took bundle() or get_many() keeps a consistent set even while other artifacts load.
+    status() and peek() never trigger a load, so health checks stay cheap.
+
+    reload() picks up new artifact files without a restart: the new versions are loaded
+    beside the live ones, warmed up (on_load), checked by their `validate(new, old,
+    bundle)` hooks, and only then published together in one dict swap. Requests that
+    already bound the old objects finish on them; a failure anywhere leaves the old
+    bundle in place.
+
+    A registry lives in one process, so reload() swaps that process's bundle only.
+    reload(broadcast=True) bumps the shared `generation` afterwards, and every process
+    running follow() (each gunicorn worker, each inference pool process) notices the
+    bump within MODEL_SYNC_INTERVAL and reloads whatever changed on disk for itself,
+    through the same load/validate/swap path. Each process's outcome is in its own
+    last_reload.
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, _Entry] = {}
+        self._values: Dict[str, Any] = {}
+        self._swap_lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self.last_reload: Optional[Dict[str, Any]] = None
+        self.preload_thread: Optional[threading.Thread] = None
+        self.generation = None      # shared counter bumped by reload(broadcast=True); see follow()
+        self._seen_gen: Optional[int] = None
+        self._follow_pid: Optional[int] = None
+
+    def register(self, name: str, loader: Callable[[Optional[str]], Any], locate: Callable[[], Optional[str]],
+                 on_load: Optional[Callable[[Any], None]] = None,
+                 validate: Optional[Callable[[Any, Any, Dict[str, Any]], None]] = None):
+        self._entries[name] = _Entry(name, loader, locate, on_load, validate)
+
+    def names(self) -> List[str]:
+        return list(self._entries)
+
+    def _publish(self, name: str, value: Any):
+        with self._swap_lock:
+            values = dict(self._values)
+            values[name] = value
+            self._values = values
+
+    def get(self, name: str) -> Any:
+        values = self._values
+        if name in values:
+            return values[name]
+        entry = self._entries[name]
+        with entry.lock:
+            if name in self._values:
+                return self._values[name]
+            entry.state = "loading"
+            value = None
+            t0 = time.perf_counter()
+            rss0 = rss_bytes()
+            try:
+                entry.path = entry.locate()
+                if entry.path is None:
+                    entry.state = "missing"
+                    logger.info(" - %s: no artifact found", name)
+                else:
+                    entry.signature = file_signature(entry.path)
+                    value = entry.loader(entry.path)
+                    entry.state = "loaded" if value is not None else "missing"
+            except Exception as e:
+                entry.state = "failed"
+                entry.error = str(e)
+                value = None
+                logger.warning(" - Failed loading %s from %s: %s", name, entry.path, e)
+            entry.load_ms = round((time.perf_counter() - t0) * 1000.0, 1)
+            rss1 = rss_bytes()
+            entry.rss_delta = rss1 - rss0 if rss0 is not None and rss1 is not None else None
+            entry.loaded_at = time.time()
+            if entry.state == "loaded":
+                logger.info(" - Loaded %s from %s (%.0f ms, rss %+.1f MB)", name, entry.path, entry.load_ms,
+                            (entry.rss_delta or 0) / 1e6)
+            self._publish(name, value)
+        if value is not None and entry.on_load is not None:
+            try:
+                entry.on_load(value)
+            except Exception as e:
+                logger.warning(" - %s post-load hook failed: %s", name, e)
+        return value
+
+    def get_many(self, *names: str) -> List[Any]:
+        """Several artifacts from one snapshot, so a concurrent reload can't mix versions."""
+        values = self._values
+        if not all(n in values for n in names):
+            for n in names:
+                self.get(n)
+            values = self._values
+        return [values[n] for n in names]
+
+    def bundle(self, names: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """Consistent name -> object mapping (loads what `names` needs first)."""
+        for n in (names if names is not None else self._entries):
+            self.get(n)
+        return self._values
+
+    def peek(self, name: str) -> Any:
+        """The loaded object, or None if it is not loaded (never loads)."""
+        return self._values.get(name)
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._values
+
+    def available(self, name: str) -> bool:
+        """Loaded successfully, or not tried yet but its artifact exists."""
+        if name in self._values:
+            return self._values[name] is not None
+        try:
+            return self._entries[name].locate() is not None
+        except Exception:
+            return False
+
+    def path(self, name: str) -> Optional[str]:
+        entry = self._entries[name]
+        if entry.path is None and entry.state == "unloaded":
+            try:
+                return entry.locate()
+            except Exception:
+                return None
+        return entry.path
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        out = {}
+        for name, e in self._entries.items():
+            out[name] = {"state": e.state, "path": e.path, "load_ms": e.load_ms, "rss_delta_bytes": e.rss_delta,
+                         "loaded_at": e.loaded_at, "error": e.error, "version": e.version}
+        return out
+
+    # ---- hot reload ----
+    def changed(self) -> List[str]:
+        """Tried artifacts whose file differs from the one loaded (new mtime/size, or newly present)."""
+        out = []
+        for name, e in self._entries.items():
+            if name not in self._values:
+                continue    # never loaded: the next get() reads the current file anyway
+            try:
+                sig = file_signature(e.locate())
+            except Exception:
+                continue
+            if sig is not None and sig != e.signature:
+                out.append(name)
+        return out
+
+    def reload(self, names: Optional[Iterable[str]] = None, force: bool = False,
+               broadcast: bool = False) -> Dict[str, Any]:
+        """Load, warm up and validate new versions, then swap them in together.
+
+        names: artifacts to consider (default: all); only those whose file changed are
+        reloaded unless `force`. Returns a report; raises ReloadError (old bundle kept)
+        if any candidate fails. Only this process is affected; with `broadcast` a
+        successful reload is announced to the other followers (they reload changed
+        files, whatever names/force were given here).
+        """
+        with self._reload_lock:
+            t0 = time.perf_counter()
+            wanted = list(names) if names is not None else list(self._entries)
+            unknown = [n for n in wanted if n not in self._entries]
+            if unknown:
+                raise ReloadError("unknown artifacts: %s" % ", ".join(unknown))
+            changed = set(self.changed())
+            todo = [n for n in wanted if force or n in changed]
+            report = {"requested": wanted, "reloaded": [], "load_ms": {}, "started_at": time.time(),
+                      "pid": os.getpid()}
+            try:
+                candidates, sigs = {}, {}
+                for name in todo:
+                    e = self._entries[name]
+                    path = e.locate()
+                    if path is None:
+                        raise ReloadError("%s: no artifact found" % name)
+                    t1 = time.perf_counter()
+                    sigs[name] = (path, file_signature(path))
+                    value = e.loader(path)
+                    if value is None:
+                        raise ReloadError("%s: loader returned nothing for %s" % (name, path))
+                    if e.on_load is not None:
+                        e.on_load(value)
+                    candidates[name] = value
+                    report["load_ms"][name] = round((time.perf_counter() - t1) * 1000.0, 1)
+
+                # validate against the bundle as it will look after the swap
+                current = self._values
+                bundle = dict(current)
+                bundle.update(candidates)
+                for name, value in candidates.items():
+                    e = self._entries[name]
+                    if e.validate is not None:
+                        try:
+                            e.validate(value, current.get(name), bundle)
+                        except ReloadError:
+                            raise
+                        except Exception as ex:
+                            raise ReloadError("%s: validation failed: %s" % (name, ex))
+
+                if candidates:
+                    with self._swap_lock:
+                        values = dict(self._values)
+                        values.update(candidates)
+                        self._values = values
+                    now = time.time()
+                    for name in candidates:
+                        e = self._entries[name]
+                        e.path, e.signature = sigs[name]
+                        e.state, e.error, e.loaded_at = "loaded", None, now
+                        e.load_ms = report["load_ms"][name]
+                        e.version += 1
+                    logger.info("Hot-reloaded %s", ", ".join(sorted(candidates)))
+                report["reloaded"] = sorted(candidates)
+                report["ok"] = True
+                if broadcast:
+                    report["generation"] = self._announce()
+            except Exception as ex:
+                report["ok"] = False
+                report["error"] = str(ex)
+                logger.warning("Model reload rejected, keeping the live bundle: %s", ex)
+            report["total_ms"] = round((time.perf_counter() - t0) * 1000.0, 1)
+            self.last_reload = report
+            if not report["ok"]:
+                raise ReloadError(report["error"])
+            return report
+
+    def _announce(self) -> Optional[int]:
+        gen = self.generation
+        if gen is None:
+            return None
+        try:
+            g = gen.bump()
+        except Exception as e:
+            logger.warning("could not announce model reload to other workers: %s", e)
+            return None
+        # nothing for our own follower to do unless someone else bumped in between
+        if self._seen_gen is not None and g == self._seen_gen + 1:
+            self._seen_gen = g
+        return g
+
+    def reload_async(self, names: Optional[Iterable[str]] = None, force: bool = False,
+                     broadcast: bool = False) -> Optional[threading.Thread]:
+        """reload() on a background thread; None if a reload is already running."""
+        if self._reload_lock.locked():
+            return None
+        names = list(names) if names is not None else None
+
+        def _run():
+            try:
+                self.reload(names, force=force, broadcast=broadcast)
+            except ReloadError:
+                pass    # reported in last_reload
+
+        t = threading.Thread(target=_run, name="model-reload", daemon=True)
+        t.start()
+        return t
+
+    def watch(self, interval: float = MODEL_WATCH_INTERVAL) -> Optional[threading.Thread]:
+        """Poll artifact files and reload the ones that changed.
+
+        A change is acted on once the file looked the same on two polls in a row, so a
+        model that is still being copied into place is not picked up half-written.
+        """
+        if interval <= 0:
+            return None
+
+        def _loop():
+            pending, rejected = {}, {}
+            while True:
+                time.sleep(interval)
+                stable = []
+                try:
+                    seen = {}
+                    for name in self.changed():
+                        sig = file_signature(self._entries[name].locate())
+                        if rejected.get(name) != sig:
+                            seen[name] = sig
+                    stable = [n for n, sig in seen.items() if pending.get(n) == sig]
+                    pending = {n: sig for n, sig in seen.items() if n not in stable}
+                    if stable:
+                        self.reload(stable)
+                except ReloadError:
+                    # reported in last_reload; tried again only once the file changes again
+                    rejected.update({n: seen[n] for n in stable})
+                except Exception as e:
+                    logger.debug("model watch failed: %s", e)
+
+        t = threading.Thread(target=_loop, name="model-watch", daemon=True)
+        t.start()
+        return t
+
+    def follow(self, interval: float = MODEL_SYNC_INTERVAL) -> Optional[threading.Thread]:
+        """Reload changed artifacts whenever `generation` moves, i.e. after another
+        process ran reload(broadcast=True). Works with MODEL_WATCH_INTERVAL=0.
+
+        One follower per process: call again after fork (the thread does not survive it).
+        Its first pass reloads whatever changed since the artifacts were loaded, so a
+        worker forked from a master holding older models catches up with the others.
+        """
+        gen = self.generation
+        if gen is None or interval <= 0 or self._follow_pid == os.getpid():
+            return None
+        self._follow_pid = os.getpid()
+        try:
+            self._seen_gen = gen.value()
+        except Exception as e:
+            logger.warning("model generation unavailable, reloads stay per process: %s", e)
+
+        def _loop():
+            try:
+                if self.changed():
+                    self.reload()
+            except ReloadError:
+                pass    # reported in last_reload
+            except Exception as e:
+                logger.debug("model catch-up reload failed: %s", e)
+            while True:
+                time.sleep(interval)
+                try:
+                    g = gen.value()
+                    if g == self._seen_gen:
+                        continue
+                    self._seen_gen = g
+                    self.reload()
+                except ReloadError:
+                    pass    # reported in last_reload
+                except Exception as e:
+                    logger.debug("model generation poll failed: %s", e)
+
+        t = threading.Thread(target=_loop, name="model-follow", daemon=True)
+        t.start()
+        return t
+
+    def preload(self, names: Optional[Iterable[str]] = None, background: bool = True) -> Optional[threading.Thread]:
+        names = list(names if names is not None else self._entries)
+
+        def _run():
+            for n in names:
+                if n in self._entries:
+                    self.get(n)
+
+        if not background:
+            _run()
+            return None
+        t = threading.Thread(target=_run, name="model-preload", daemon=True)
+        t.start()
+        self.preload_thread = t
+        return t
+
+
+# -------------------------
+# Artifacts
+# -------------------------
+def _joblib_load(path):
+    return STARTUP.lazy_import("joblib", "model loading").load(path)
+
+
+def _load_forest(path):
+    if MODEL_MMAP:
+        from backend.forest_mmap import load_forest_mmap
+        return load_forest_mmap(path, MODEL_MMAP_DIR)
+    return _joblib_load(path)
+
+
+def _load_json(path):
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def _load_xgb(path):
+    xgb = STARTUP.lazy_import("xgboost", "flow XGBoost load")
+    booster = xgb.Booster()
+    booster.load_model(path)
+    return booster
+
+
+def _locate_flow_scaler():
+    # the known-correct 18-feature scaler: cwd-relative first, then repo-relative
+    return find_existing_file([os.path.join("data", "processed", "scaler_used.save"),
+                               os.path.join(DATA_DIR, "scaler_used.save")])
+
+
+def find_lstm_scaler_path():
+    return find_existing_file([
+        os.path.join(DATA_DIR, "mouse_lstm_scaler.save"),
+        os.path.join(DATA_DIR, "mouse_lstm_scaler.joblib"),
+        os.path.join(DATA_DIR, "mouse_lstm_scaler.pkl"),
+        os.path.join(ROOT, "data", "mouse_lstm_scaler.save"),
+    ])
+
+
+def find_lstm_model_path():
+    # PREFER the native Keras format first (.keras) — more robust across TF versions.
+    return find_existing_file([
+        MOUSE_LSTM_PATH,
+        os.path.join(DATA_DIR, "mouse_lstm.keras"),
+        os.path.join(ROOT, "data", "mouse_lstm.keras"),
+        os.path.join(DATA_DIR, "mouse_lstm.h5"),
+        os.path.join(ROOT, "data", "mouse_lstm.h5"),
+        os.path.join(DATA_DIR, "mouse_lstm.keras.zip"),
+        # also check common container mount
+        "/data/mouse_lstm.keras",
+        "/data/mouse_lstm.h5",
+    ])
+
+
+def find_lstm_meta_path():
+    return find_existing_file([
+        os.path.join(DATA_DIR, "mouse_lstm_meta.json"),
+        os.path.join(ROOT, "data", "mouse_lstm_meta.json"),
+    ])
+
+
+def load_lstm_model(path):
+    """Keras load with the fallbacks the saved models need (custom objects, compile=False)."""
+    try:
+        STARTUP.lazy_import("tensorflow", "mouse LSTM load")
+        from tensorflow.keras.models import load_model as tf_load_model  # type: ignore
+        from tensorflow.keras.utils import custom_object_scope  # type: ignore
+    except Exception:
+        logger.info(" - LSTM model file found but tensorflow.keras.load_model unavailable in this env; skipping model load.")
+        return None
+    try:
+        # import helper mapping of custom objects (placeholder implementations)
+        from backend.keras_custom import get_custom_objects  # type: ignore
+    except Exception:
+        get_custom_objects = None
+
+    tried = []
+    # If it's a .keras (native Keras) bundle, try it first (most robust)
+    if path.endswith(".keras"):
+        try:
+            return tf_load_model(path)
+        except Exception as e_k:
+            tried.append(("keras_native", e_k))
+            logger.warning(" - Loading .keras failed: %s", e_k)
+    if get_custom_objects is not None:
+        co = get_custom_objects()
+        for compile_flag in (True, False):
+            try:
+                with custom_object_scope(co):
+                    return tf_load_model(path) if compile_flag else tf_load_model(path, compile=False)
+            except Exception as e_co:
+                tried.append(("custom_objects" if compile_flag else "custom_objects_compile_false", e_co))
+                logger.warning(" - Loading with custom_objects (compile=%s) failed: %s", compile_flag, e_co)
+    try:
+        return tf_load_model(path)
+    except Exception as e_plain:
+        tried.append(("plain_load", e_plain))
+    reasons = "; ".join([f"{k}:{getattr(v, '__class__', v)}" for k, v in tried])
+    raise RuntimeError("all attempts to load LSTM model failed: %s" % reasons)
+
+
+def warmup_lstm(model, registry: "ModelRegistry"):
+    """One dummy forward pass so the first real request does not pay graph building."""
+    lstm_scaler = registry.get("mouse_lstm_scaler")
+    meta = registry.get("mouse_lstm_meta")
+    if lstm_scaler is None or meta is None:
+        logger.info("LSTM warmup skipped (scaler/meta missing).")
+        return
+    import numpy as np
+    seq_len = int(meta.get("seq_len", 8))
+    feat_dim = int(meta.get("feat_dim", getattr(lstm_scaler, "mean_", None).shape[0]))
+    t0 = time.time()
+    try:
+        # some TF builds prefer float32 input
+        model.predict(np.zeros((1, seq_len, feat_dim), dtype="float32"), verbose=0)
+    except Exception:
+        model.predict(np.zeros((1, seq_len, feat_dim), dtype=float), verbose=0)
+    logger.info("Mouse LSTM warmup done (%.0f ms)", (time.time() - t0) * 1000.0)
+
+
+# -------------------------
+# Reload validation (golden set)
+# -------------------------
+_golden_cache = {}
+
+
+def load_golden_set(path: str = MODEL_GOLDEN_SET) -> Dict[str, Any]:
+    """{"flow": {"features": [[18 raw]], "labels": [0|1]}, "mouse": {...}, "min_accuracy": 0.7}.
+
+    Mouse features are the model inputs after feature selection, before scaling. With
+    no file, validators fall back to a zero-vector smoke test.
+    """
+    sig = file_signature(path)
+    if sig is None:
+        return {}
+    cached = _golden_cache.get(path)
+    if cached is not None and cached[0] == sig:
+        return cached[1]
+    with open(path, "r") as f:
+        golden = json.load(f)
+    _golden_cache[path] = (sig, golden)
+    return golden
+
+
+def _n_inputs(model) -> Optional[int]:
+    n = getattr(model, "n_features_in_", None)
+    if n is None and getattr(model, "mean_", None) is not None:
+        n = model.mean_.shape[0]
+    return int(n) if n is not None else None
+
+
+def _golden_inputs(section: str, n_features: Optional[int]):
+    import numpy as np
+    part = load_golden_set().get(section) or {}
+    if part.get("features"):
+        X = np.asarray(part["features"], dtype=float)
+        y = np.asarray(part["labels"], dtype=float) if part.get("labels") else None
+        return X, y
+    return np.zeros((2, n_features or 1), dtype=float), None
+
+
+def _check_probs(name: str, probs, labels):
+    import numpy as np
+    probs = np.asarray(probs, dtype=float).ravel()
+    if not np.all(np.isfinite(probs)) or probs.min() < 0.0 or probs.max() > 1.0:
+        raise ReloadError("%s: scores outside [0, 1] on the golden set" % name)
+    if labels is not None:
+        min_acc = float(load_golden_set().get("min_accuracy", 0.7))
+        acc = float(np.mean((probs >= 0.5) == (labels >= 0.5)))
+        if acc < min_acc:
+            raise ReloadError("%s: golden-set accuracy %.3f < %.3f" % (name, acc, min_acc))
+
+
+def _same_inputs(name: str, new, old):
+    # the feature extraction in front of a model is fixed, so its input width must be too
+    n_new, n_old = _n_inputs(new), _n_inputs(old)
+    if n_new is not None and n_old is not None and n_new != n_old:
+        raise ReloadError("%s: expects %d features, the live one %d" % (name, n_new, n_old))
+
+
+def _scaled(X, scaler):
+    return scaler.transform(X) if scaler is not None else X
+
+
+def _validate_scaler(name: str):
+    def _validate(new, old, bundle):
+        _same_inputs(name, new, old)
+    return _validate
+
+
+def _validate_flow_rf(new, old, bundle):
+    _same_inputs("flow_rf", new, old)
+    X, y = _golden_inputs("flow", _n_inputs(new))
+    _check_probs("flow_rf", new.predict_proba(_scaled(X, bundle.get("flow_scaler")))[:, 1], y)
+
+
+def _validate_flow_xgb(new, old, bundle):
+    import xgboost as xgb
+    scaler = bundle.get("flow_scaler")
+    X, y = _golden_inputs("flow", _n_inputs(scaler) or new.num_features())
+    _check_probs("flow_xgb", new.predict(xgb.DMatrix(_scaled(X, scaler))), y)
+
+
+def _validate_mouse_rf(new, old, bundle):
+    _same_inputs("mouse_rf", new, old)
+    X, y = _golden_inputs("mouse", _n_inputs(new))
+    _check_probs("mouse_rf", new.predict_proba(_scaled(X, bundle.get("mouse_scaler")))[:, 1], y)
+
+
+def _validate_mouse_lstm(new, old, bundle):
+    import numpy as np
+    lstm_scaler, meta = bundle.get("mouse_lstm_scaler"), bundle.get("mouse_lstm_meta") or {}
+    seq_len = int(meta.get("seq_len", 8))
+    X, y = _golden_inputs("mouse", int(meta.get("feat_dim", 0)) or _n_inputs(lstm_scaler) or new.input_shape[-1])
+    # one window per golden row: the row repeated seq_len times
+    seqs = np.repeat(_scaled(X, lstm_scaler)[:, None, :], seq_len, axis=1).astype("float32")
+    _check_probs("mouse_lstm", new.predict(seqs, verbose=0), y)
+
+
+def _file(*parts):
+    p = os.path.join(DATA_DIR, *parts)
+    return lambda: p if os.path.exists(p) else None
+
+
+MODELS = ModelRegistry()
+MODELS.generation = generation_from_env("models")
+MODELS.register("flow_rf", _load_forest, _file("rf_model.save"), validate=_validate_flow_rf)
+MODELS.register("flow_scaler", _joblib_load, _locate_flow_scaler, validate=_validate_scaler("flow_scaler"))
+MODELS.register("flow_le", _joblib_load, _file("label_encoder.save"))
+MODELS.register("flow_xgb", _load_xgb, _file("xgb_model.json"), validate=_validate_flow_xgb)
+MODELS.register("mouse_rf", _load_forest, _file("mouse_rf.save"), validate=_validate_mouse_rf)
+MODELS.register("mouse_scaler", _joblib_load, _file("mouse_scaler.save"), validate=_validate_scaler("mouse_scaler"))
+MODELS.register("mouse_lstm_scaler", _joblib_load, find_lstm_scaler_path,
+                validate=_validate_scaler("mouse_lstm_scaler"))
+MODELS.register("mouse_lstm_meta", _load_json, find_lstm_meta_path)
+MODELS.register("mouse_lstm", load_lstm_model, find_lstm_model_path,
+                on_load=lambda m: warmup_lstm(m, MODELS), validate=_validate_mouse_lstm)
+MODELS.register("mouse_ensemble_meta", _load_json, _file("mouse_ensemble_meta.json"))
+
+FLOW_MODELS = ("flow_rf", "flow_scaler", "flow_xgb")
+# what a forking server loads in its master: everything but the LSTM (TF is not fork-safe)
+FORK_SAFE_MODELS = ("flow_rf", "flow_scaler", "flow_le", "flow_xgb", "mouse_rf", "mouse_scaler",
+                    "mouse_lstm_scaler", "mouse_lstm_meta", "mouse_ensemble_meta")
+MOUSE_MODELS = ("mouse_rf", "mouse_scaler", "mouse_lstm", "mouse_lstm_scaler", "mouse_lstm_meta")
+
+
+def preload_from_env(registry: ModelRegistry = MODELS) -> Optional[threading.Thread]:
+    spec = MODEL_PRELOAD.strip()
+    if not spec:
+        return None
+    names = None if spec == "all" else [n.strip() for n in spec.split(",") if n.strip()]
+    return registry.preload(names)
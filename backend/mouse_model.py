@@ -2,39 +2,76 @@
 import os
 import json
 import math
-import joblib
 import numpy as np
 import logging
 from typing import List, Dict, Any
 
-logger = logging.getLogger(__name__)
+try:
+    # always the package module: a second import under another name would mean a second registry
+    from backend.model_registry import MODELS  # type: ignore
+except Exception:
+    from model_registry import MODELS  # type: ignore
 
-def _to_arrays(events):
-    if len(events) == 0:
-        return None, None, None
+logger = logging.getLogger(__name__)
 
-    xs, ys, ts = [], [], []
+def events_to_array(events) -> np.ndarray:
+    """Events (dicts with x/y/t or [x, y, t] rows) -> float64 array of shape (n, 3).
 
-    for e in events:
+    One row per event, in order; an event with a missing or non-numeric field becomes
+    a NaN row (skipped by the feature extraction), so slicing the array into windows
+    gives the same windows as slicing the list.
+    """
+    out = np.full((len(events), 3), np.nan, dtype=float)
+    for i, e in enumerate(events):
         if isinstance(e, dict):
             x = e.get("x"); y = e.get("y"); t = e.get("t")
         else:
             try:
                 x, y, t = e[0], e[1], e[2]
             except Exception:
-                x, y, t = None, None, None
-
+                continue
         if x is None or y is None or t is None:
             continue
+        try:
+            out[i] = (float(x), float(y), float(t))
+        except (TypeError, ValueError):
+            pass
+    return out
 
-        xs.append(float(x)); ys.append(float(y)); ts.append(float(t))
 
-    if len(xs) == 0:
+def _to_arrays(events):
+    if len(events) == 0:
         return None, None, None
 
-    xs = np.array(xs, dtype=float)
-    ys = np.array(ys, dtype=float)
-    ts = np.array(ts, dtype=float)
+    if isinstance(events, np.ndarray):
+        # events_to_array() output: drop the NaN rows of invalid events
+        arr = events[~np.isnan(events).any(axis=1)]
+        if len(arr) == 0:
+            return None, None, None
+        xs, ys, ts = arr[:, 0].copy(), arr[:, 1].copy(), arr[:, 2].copy()
+    else:
+        xs, ys, ts = [], [], []
+
+        for e in events:
+            if isinstance(e, dict):
+                x = e.get("x"); y = e.get("y"); t = e.get("t")
+            else:
+                try:
+                    x, y, t = e[0], e[1], e[2]
+                except Exception:
+                    x, y, t = None, None, None
+
+            if x is None or y is None or t is None:
+                continue
+
+            xs.append(float(x)); ys.append(float(y)); ts.append(float(t))
+
+        if len(xs) == 0:
+            return None, None, None
+
+        xs = np.array(xs, dtype=float)
+        ys = np.array(ys, dtype=float)
+        ts = np.array(ts, dtype=float)
 
     # Fix non-monotonic timestamps
     try:
@@ -151,71 +188,20 @@ else:
         selected_indices = list(range(20))
 
 
-rf_model = None
-rf_scaler = None
-
-try:
-    rf_model = joblib.load(os.path.join(MODEL_DIR, "mouse_rf.save"))
-    logger.info("Loaded RF model")
-except Exception:
-    rf_model = None
-    logger.warning("mouse_model: could not load RF model")
-
-try:
-    rf_scaler = joblib.load(os.path.join(MODEL_DIR, "mouse_scaler.save"))
-    logger.info("Loaded RF scaler")
-except Exception:
-    rf_scaler = None
-    logger.warning("mouse_model: could not load RF scaler")
-
-lstm_model = None
-lstm_scaler = None
-lstm_meta = None
-
-env_lstm_path = os.environ.get("MOUSE_LSTM_PATH", "").strip()
-
-candidates = []
-if env_lstm_path:
-    candidates.append(env_lstm_path)
-candidates.append(os.path.join(MODEL_DIR, "mouse_lstm.keras"))
-candidates.append(os.path.join(MODEL_DIR, "mouse_lstm.h5"))
-candidates.append(os.path.join(MODEL_DIR, "mouse_lstm.keras.zip"))
-
-for p in candidates:
-    try:
-        if not p:
-            continue
-        if not os.path.exists(p):
-            continue
-        from tensorflow.keras.models import load_model # type: ignore
-        lstm_model = load_model(p)
-        logger.info("Loaded LSTM model from %s", p)
-        break
-    except Exception as e:
-        lstm_model = None
-        logger.debug("mouse_model: failed loading LSTM from %s (%s)", p, e)
-
-try:
-    lstm_scaler = joblib.load(os.path.join(MODEL_DIR, "mouse_lstm_scaler.save"))
-    logger.info("Loaded LSTM scaler")
-except Exception:
-    lstm_scaler = None
-    logger.warning("mouse_model: could not load LSTM scaler")
-
-lstm_meta = _safe_load_json(os.path.join(MODEL_DIR, "mouse_lstm_meta.json"), {})
-
+# Models come from the process-wide registry shared with app.py, so each artifact
+# (and the LSTM's TF graph) is loaded once, on first use.
+_MOUSE_FEATURE_MODELS = ("mouse_rf", "mouse_scaler", "mouse_lstm", "mouse_lstm_scaler", "mouse_lstm_meta",
+                         "mouse_ensemble_meta")
 
-# Load Ensemble Meta
-ensemble_meta = _safe_load_json(
-    os.path.join(MODEL_DIR, "mouse_ensemble_meta.json"),
-    {"rf_weight": 0.5, "lstm_weight": 0.5}
-)
 
-w_rf = float(ensemble_meta.get("rf_weight", 0.5))
-w_lstm = float(ensemble_meta.get("lstm_weight", 0.5))
+def _ensemble_weights(ensemble_meta):
+    ensemble_meta = ensemble_meta or {"rf_weight": 0.5, "lstm_weight": 0.5}
+    return float(ensemble_meta.get("rf_weight", 0.5)), float(ensemble_meta.get("lstm_weight", 0.5))
 
 #  Unified Prediction API (RF + LSTM + Ensemble)
 def predict_mouse_features(features_20):
+    rf_model, rf_scaler, lstm_model, lstm_scaler, lstm_meta, ensemble_meta = MODELS.get_many(*_MOUSE_FEATURE_MODELS)
+    w_rf, w_lstm = _ensemble_weights(ensemble_meta)
 
     try:
         feats = np.array(features_20, dtype=float)[selected_indices]
@@ -0,0 +1,164 @@
+# backend/ratelimit.py
+
+import os
+import time
+import logging
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+logger = logging.getLogger("ai_ml_cyberdefense.ratelimit")
+logger.setLevel(logging.INFO)
+
+_U32 = 0xFFFFFFFF
+
+
+class CountMinSketch:
+    """Small count-min sketch with periodic halving, used to count keys that do not
+    (yet) deserve an exact slot. Estimates never under-count."""
+
+    def __init__(self, width: int = 2048, depth: int = 4, decay_every: float = 1.0):
+        self.width = width
+        self.depth = depth
+        self.decay_every = decay_every
+        self.rows = array("I", bytes(4 * width * depth))
+        self._next_decay = 0.0
+
+    def _slots(self, key):
+        # double hashing: depth indices from one hash()
+        h = hash(key) & 0xFFFFFFFFFFFFFFFF
+        h1 = h & _U32
+        h2 = (h >> 32) | 1
+        w = self.width
+        return [r * w + (h1 + r * h2) % w for r in range(self.depth)]
+
+    def add(self, key, now: float) -> int:
+        if now >= self._next_decay:
+            self.decay(now)
+        rows = self.rows
+        est = _U32
+        for i in self._slots(key):
+            c = rows[i]
+            if c < _U32:
+                c += 1
+                rows[i] = c
+            if c < est:
+                est = c
+        return est
+
+    def estimate(self, key) -> int:
+        rows = self.rows
+        return min(rows[i] for i in self._slots(key))
+
+    def decay(self, now: float):
+        self.rows = array("I", (c >> 1 for c in self.rows))
+        self._next_decay = now + self.decay_every
+
+
+def slide(win_no: int, cur: int, prev: int, now: float, window: float) -> Tuple[int, int, int, int]:
+    """Count one hit in a two-bucket sliding-window counter.
+
+    State is the number of the current fixed window, its count and the previous
+    window's count; the estimate weights the previous count by how much of that
+    window still overlaps [now - window, now]. Returns (win_no, cur, prev, count).
+    RateLimiter and every shared_state backend use this same arithmetic.
+    """
+    n = int(now // window)
+    if n != win_no:
+        prev = cur if n == win_no + 1 else 0
+        cur = 0
+    cur = min(cur + 1, _U32)
+    overlap = 1.0 - (now - n * window) / window
+    return n, cur, prev, int(cur + prev * overlap)
+
+
+class _Shard:
+    __slots__ = ("lock", "state", "sketch", "evictions", "sketch_hits")
+
+    def __init__(self, sketch: Optional[CountMinSketch]):
+        self.lock = threading.Lock()
+        self.state = OrderedDict()    # key -> (window no, count, previous window's count)
+        self.sketch = sketch
+        self.evictions = 0
+        self.sketch_hits = 0
+
+
+class RateLimiter:
+    """Per-key sliding-window counter in a fixed number of lock-striped LRU shards.
+
+    Every key costs one small tuple (see slide()) and each shard keeps at most
+    max_keys/shards of them, evicting the least recently seen key first; a key that
+    went idle for two windows carries no state, so evicting it loses nothing.
+
+    With sketch=True a count-min sketch sits in front of each shard: keys are only
+    given an exact slot once they have been seen `promote_at` times within the decay
+    window, so a flood of one-off (e.g. spoofed) sources churns the sketch instead of
+    evicting the keys that are actually hammering us.
+    """
+
+    def __init__(self, window: float, limit: int, max_keys: int = 65536, shards: int = 16,
+                 sketch: bool = False, sketch_width: int = 2048, sketch_depth: int = 4, promote_at: int = 2):
+        if shards & (shards - 1):
+            raise ValueError("shards must be a power of two, got %d" % shards)
+        self.window = float(window)
+        self.limit = max(1, int(limit))
+        self.per_shard = max(1, max_keys // shards)
+        self.promote_at = promote_at
+        self._mask = shards - 1
+        self._shards = [_Shard(CountMinSketch(sketch_width, sketch_depth, self.window) if sketch else None)
+                        for _ in range(shards)]
+
+    def hit(self, key, now: Optional[float] = None) -> int:
+        """Record one request for `key`; returns the approximate number of requests
+        seen within the last `window` seconds, including this one."""
+        if now is None:
+            now = time.time()
+        sh = self._shards[hash(key) & self._mask]
+        with sh.lock:
+            st = sh.state.get(key)
+            if st is None:
+                if sh.sketch is not None:
+                    est = sh.sketch.add(key, now)
+                    if est < self.promote_at:
+                        sh.sketch_hits += 1
+                        return est
+                    # carry the sketch's count over into the exact state
+                    st = (int(now // self.window), est - 1, 0)
+                else:
+                    st = (-2, 0, 0)
+                if len(sh.state) >= self.per_shard:
+                    sh.state.popitem(last=False)
+                    sh.evictions += 1
+            else:
+                sh.state.move_to_end(key)
+            n, cur, prev, count = slide(st[0], st[1], st[2], now, self.window)
+            sh.state[key] = (n, cur, prev)
+        return count
+
+    def reset(self, key):
+        sh = self._shards[hash(key) & self._mask]
+        with sh.lock:
+            sh.state.pop(key, None)
+
+    def __len__(self):
+        return sum(len(sh.state) for sh in self._shards)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "keys": len(self),
+            "capacity": self.per_shard * len(self._shards),
+            "evictions": sum(sh.evictions for sh in self._shards),
+            "sketch_hits": sum(sh.sketch_hits for sh in self._shards),
+        }
+
+
+def limiter_from_env(window: float, limit: int) -> RateLimiter:
+    return RateLimiter(
+        window, limit,
+        max_keys=int(os.environ.get("IP_LIMIT_MAX_KEYS", 65536)),
+        shards=int(os.environ.get("IP_LIMIT_SHARDS", 16)),
+        sketch=os.environ.get("IP_LIMIT_SKETCH", "0").lower() in ("1", "true", "yes"),
+        sketch_width=int(os.environ.get("IP_LIMIT_SKETCH_WIDTH", 2048)),
+        promote_at=int(os.environ.get("IP_LIMIT_PROMOTE_AT", 2)),
+    )
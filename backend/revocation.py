@@ -0,0 +1,199 @@
+# backend/revocation.py
+
+import math
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, Iterable, Optional
+
+logger = logging.getLogger("ai_ml_cyberdefense.revocation")
+logger.setLevel(logging.INFO)
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings; k probes from one blake2b digest (double hashing)."""
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        capacity = max(1, int(capacity))
+        self.capacity = capacity
+        self.nbits = max(64, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.k = max(1, int(round(self.nbits / capacity * math.log(2))))
+        self._bits = bytearray((self.nbits + 7) // 8)
+        self.count = 0
+
+    def _probes(self, item: str):
+        h = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(h[:8], "little")
+        h2 = int.from_bytes(h[8:], "little") | 1
+        m = self.nbits
+        return [(h1 + i * h2) % m for i in range(self.k)]
+
+    def add(self, item: str):
+        bits = self._bits
+        for p in self._probes(item):
+            bits[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        bits = self._bits
+        for p in self._probes(item):
+            if not bits[p >> 3] & (1 << (p & 7)):
+                return False
+        return True
+
+
+class RevocationIndex:
+    """In-memory front for the refresh-token revocation lookup.
+
+    A Bloom filter of revoked jtis answers "definitely not revoked" - the common case -
+    without touching the DB; a small exact set of recently revoked jtis answers the
+    fresh revocations. Only a Bloom hit that is not in the recent set (an older
+    revocation, or a false positive) falls through to `lookup`, the authoritative DB
+    query. Until the first build() succeeds every call goes to `lookup`.
+
+    The filter is rebuilt from `load` (all revoked, unexpired jtis) by start()'s
+    background task, which first runs `purge` to delete expired rows. Revocations made
+    by other workers reach this one through `generation` (a shared_state Generation
+    that add() bumps): once it has moved past the value the filter was built at, a
+    "not revoked" from the filter is no longer trusted - those checks go to `lookup`
+    until a rebuild, which is started right away, has caught up. Without a
+    generation only this worker's revocations are seen before the next sync. Expiry
+    itself is not tracked: an expired refresh token is already rejected by its `exp`
+    claim.
+    """
+
+    def __init__(self, load: Callable[[], Iterable[str]], lookup: Callable[[str], bool],
+                 purge: Optional[Callable[[], int]] = None, capacity: int = 100000,
+                 error_rate: float = 0.01, recent_max: int = 4096, generation=None):
+        self.load = load
+        self.lookup = lookup
+        self.purge = purge
+        self.generation = generation
+        self._built_gen = None
+        self._rebuilding = False
+        self._next_rebuild = 0.0
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.recent_max = recent_max
+        self._bloom: Optional[BloomFilter] = None
+        self._recent = OrderedDict()    # jti -> revoked at
+        self._lock = threading.Lock()
+        self.fallbacks = 0
+
+    def _current_gen(self) -> Optional[int]:
+        try:
+            return self.generation.value()
+        except Exception as e:
+            logger.warning("revocation generation unreadable: %s", e)
+            return None
+
+    def build(self) -> int:
+        t0 = time.time()
+        # read before load(): a revocation committed during the load moves it past this
+        gen = self._current_gen() if self.generation is not None else None
+        jtis = list(self.load())
+        bloom = BloomFilter(max(self.capacity, 2 * len(jtis)), self.error_rate)
+        for jti in jtis:
+            bloom.add(jti)
+        with self._lock:
+            # revocations recorded while load() ran are only in the recent set
+            for jti in self._recent:
+                bloom.add(jti)
+            self._bloom = bloom
+            self._built_gen = gen
+        logger.info("revocation index: %d revoked jtis in %.1f ms", len(jtis), (time.time() - t0) * 1000.0)
+        return len(jtis)
+
+    def add(self, jti: str):
+        """Record a revocation made by this worker (call after the DB write) and tell
+        the other workers through the generation."""
+        with self._lock:
+            if self._bloom is not None:
+                self._bloom.add(jti)
+            self._recent[jti] = time.time()
+            self._recent.move_to_end(jti)
+            while len(self._recent) > self.recent_max:
+                self._recent.popitem(last=False)
+        if self.generation is None:
+            return
+        try:
+            gen = self.generation.bump()
+        except Exception as e:
+            logger.warning("revocation generation not bumped: %s", e)
+            return
+        with self._lock:
+            # nobody else revoked anything since our build: the filter stays current
+            if self._built_gen is not None and gen == self._built_gen + 1:
+                self._built_gen = gen
+
+    def _fresh(self) -> bool:
+        if self.generation is None:
+            return True
+        gen = self._current_gen()
+        if gen is not None and gen == self._built_gen:
+            return True
+        self._rebuild_async()
+        return False
+
+    def _rebuild_async(self):
+        now = time.time()
+        with self._lock:
+            # at most one at a time, and not in a loop while the generation stays unreadable
+            if self._rebuilding or now < self._next_rebuild:
+                return
+            self._rebuilding = True
+            self._next_rebuild = now + 1.0
+
+        def _run():
+            try:
+                self.build()
+            except Exception as e:
+                logger.warning("revocation index rebuild failed: %s", e)
+            finally:
+                self._rebuilding = False
+
+        threading.Thread(target=_run, name="revocation-rebuild", daemon=True).start()
+
+    def is_revoked(self, jti: str) -> bool:
+        bloom = self._bloom
+        if bloom is not None and jti not in bloom and self._fresh():
+            return False
+        if jti in self._recent:
+            return True
+        self.fallbacks += 1
+        return self.lookup(jti)
+
+    def sync(self):
+        if self.purge is not None:
+            try:
+                n = self.purge()
+                if n:
+                    logger.info("revocation index: purged %d expired refresh tokens", n)
+            except Exception as e:
+                logger.warning("refresh token purge failed: %s", e)
+        self.build()
+
+    def start(self, interval: float) -> Optional[threading.Thread]:
+        if interval <= 0:
+            return None
+
+        def _loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.sync()
+                except Exception as e:
+                    logger.warning("revocation index sync failed: %s", e)
+
+        t = threading.Thread(target=_loop, name="revocation-sync", daemon=True)
+        t.start()
+        return t
+
+    def stats(self) -> dict:
+        bloom = self._bloom
+        return {"ready": bloom is not None, "generation": self._built_gen,
+                "revoked": bloom.count if bloom is not None else 0,
+                "bits": bloom.nbits if bloom is not None else 0, "recent": len(self._recent),
+                "fallbacks": self.fallbacks}
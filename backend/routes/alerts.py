@@ -1,66 +1,76 @@
 # backend/routes/alerts.py
 from flask import Blueprint, jsonify, request, current_app
-from datetime import datetime
-import threading
-from typing import List, Dict, Any, Optional
+import os
+from typing import Dict, Any, Optional
+
+try:
+    from ..alert_ring import AlertRing, iso_to_ts  # type: ignore
+except Exception:
+    from alert_ring import AlertRing, iso_to_ts  # type: ignore
 
 alerts_bp = Blueprint("alerts", __name__)
 collect_bp = None
-_module_alert_store: List[Dict[str, Any]] = []
-_module_store_lock = threading.Lock()
+
+# most recent alerts kept in memory; older ones are overwritten (the DB keeps history)
+ALERTS_STORE_CAPACITY = int(os.environ.get("ALERTS_STORE_CAPACITY", 10000))
+_module_alert_store = AlertRing(ALERTS_STORE_CAPACITY)
 
 def init_app(app):
-    app.extensions.setdefault("alerts_store", [])
+    app.extensions.setdefault("alerts_store", AlertRing(ALERTS_STORE_CAPACITY))
     return app
 
-def _get_store():
+def _get_store() -> AlertRing:
     try:
         # If inside an application context, use per-app store
-        store = current_app.extensions.setdefault("alerts_store", [])
+        store = current_app.extensions.get("alerts_store")
+        if store is None:
+            store = current_app.extensions.setdefault("alerts_store", AlertRing(ALERTS_STORE_CAPACITY))
         return store
     except RuntimeError:
         return _module_alert_store
 
-def _append_alert_to_store(alert: Dict[str, Any]):
+def _get_service():
+    # backend/alert_service.py, installed by app.py: DB-backed alerts with a hot tier
     try:
-        
-        store = current_app.extensions.setdefault("alerts_store", [])
-        store.append(alert)
-        return alert
+        return current_app.extensions.get("alert_service")
     except RuntimeError:
-        
-        with _module_store_lock:
-            _module_alert_store.append(alert)
-            return alert
+        return None
+
+def _append_alert_to_store(alert: Dict[str, Any]):
+    return _get_store().append(alert)
 
 @alerts_bp.route("/api/alerts", methods=["GET"])
 @alerts_bp.route("/alerts", methods=["GET"])
 def get_alerts():
-    store = _get_store()
-
-    limit = request.args.get("limit", default=50, type=int)
+    limit = request.args.get("limit", default=None, type=int) or request.args.get("per_page", default=50, type=int)
     since = request.args.get("since", default=None, type=str)
+    before_id = request.args.get("before_id", default=None, type=int)
 
-    filtered = list(store) 
-
+    since_ts = None
     if since:
         try:
-            since_dt = datetime.fromisoformat(since)
-            # keep alerts with timestamp >= since_dt
-            def _parse_ts(a):
-                try:
-                    return datetime.fromisoformat(a.get("timestamp"))
-                except Exception:
-                    return None
-            filtered = [a for a in filtered if (_parse_ts(a) is not None and _parse_ts(a) >= since_dt)]
+            since_ts = iso_to_ts(since)
         except Exception:
-            
-            pass
+            # unparseable `since`: behave as if it was not given
+            since_ts = None
+
+    service = _get_service()
+    if service is not None:
+        # recent windows from memory, older pages (before_id) by keyset from the DB
+        return jsonify(service.recent(limit, since=since_ts, before_id=before_id)), 200
 
-    
-    result = list(reversed(filtered))[:limit]
+    # newest first; bisect to `since`, then at most `limit` entries
+    result = _get_store().latest(limit, since=since_ts)
     return jsonify(result), 200
 
+@alerts_bp.route("/api/alerts/stats", methods=["GET"])
+def get_alert_stats():
+    service = _get_service()
+    if service is None:
+        return jsonify({"hot": len(_get_store())}), 200
+    minutes = request.args.get("minutes", default=None, type=int)
+    return jsonify({"cache": service.stats(), "per_minute": service.histogram(minutes)}), 200
+
 @alerts_bp.route("/api/alerts", methods=["POST"])
 @alerts_bp.route("/alerts", methods=["POST"])
 def post_alert():
@@ -69,40 +79,35 @@ def post_alert():
     message = j.get("message", "alert")
     meta = j.get("meta", {}) or {}
 
+    service = _get_service()
+    if service is not None:
+        alert = service.record("external", 0.0, severity, meta={**meta, "message": message, "severity": severity})
+        alert.update({"severity": severity, "message": message})
+        return jsonify(alert), 201
+
     alert = {
-        "id": None, 
-        "timestamp": datetime.utcnow().isoformat(),
+        "id": None,
+        "timestamp": None,
         "severity": severity,
         "message": message,
         "meta": meta
     }
-    store = _get_store()
-    if store is _module_alert_store:
-        with _module_store_lock:
-            store.append(alert)
-            alert["id"] = str(len(store))
-    else:
-        store.append(alert)
-        alert["id"] = str(len(store))
+    _get_store().append(alert)
 
     return jsonify(alert), 201
 
 
 def add_alert(severity: str = "info", message: str = "test alert", meta: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-    store = _get_store()
+    service = _get_service()
+    if service is not None:
+        alert = service.record("external", 0.0, severity, meta={**(meta or {}), "message": message, "severity": severity})
+        alert.update({"severity": severity, "message": message})
+        return alert
     a = {
         "id": None,
-        "timestamp": datetime.utcnow().isoformat(),
+        "timestamp": None,
         "severity": severity,
         "message": message,
         "meta": meta or {}
     }
-
-    if store is _module_alert_store:
-        with _module_store_lock:
-            _module_alert_store.append(a)
-            a["id"] = str(len(_module_alert_store))
-    else:
-        store.append(a)
-        a["id"] = str(len(store))
-    return a
\ No newline at end of file
+    return _get_store().append(a)
@@ -234,10 +234,14 @@ def collect_mouse():
             # socketio emit
             try:
                 socketio = current_app.extensions.get("socketio")
+                fanout = current_app.extensions.get("alert_fanout")
                 if socketio:
                     # emit mouse_prediction for dashboard
                     try:
-                        socketio.emit("mouse_prediction", {"session_id": session_id, "prediction": prediction}, broadcast=True)
+                        if fanout is not None:
+                            fanout.publish("mouse_prediction", {"session_id": session_id, "prediction": prediction})
+                        else:
+                            socketio.emit("mouse_prediction", {"session_id": session_id, "prediction": prediction}, broadcast=True)
                     except Exception:
                         current_app.logger.exception("socketio.emit(mouse_prediction) failed")
                     # Determine high-alert using environment threshold
@@ -270,7 +274,10 @@ def collect_mouse():
                             "events_count": len(events),
                         }
                         try:
-                            socketio.emit("new_alert", alert_payload, broadcast=True)
+                            if fanout is not None:
+                                fanout.publish("new_alert", alert_payload)
+                            else:
+                                socketio.emit("new_alert", alert_payload, broadcast=True)
                         except Exception:
                             current_app.logger.exception("socketio.emit(new_alert) failed")
             except Exception:
@@ -0,0 +1,671 @@
+# backend/shared_state.py
+
+import os
+import time
+import mmap
+import fcntl
+import socket
+import struct
+import hashlib
+import logging
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from backend.blocklist import Blocklist, parse_cidr, net_str, ip_to_int
+from backend.ratelimit import RateLimiter, limiter_from_env, slide
+
+logger = logging.getLogger("ai_ml_cyberdefense.shared_state")
+logger.setLevel(logging.INFO)
+
+# "local" keeps everything in the worker (single-process dev server); "shm" shares an
+# mmap'd file between the workers of one host; "redis" talks RESP to a redis(-compatible) server
+STATE_BACKEND = os.environ.get("STATE_BACKEND", "local").lower()
+STATE_SHM_PATH = os.environ.get("STATE_SHM_PATH", "/dev/shm/ai_ml_cyberdefense.state")
+STATE_SHM_BLOCK_SLOTS = int(os.environ.get("STATE_SHM_BLOCK_SLOTS", 262144))
+STATE_SHM_RATE_SLOTS = int(os.environ.get("STATE_SHM_RATE_SLOTS", 131072))
+STATE_REDIS_URL = os.environ.get("STATE_REDIS_URL", "redis://127.0.0.1:6379/0")
+STATE_REDIS_PREFIX = os.environ.get("STATE_REDIS_PREFIX", "aicd:")
+# how long a worker trusts its local answer for is_blocked before asking the backend again
+STATE_CACHE_TTL = float(os.environ.get("STATE_CACHE_TTL", 0.5))
+STATE_CACHE_MAX = int(os.environ.get("STATE_CACHE_MAX", 65536))
+# where the per-host generation counters live (see Generation); redis keeps them in redis
+STATE_GEN_DIR = os.environ.get("STATE_GEN_DIR", os.path.dirname(STATE_SHM_PATH))
+
+
+class StateBackend(ABC):
+    """What the shared blocklist / limiter need from a store shared by all workers."""
+
+    @abstractmethod
+    def lookup(self, entries: List[str], now: float) -> float:
+        """Latest unblock_at among `entries` that is still in the future, else 0.0."""
+
+    @abstractmethod
+    def set_block(self, entry: str, unblock_at: float, prefix: Optional[Tuple[int, int]] = None):
+        pass
+
+    @abstractmethod
+    def del_block(self, entry: str):
+        pass
+
+    @abstractmethod
+    def blocks(self, now: float) -> Dict[str, float]:
+        pass
+
+    @abstractmethod
+    def prefix_lengths(self) -> List[Tuple[int, int]]:
+        """(address bits, prefix length) pairs that have ever held a CIDR block."""
+
+    @abstractmethod
+    def rate_hit(self, key: str, now: float, window: float, limit: int) -> int:
+        """Count one request for `key`; sliding-window estimate (ratelimit.slide) of
+        the requests within the last `window` seconds, this one included."""
+
+    def purge(self, now: float) -> int:
+        return 0
+
+
+# ---------------------------------------------------------------------------
+# Single-host backend: open-addressing hash tables in an mmap'd file
+# ---------------------------------------------------------------------------
+_MAGIC = b"AICDST02"
+_HDR = struct.Struct("<8sIII")        # magic, block slots, rate slots, key bytes
+_HDR_SIZE = 4096
+_PLEN_OFF = 64                        # 3 x uint64 bitmap of prefix lengths in use (_plen_bit)
+_USED_OFF = 96                        # uint64 occupied-slot count per table (blocks, rates)
+_COMPACT_OFF = 112                    # uint64 occupancy that triggers the next rebuild, per table
+_KEY_MAX = 62
+_SLOT = struct.Struct("<QdIIH%ds" % _KEY_MAX)  # hash, value, 2 x uint32 aux, key length, key bytes (88 bytes)
+_u64 = struct.Struct("<Q")
+
+
+def _key_hash(key: bytes) -> int:
+    # stable across processes (hash() is salted per interpreter); 0 marks an empty slot
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little") or 1
+
+
+def _plen_bit(bits: int, plen: int) -> int:
+    # v4 lengths 0..32 -> bits 0..32, v6 lengths 0..128 -> bits 64..192
+    return plen if bits == 32 else 64 + plen
+
+
+class _SlotTable:
+    """Linear-probing table of (key -> float, two uint32s) inside a shared mapping.
+
+    A slot whose value is <= now is dead (expired or deleted) and can be reused, but
+    keeps its hash so probe chains stay intact. When occupancy reaches the compaction
+    mark (3/4 of the slots at first, then halfway between the live count and full) the
+    table is rebuilt from its live entries. Callers hold the file lock.
+    """
+
+    def __init__(self, mm, offset: int, slots: int, used_off: int, compact_off: int):
+        self.mm = mm
+        self.offset = offset
+        self.slots = slots
+        self.used_off = used_off
+        self.compact_off = compact_off
+
+    def _probe(self, key: bytes, h: int, now: float):
+        # returns (slot index of key or -1, first reusable slot or -1)
+        mm, off, n = self.mm, self.offset, self.slots
+        kb = key[:_KEY_MAX]
+        free = -1
+        i = h % n
+        for _ in range(n):
+            sh, val, _, _, klen, kbytes = _SLOT.unpack_from(mm, off + i * _SLOT.size)
+            if sh == 0:
+                return -1, (free if free >= 0 else i)
+            if sh == h and kbytes[:klen] == kb:
+                return i, free
+            if free < 0 and val <= now:
+                free = i
+            i = (i + 1) % n
+        return -1, free
+
+    def get(self, key: bytes, now: float) -> float:
+        return self.get_aux(key, now)[0]
+
+    def get_aux(self, key: bytes, now: float) -> Tuple[float, int, int]:
+        i, _ = self._probe(key, _key_hash(key), now)
+        if i < 0:
+            return 0.0, 0, 0
+        return _SLOT.unpack_from(self.mm, self.offset + i * _SLOT.size)[1:4]
+
+    def put(self, key: bytes, value: float, now: float, a: int = 0, b: int = 0) -> bool:
+        h = _key_hash(key)
+        i, free = self._probe(key, h, now)
+        if i < 0:
+            i = free
+        if i < 0:
+            return False
+        kb = key[:_KEY_MAX]
+        pos = self.offset + i * _SLOT.size
+        fresh = _u64.unpack_from(self.mm, pos)[0] == 0
+        _SLOT.pack_into(self.mm, pos, h, value, a, b, len(kb), kb)
+        if fresh:
+            used = _u64.unpack_from(self.mm, self.used_off)[0] + 1
+            _u64.pack_into(self.mm, self.used_off, used)
+            mark = _u64.unpack_from(self.mm, self.compact_off)[0] or self.slots * 3 // 4
+            if used >= mark:
+                self.compact(now)
+        return True
+
+    def items(self, now: float) -> Iterable[Tuple[bytes, float]]:
+        mm, off = self.mm, self.offset
+        for i in range(self.slots):
+            sh, val, _, _, klen, kbytes = _SLOT.unpack_from(mm, off + i * _SLOT.size)
+            if sh and val > now:
+                yield kbytes[:klen], val
+
+    def compact(self, now: float) -> int:
+        # rewrite live entries into a clean table so dead slots stop lengthening probes
+        # (slots keep their stored hash: a truncated key cannot be re-hashed)
+        mm, off = self.mm, self.offset
+        live = []
+        for i in range(self.slots):
+            slot = _SLOT.unpack_from(mm, off + i * _SLOT.size)
+            if slot[0] and slot[1] > now:
+                live.append(slot)
+        dead = _u64.unpack_from(mm, self.used_off)[0] - len(live)
+        mm[off:off + self.slots * _SLOT.size] = bytes(self.slots * _SLOT.size)
+        _u64.pack_into(mm, self.used_off, len(live))
+        _u64.pack_into(mm, self.compact_off, len(live) + (self.slots - len(live)) // 2)
+        for slot in live:
+            i = slot[0] % self.slots
+            while _u64.unpack_from(mm, off + i * _SLOT.size)[0]:
+                i = (i + 1) % self.slots
+            _SLOT.pack_into(mm, off + i * _SLOT.size, *slot)
+        return dead
+
+
+class ShmBackend(StateBackend):
+    """Blocklist + limiter state in one mmap'd file (default on /dev/shm) shared by all
+    workers of a host. Writers and readers serialize on flock(); every worker reads
+    through its local cache, so the lock is only taken on cache misses and writes.
+    Keys longer than 62 bytes are stored truncated (the 64-bit hash covers the full key).
+    """
+
+    def __init__(self, path: str = STATE_SHM_PATH, block_slots: int = STATE_SHM_BLOCK_SLOTS,
+                 rate_slots: int = STATE_SHM_RATE_SLOTS):
+        self.path = path
+        self.block_slots = block_slots
+        self.rate_slots = rate_slots
+        self.size = _HDR_SIZE + (block_slots + rate_slots) * _SLOT.size
+        self._pid = None
+        self._open()
+
+    def _open(self):
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(fd).st_size < self.size:
+                os.ftruncate(fd, self.size)
+                os.pwrite(fd, _HDR.pack(_MAGIC, self.block_slots, self.rate_slots, _KEY_MAX), 0)
+            else:
+                magic, bs, rs, km = _HDR.unpack(os.pread(fd, _HDR.size, 0))
+                if magic != _MAGIC or km != _KEY_MAX:
+                    raise RuntimeError("%s is not a state file for this version; stop all workers and remove it, "
+                                       "or point STATE_SHM_PATH elsewhere" % self.path)
+                # the first worker decides the geometry
+                self.block_slots, self.rate_slots = bs, rs
+                self.size = _HDR_SIZE + (bs + rs) * _SLOT.size
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        self._fd = fd
+        self._mm = mmap.mmap(fd, self.size, mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+        self._blocks = _SlotTable(self._mm, _HDR_SIZE, self.block_slots, _USED_OFF, _COMPACT_OFF)
+        self._rates = _SlotTable(self._mm, _HDR_SIZE + self.block_slots * _SLOT.size, self.rate_slots,
+                                 _USED_OFF + 8, _COMPACT_OFF + 8)
+        self._full_logged = 0.0
+        self._tlock = threading.Lock()
+        self._pid = os.getpid()
+
+    def _locked(self, exclusive: bool):
+        # flock is per open file description: a forked worker (gunicorn --preload) must
+        # reopen the file or its lock would not exclude its siblings
+        if self._pid != os.getpid():
+            self._open()
+        return _FileLock(self._fd, self._tlock, exclusive)
+
+    def lookup(self, entries, now):
+        best = 0.0
+        with self._locked(False):
+            for e in entries:
+                v = self._blocks.get(e.encode(), now)
+                if v > now and v > best:
+                    best = v
+        return best
+
+    def set_block(self, entry, unblock_at, prefix=None):
+        with self._locked(True):
+            now = time.time()
+            if not self._blocks.put(entry.encode(), unblock_at, now) and now - self._full_logged > 60.0:
+                self._full_logged = now
+                logger.warning("shared blocklist full (%d slots, STATE_SHM_BLOCK_SLOTS); %s not stored", self.block_slots, entry)
+            if prefix is not None:
+                bit = _plen_bit(*prefix)
+                off = _PLEN_OFF + (bit // 64) * 8
+                cur = _u64.unpack_from(self._mm, off)[0]
+                _u64.pack_into(self._mm, off, cur | (1 << (bit % 64)))
+
+    def del_block(self, entry):
+        with self._locked(True):
+            key = entry.encode()
+            if self._blocks.get(key, 0.0):
+                self._blocks.put(key, 0.0, 0.0)
+
+    def blocks(self, now):
+        with self._locked(False):
+            return {k.decode("utf-8", "replace"): v for k, v in self._blocks.items(now)}
+
+    def prefix_lengths(self):
+        with self._locked(False):
+            words = [_u64.unpack_from(self._mm, _PLEN_OFF + 8 * i)[0] for i in range(3)]
+        out = []
+        for bit in range(192):
+            if words[bit // 64] >> (bit % 64) & 1:
+                out.append((32, bit) if bit < 64 else (128, bit - 64))
+        return out
+
+    def rate_hit(self, key, now, window, limit):
+        # slot value is the entry's expiry, the end of the window after the current one,
+        # so it also encodes the current window's number; aux holds the two counts
+        kb = key.encode()
+        with self._locked(True):
+            expires, cur, prev = self._rates.get_aux(kb, now)
+            win_no = int(round(expires / window)) - 2 if expires > now else -2
+            n, cur, prev, count = slide(win_no, cur, prev, now, window)
+            if not self._rates.put(kb, (n + 2) * window, now, cur, prev):
+                # table full of live keys: answer from this request alone rather than fail
+                logger.debug("shared rate table full; %s not tracked", key)
+        return count
+
+    def purge(self, now):
+        with self._locked(True):
+            return self._blocks.compact(now) + self._rates.compact(now)
+
+
+class _FileLock:
+    __slots__ = ("fd", "tlock", "op")
+
+    def __init__(self, fd, tlock, exclusive):
+        self.fd = fd
+        self.tlock = tlock
+        self.op = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+
+    def __enter__(self):
+        # flock does not exclude threads of the same process, so pair it with a mutex
+        self.tlock.acquire()
+        fcntl.flock(self.fd, self.op)
+
+    def __exit__(self, *exc):
+        fcntl.flock(self.fd, fcntl.LOCK_UN)
+        self.tlock.release()
+
+
+# ---------------------------------------------------------------------------
+# Multi-host backend: minimal RESP client (no redis package needed)
+# ---------------------------------------------------------------------------
+class RespError(Exception):
+    pass
+
+
+class RespClient:
+    """Tiny synchronous RESP2 client: enough for GET/SET/DEL/MGET/SCAN/SADD/INCR."""
+
+    def __init__(self, url: str = STATE_REDIS_URL, timeout: float = 1.0):
+        u = urlparse(url)
+        self.host = u.hostname or "127.0.0.1"
+        self.port = u.port or 6379
+        self.db = int((u.path or "/0").lstrip("/") or 0)
+        self.password = u.password
+        self.timeout = timeout
+        self._sock = None
+        self._rfile = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        self.close()
+        s = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._sock = s
+        self._rfile = s.makefile("rb")
+        self._pid = os.getpid()
+        if self.password:
+            self._roundtrip([("AUTH", self.password)])
+        if self.db:
+            self._roundtrip([("SELECT", self.db)])
+
+    def close(self):
+        if self._sock is not None:
+            try:
+                self._rfile.close()
+                self._sock.close()
+            except OSError:
+                pass
+        self._sock = self._rfile = None
+
+    @staticmethod
+    def _encode(args) -> bytes:
+        out = [b"*%d\r\n" % len(args)]
+        for a in args:
+            if not isinstance(a, bytes):
+                a = str(a).encode()
+            out.append(b"$%d\r\n%s\r\n" % (len(a), a))
+        return b"".join(out)
+
+    def _read(self):
+        line = self._rfile.readline()
+        if not line:
+            raise ConnectionError("connection closed by server")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode()
+        if kind == b"-":
+            return RespError(rest.decode())
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            n = int(rest)
+            if n < 0:
+                return None
+            data = self._rfile.read(n + 2)
+            return data[:-2]
+        if kind == b"*":
+            n = int(rest)
+            return None if n < 0 else [self._read() for _ in range(n)]
+        raise RespError("bad reply type %r" % kind)
+
+    def _roundtrip(self, commands):
+        self._sock.sendall(b"".join(self._encode(c) for c in commands))
+        replies = [self._read() for _ in commands]
+        for r in replies:
+            if isinstance(r, RespError):
+                raise r
+        return replies
+
+    def pipeline(self, *commands):
+        """Send several commands in one write; returns their replies in order."""
+        with self._lock:
+            for attempt in (0, 1):
+                try:
+                    if self._sock is None or self._pid != os.getpid():
+                        self._connect()
+                    return self._roundtrip(commands)
+                except (OSError, ConnectionError):
+                    self.close()
+                    if attempt:
+                        raise
+
+    def call(self, *args):
+        return self.pipeline(args)[0]
+
+
+class RedisBackend(StateBackend):
+    """Blocks as `<prefix>blk:<entry>` strings expiring on their own (PX), prefix
+    lengths in the `<prefix>plens` set, and per-key rates as a sliding-window
+    counter over two fixed windows (`<prefix>rl:<key>:<window no>`)."""
+
+    def __init__(self, url: str = STATE_REDIS_URL, prefix: str = STATE_REDIS_PREFIX):
+        self.client = RespClient(url)
+        self.prefix = prefix
+
+    def lookup(self, entries, now):
+        vals = self.client.call("MGET", *[self.prefix + "blk:" + e for e in entries])
+        best = 0.0
+        for v in vals or ():
+            if v is not None:
+                ts = float(v)
+                if ts > now and ts > best:
+                    best = ts
+        return best
+
+    def set_block(self, entry, unblock_at, prefix=None):
+        ttl_ms = int((unblock_at - time.time()) * 1000)
+        if ttl_ms <= 0:
+            return
+        cmds = [("SET", self.prefix + "blk:" + entry, repr(unblock_at), "PX", ttl_ms)]
+        if prefix is not None:
+            cmds.append(("SADD", self.prefix + "plens", "%d/%d" % prefix))
+        self.client.pipeline(*cmds)
+
+    def del_block(self, entry):
+        self.client.call("DEL", self.prefix + "blk:" + entry)
+
+    def blocks(self, now):
+        pat = self.prefix + "blk:*"
+        cursor = b"0"
+        keys = []
+        while True:
+            cursor, batch = self.client.call("SCAN", cursor, "MATCH", pat, "COUNT", 1000)
+            keys.extend(batch)
+            if cursor in (b"0", 0, "0"):
+                break
+        out = {}
+        skip = len(self.prefix) + 4
+        for i in range(0, len(keys), 1000):
+            chunk = keys[i:i + 1000]
+            for k, v in zip(chunk, self.client.call("MGET", *chunk)):
+                if v is not None and float(v) > now:
+                    out[k.decode("utf-8", "replace")[skip:]] = float(v)
+        return out
+
+    def prefix_lengths(self):
+        out = []
+        for m in self.client.call("SMEMBERS", self.prefix + "plens") or ():
+            bits, plen = m.decode().split("/")
+            out.append((int(bits), int(plen)))
+        return out
+
+    def rate_hit(self, key, now, window, limit):
+        # ratelimit.slide() with the two buckets as expiring counters: this window's
+        # count plus the previous window's, weighted by how much of it still overlaps
+        n = int(now // window)
+        cur_key = "%srl:%s:%d" % (self.prefix, key, n)
+        prev_key = "%srl:%s:%d" % (self.prefix, key, n - 1)
+        cur, _, prev = self.client.pipeline(("INCR", cur_key), ("PEXPIRE", cur_key, int(window * 2000)), ("GET", prev_key))
+        overlap = 1.0 - (now - n * window) / window
+        return int(cur + (int(prev) if prev else 0) * overlap)
+
+
+# ---------------------------------------------------------------------------
+# Worker-side views with a short-TTL local cache
+# ---------------------------------------------------------------------------
+class SharedBlocklist:
+    """Blocklist-compatible view (is_blocked/add/remove/items/purge) over a StateBackend.
+
+    Verdicts are cached per looked-up entry for STATE_CACHE_TTL seconds, so the
+    before-request check stays in-process; a block added in another worker is seen
+    here within one TTL. Local writes update the cache immediately.
+    """
+
+    def __init__(self, backend: StateBackend, cache_ttl: float = STATE_CACHE_TTL, cache_max: int = STATE_CACHE_MAX):
+        self.backend = backend
+        self.cache_ttl = cache_ttl
+        self.cache_max = cache_max
+        self._cache: Dict[str, Tuple[float, float]] = {}    # entry -> (unblock_at, valid_until)
+        self._plens: List[Tuple[int, int]] = []
+        self._plens_until = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    def _candidates(self, entry: str, now: float) -> List[str]:
+        if now >= self._plens_until:
+            try:
+                self._plens = self.backend.prefix_lengths()
+            except Exception as e:
+                logger.debug("prefix_lengths failed: %s", e)
+            self._plens_until = now + self.cache_ttl
+        out = [entry]
+        if self._plens:
+            addr = ip_to_int(entry)
+            if addr is not None:
+                bits, value = addr
+                for b, plen in self._plens:
+                    if b == bits:
+                        out.append(net_str(bits, plen, value >> (bits - plen) << (bits - plen)))
+        return out
+
+    def is_blocked(self, entry: str, now: Optional[float] = None) -> bool:
+        if now is None:
+            now = time.time()
+        hit = self._cache.get(entry)
+        if hit is not None and hit[1] > now:
+            self.hits += 1
+            return hit[0] > now
+        self.misses += 1
+        try:
+            until = self.backend.lookup(self._candidates(entry, now), now)
+        except Exception as e:
+            # backend down: fall back to what we last knew (or allow)
+            logger.warning("shared blocklist lookup failed: %s", e)
+            return hit is not None and hit[0] > now
+        if len(self._cache) >= self.cache_max:
+            self._cache.clear()
+        self._cache[entry] = (until, now + self.cache_ttl)
+        return until > now
+
+    def add(self, entry: str, unblock_at: float):
+        cidr = parse_cidr(entry)
+        if cidr is None:
+            self.backend.set_block(entry, unblock_at)
+            self._cache[entry] = (unblock_at, time.time() + self.cache_ttl)
+        else:
+            bits, plen, net = cidr
+            self.backend.set_block(net_str(bits, plen, net), unblock_at, (bits, plen))
+            # any cached address may fall inside the new prefix
+            self._cache.clear()
+            self._plens_until = 0.0
+
+    def remove(self, entry: str) -> bool:
+        cidr = parse_cidr(entry)
+        self.backend.del_block(net_str(*cidr) if cidr else entry)
+        if cidr:
+            self._cache.clear()
+        else:
+            self._cache.pop(entry, None)
+        return True
+
+    def items(self) -> Dict[str, float]:
+        return self.backend.blocks(time.time())
+
+    def purge(self, now: Optional[float] = None) -> int:
+        return self.backend.purge(time.time() if now is None else now)
+
+    def stats(self) -> Dict[str, int]:
+        return {"cached": len(self._cache), "hits": self.hits, "misses": self.misses}
+
+
+class SharedRateLimiter:
+    """RateLimiter-compatible hit() whose counts are shared by all workers."""
+
+    def __init__(self, backend: StateBackend, window: float, limit: int):
+        self.backend = backend
+        self.window = float(window)
+        self.limit = int(limit)
+        # used when the backend is unreachable, so a flood is still limited per worker
+        self._fallback = RateLimiter(window, limit, max_keys=16384)
+
+    def hit(self, key, now: Optional[float] = None) -> int:
+        if now is None:
+            now = time.time()
+        try:
+            return self.backend.rate_hit(key, now, self.window, self.limit)
+        except Exception as e:
+            logger.warning("shared rate_hit failed: %s", e)
+            return self._fallback.hit(key, now)
+
+
+# ---------------------------------------------------------------------------
+# Generation counters: "something changed, re-read it" signals between workers
+# ---------------------------------------------------------------------------
+class Generation:
+    """A counter every worker can bump and cheaply poll, in an 8-byte file.
+
+    value() is one pread(); bump() increments under an exclusive flock. A worker
+    that remembers the value its cached state was built at knows the cache is stale
+    as soon as the value moves. Files live in STATE_GEN_DIR, so this reaches every
+    worker on the host whatever STATE_BACKEND is.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd = -1
+        self._pid = None
+
+    def _open(self) -> int:
+        # per process: flock on a descriptor inherited across fork would not exclude siblings
+        if self._pid != os.getpid():
+            d = os.path.dirname(self.path)
+            if d:
+                os.makedirs(d, exist_ok=True)
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            self._pid = os.getpid()
+        return self._fd
+
+    def value(self) -> int:
+        data = os.pread(self._open(), 8, 0)
+        return _u64.unpack(data)[0] if len(data) == 8 else 0
+
+    def bump(self) -> int:
+        fd = self._open()
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            data = os.pread(fd, 8, 0)
+            v = (_u64.unpack(data)[0] if len(data) == 8 else 0) + 1
+            os.pwrite(fd, _u64.pack(v), 0)
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        return v
+
+
+class RedisGeneration:
+    """Generation kept as `<prefix>gen:<name>` in redis, for workers on several hosts."""
+
+    def __init__(self, client: RespClient, key: str):
+        self.client = client
+        self.key = key
+
+    def value(self) -> int:
+        v = self.client.call("GET", self.key)
+        return int(v) if v else 0
+
+    def bump(self) -> int:
+        return int(self.client.call("INCR", self.key))
+
+
+def generation_from_env(name: str):
+    if STATE_BACKEND == "redis":
+        return RedisGeneration(RespClient(STATE_REDIS_URL), STATE_REDIS_PREFIX + "gen:" + name)
+    d = STATE_GEN_DIR if STATE_GEN_DIR and os.path.isdir(STATE_GEN_DIR) else tempfile.gettempdir()
+    return Generation(os.path.join(d, "ai_ml_cyberdefense.%s.gen" % name))
+
+
+def socketio_queue_from_env() -> Optional[str]:
+    """Message queue URL for Flask-SocketIO: SOCKETIO_MESSAGE_QUEUE, else the redis
+    state server when STATE_BACKEND=redis, else None (single worker)."""
+    url = os.environ.get("SOCKETIO_MESSAGE_QUEUE", "").strip()
+    if url:
+        return url
+    return STATE_REDIS_URL if STATE_BACKEND == "redis" else None
+
+
+def state_backend_from_env() -> Optional[StateBackend]:
+    if STATE_BACKEND == "shm":
+        return ShmBackend()
+    if STATE_BACKEND == "redis":
+        return RedisBackend()
+    if STATE_BACKEND != "local":
+        logger.warning("unknown STATE_BACKEND=%r, using local state", STATE_BACKEND)
+    return None
+
+
+def make_blocklist(backend: Optional[StateBackend]):
+    return SharedBlocklist(backend) if backend is not None else Blocklist()
+
+
+def make_ip_limiter(backend: Optional[StateBackend], window: float, limit: int):
+    return SharedRateLimiter(backend, window, limit) if backend is not None else limiter_from_env(window, limit)
@@ -0,0 +1,151 @@
+# backend/startup.py
+
+import os
+import sys
+import time
+import builtins
+import importlib
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+_builtin_import = builtins.__import__
+
+
+def process_start_time() -> Optional[float]:
+    """Epoch seconds at which this process was started (Linux /proc), else None."""
+    try:
+        with open("/proc/self/stat") as fh:
+            # field 22, counted after the parenthesised command name (which may hold spaces)
+            ticks = int(fh.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/stat") as fh:
+            btime = next(int(line.split()[1]) for line in fh if line.startswith("btime"))
+        return btime + ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError, StopIteration):
+        return None
+
+
+def preloading_master() -> bool:
+    """True in a gunicorn master that imports the app before forking (gunicorn.conf.py
+    sets GUNICORN_PRELOADING). Import-time DB work and background threads must then
+    wait for post_fork: a child forked while one of them holds a lock, or shares the
+    master's pooled DB sockets, is broken for good."""
+    return os.environ.get("GUNICORN_PRELOADING") == "1"
+
+
+class StartupProfiler:
+    """Where the time between process start and the first healthy response goes.
+
+    install() wraps builtins.__import__ while app.py is being imported and records the
+    inclusive wall time of the first import of every top-level package (and of every
+    backend.* module). Imports nested inside another timed one are attributed to it
+    via `parent`, so the top-level entries add up without double counting. phase()
+    times named startup steps; lazy_import() times heavy modules that are imported
+    only when the subsystem needing them is first used, after startup.
+    """
+
+    def __init__(self):
+        self.t0 = time.time()
+        self.process_start = process_start_time() or self.t0
+        self.imports: Dict[str, Dict[str, Any]] = {}
+        self.phases: List[Dict[str, Any]] = []
+        self.ready_at: Optional[float] = None
+        self.first_healthy_at: Optional[float] = None
+        self._orig_import = None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def offset_ms(self, ts: float) -> float:
+        return round((ts - self.process_start) * 1000.0, 1)
+
+    def _record(self, key: str, start: float, end: float, parent: Optional[str], deferred: bool, reason=None):
+        with self._lock:
+            if key in self.imports:
+                return
+            self.imports[key] = {"module": key, "ms": round((end - start) * 1000.0, 1), "at_ms": self.offset_ms(start),
+                                 "parent": parent, "deferred": deferred, "reason": reason}
+
+    # ---- import timing ----
+    def install(self):
+        if self._orig_import is None:
+            self._orig_import = builtins.__import__
+            builtins.__import__ = self._import
+
+    def uninstall(self):
+        # another hook installed on top of ours keeps the chain; ours then passes through
+        if self._orig_import is not None and builtins.__import__ == self._import:
+            builtins.__import__ = self._orig_import
+        self._orig_import = None
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        orig = self._orig_import or _builtin_import
+        if level or not name:
+            return orig(name, globals, locals, fromlist, level)
+        key = name if name.startswith("backend.") else name.partition(".")[0]
+        if key in sys.modules or key in self.imports:
+            return orig(name, globals, locals, fromlist, level)
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        parent = stack[-1] if stack else None
+        stack.append(key)
+        start = time.time()
+        try:
+            return orig(name, globals, locals, fromlist, level)
+        finally:
+            stack.pop()
+            if key in sys.modules:
+                self._record(key, start, time.time(), parent, deferred=False)
+
+    def lazy_import(self, name: str, reason: Optional[str] = None):
+        """importlib.import_module(name), timed the first time (a deferred heavy import)."""
+        mod = sys.modules.get(name)
+        if mod is not None:
+            return mod
+        start = time.time()
+        mod = importlib.import_module(name)
+        self._record(name, start, time.time(), None, deferred=self.ready_at is not None, reason=reason)
+        return mod
+
+    # ---- phases ----
+    @contextmanager
+    def phase(self, name: str):
+        start = time.time()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.phases.append({"phase": name, "ms": round((time.time() - start) * 1000.0, 1),
+                                    "at_ms": self.offset_ms(start)})
+
+    def ready(self):
+        """The app module finished importing: stop timing imports."""
+        self.uninstall()
+        if self.ready_at is None:
+            self.ready_at = time.time()
+
+    def healthy(self):
+        if self.first_healthy_at is None:
+            self.first_healthy_at = time.time()
+
+    def report(self, top: int = 25) -> Dict[str, Any]:
+        with self._lock:
+            imports = list(self.imports.values())
+            phases = list(self.phases)
+        eager = [i for i in imports if not i["deferred"]]
+        return {
+            "pid": os.getpid(),
+            "process_start": datetime.utcfromtimestamp(self.process_start).isoformat(),
+            "interpreter_to_app_import_ms": self.offset_ms(self.t0),
+            "app_import_ms": round((self.ready_at - self.t0) * 1000.0, 1) if self.ready_at else None,
+            "time_to_ready_ms": self.offset_ms(self.ready_at) if self.ready_at else None,
+            "time_to_first_healthy_ms": self.offset_ms(self.first_healthy_at) if self.first_healthy_at else None,
+            "top_level_import_ms": round(sum(i["ms"] for i in eager if i["parent"] is None), 1),
+            "imports": sorted(eager, key=lambda i: -i["ms"])[:top],
+            "deferred_imports": [i for i in imports if i["deferred"]],
+            "phases": phases,
+        }
+
+
+STARTUP = StartupProfiler()
@@ -0,0 +1,133 @@
+# backend/token_cache.py
+
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+import jwt
+
+logger = logging.getLogger("ai_ml_cyberdefense.token_cache")
+logger.setLevel(logging.INFO)
+
+
+class TokenRevokedError(jwt.InvalidTokenError):
+    pass
+
+
+def token_digest(token: str) -> bytes:
+    return hashlib.blake2b(token.encode("utf-8"), digest_size=16).digest()
+
+
+class TokenCache:
+    """Bounded cache of verified JWTs: digest(token) -> (claims, expires_at).
+
+    A miss runs `decode` (full signature + claim verification) and keeps the claims
+    until the token's own `exp` (`max_ttl` seconds for tokens without one), so a
+    repeat token costs one hash and one dict lookup. Failed verifications are never
+    cached: an expired or forged token re-runs `decode` and raises its usual error.
+
+    Revocation: revoke(token) / revoke_jti(jti) reject the token from then on (the
+    entry is remembered until the token would have expired anyway); revoke_subject(sub)
+    drops cached entries so the next use is verified again. Hooks added with
+    add_hook(fn) run once per miss on the decoded claims; fn returning True rejects.
+    """
+
+    def __init__(self, decode: Callable[[str], dict], max_entries: int = 4096, max_ttl: float = 300.0):
+        self.decode = decode
+        self.max_entries = max_entries
+        self.max_ttl = max_ttl
+        self._entries = OrderedDict()   # digest -> (claims, expires_at)
+        self._revoked: Dict[bytes, float] = {}
+        self._revoked_jti: Dict[str, float] = {}
+        self._hooks: List[Callable[[dict], bool]] = []
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def verify(self, token: str, now: Optional[float] = None) -> dict:
+        """Claims of a valid token; raises jwt.InvalidTokenError (or a subclass) otherwise."""
+        if now is None:
+            now = time.time()
+        d = token_digest(token)
+        hit = self._entries.get(d)
+        if hit is not None and now < hit[1]:
+            self.hits += 1
+            with self._lock:
+                if d in self._entries:
+                    self._entries.move_to_end(d)
+            return hit[0]
+
+        self.misses += 1
+        if d in self._revoked:
+            raise TokenRevokedError("token revoked")
+        claims = self.decode(token)
+        jti = claims.get("jti")
+        if jti is not None and jti in self._revoked_jti:
+            raise TokenRevokedError("token revoked")
+        for hook in self._hooks:
+            if hook(claims):
+                raise TokenRevokedError("token revoked")
+        exp = claims.get("exp")
+        expires_at = float(exp) if isinstance(exp, (int, float)) else now + self.max_ttl
+        if self.max_entries > 0:
+            with self._lock:
+                # a revoke() that raced with decode() must not be undone by this insert
+                if d in self._revoked or (jti is not None and jti in self._revoked_jti):
+                    raise TokenRevokedError("token revoked")
+                self._entries[d] = (claims, expires_at)
+                self._entries.move_to_end(d)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return claims
+
+    # ---- revocation ----
+    def add_hook(self, fn: Callable[[dict], bool]):
+        self._hooks.append(fn)
+
+    def revoke(self, token: str, expires_at: Optional[float] = None):
+        d = token_digest(token)
+        with self._lock:
+            hit = self._entries.pop(d, None)
+            if expires_at is None:
+                expires_at = hit[1] if hit is not None else time.time() + self.max_ttl
+            self._revoked[d] = expires_at
+            self._purge_locked(time.time())
+
+    def revoke_jti(self, jti: str, expires_at: Optional[float] = None):
+        with self._lock:
+            if expires_at is None:
+                expires_at = time.time() + self.max_ttl
+            for d, (claims, exp) in list(self._entries.items()):
+                if claims.get("jti") == jti:
+                    del self._entries[d]
+                    expires_at = max(expires_at, exp)
+            self._revoked_jti[jti] = expires_at
+            self._purge_locked(time.time())
+
+    def revoke_subject(self, sub) -> int:
+        with self._lock:
+            drop = [d for d, (claims, _) in self._entries.items() if claims.get("sub") == sub]
+            for d in drop:
+                del self._entries[d]
+        return len(drop)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _purge_locked(self, now: float):
+        # revocation entries are only needed until the token would have expired on its own
+        for table in (self._revoked, self._revoked_jti):
+            if len(table) > 1024:
+                for k in [k for k, exp in table.items() if exp <= now]:
+                    del table[k]
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "max_entries": self.max_entries, "hits": self.hits,
+                "misses": self.misses, "revoked": len(self._revoked) + len(self._revoked_jti)}
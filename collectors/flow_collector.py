@@ -1,5 +1,5 @@
 #!/usr/bin/env python3
-import os,time,json,threading,logging,argparse,requests,shelve
+import os,time,json,queue,threading,logging,argparse,requests,shelve
 from collections import deque
 from statistics import mean,stdev
 from typing import Dict,Any,List
@@ -17,6 +17,13 @@ FLOWCOLLECTOR_TOKEN=os.environ.get("FLOWCOLLECTOR_TOKEN",None)
 RETRY_DB=os.environ.get("FLOWCOLLECTOR_RETRY_DB","flowcollector_retry.db")
 RETRY_PROCESS_INTERVAL=float(os.environ.get("RETRY_PROCESS_INTERVAL",10.0))
 LOG_LEVEL=os.environ.get("LOG_LEVEL","INFO").upper()
+MAX_TRACKED_FLOWS=int(os.environ.get("MAX_TRACKED_FLOWS",100000))
+FLOWS_HIGH_WATERMARK=int(os.environ.get("FLOWS_HIGH_WATERMARK",int(MAX_TRACKED_FLOWS*0.8)))
+FLOWS_LOW_WATERMARK=int(os.environ.get("FLOWS_LOW_WATERMARK",int(MAX_TRACKED_FLOWS*0.6)))
+SHED_RETRY_AFTER=int(os.environ.get("SHED_RETRY_AFTER",2))
+ALERTED_SRC_TTL=float(os.environ.get("ALERTED_SRC_TTL",300.0))
+SUMMARY_QUEUE_MAX=int(os.environ.get("SUMMARY_QUEUE_MAX",50000))
+SUMMARY_WORKERS=int(os.environ.get("SUMMARY_WORKERS",4))
 logger=logging.getLogger("flow_collector")
 logger.setLevel(LOG_LEVEL)
 ch=logging.StreamHandler()
@@ -24,6 +31,53 @@ ch.setFormatter(logging.Formatter("[%(asctime)s] %(levelname)s - %(message)s"))
 logger.addHandler(ch)
 flows={}
 flows_lock=threading.Lock()
+# backpressure: shed between the high and low watermarks, but always admit sources that already alerted
+_bp_lock=threading.Lock()
+_shedding=False
+alerted_srcs={}
+shed_counters={"events_rejected":0,"new_flows_capped":0,"batches_429":0,"summaries_dropped":0}
+# completed flows summarized upstream (type=flow_summary) wait here to be scored
+summary_q=queue.Queue(maxsize=SUMMARY_QUEUE_MAX)
+def count_shed(stage:str,n:int=1):
+    with _bp_lock:
+        shed_counters[stage]+=n
+def mark_alerted(src_ip:str):
+    if not src_ip:
+        return
+    with _bp_lock:
+        alerted_srcs[src_ip]=time.time()+ALERTED_SRC_TTL
+        if len(alerted_srcs)>4096:
+            now=time.time()
+            for ip in [k for k,v in alerted_srcs.items() if v<=now]:
+                del alerted_srcs[ip]
+def is_alerted(src_ip:str)->bool:
+    exp=alerted_srcs.get(src_ip)
+    return exp is not None and exp>time.time()
+def priority_snapshot(limit:int=256)->List[str]:
+    now=time.time()
+    with _bp_lock:
+        return [k for k,v in alerted_srcs.items() if v>now][:limit]
+def under_pressure()->bool:
+    global _shedding
+    n=len(flows)+summary_q.qsize()
+    with _bp_lock:
+        if _shedding and n<=FLOWS_LOW_WATERMARK:
+            _shedding=False
+            logger.info("Tracked flows drained to %d; shedding off",n)
+        elif not _shedding and n>=FLOWS_HIGH_WATERMARK:
+            _shedding=True
+            logger.warning("Tracked flows at %d; shedding on",n)
+        return _shedding
+# per-stage lag: stage -> [count,total_seconds,max_seconds]
+stage_lag={}
+def record_lag(stage:str,seconds:float):
+    with _bp_lock:
+        st=stage_lag.setdefault(stage,[0,0.0,0.0])
+        st[0]+=1; st[1]+=seconds
+        if seconds>st[2]: st[2]=seconds
+def lag_summary()->Dict[str,Any]:
+    with _bp_lock:
+        return {k:{"n":n,"mean_ms":round(tot/n*1000.0,3) if n else 0.0,"max_ms":round(mx*1000.0,3)} for k,(n,tot,mx) in stage_lag.items()}
 def load_feature_order(path:str)->List[str]:
     try:
         with open(path,"r") as fh:
@@ -97,7 +151,15 @@ def compute_flow_features(events:List[Dict[str,Any]],meta:Dict[str,Any])->Dict[s
         canonical_forward=(src_list[0],dst_list[0])
     fwd_pkts=0; bwd_pkts=0; fwd_bytes=0.0; bwd_bytes=0.0
     for e,p,b,s,d in zip(events,pkts_list,bytes_list,src_list,dst_list):
-        if canonical_forward and (s,d)==tuple(canonical_forward):
+        is_fwd=not canonical_forward or (s,d)==tuple(canonical_forward)
+        if "fwd_packets" in e:
+            # aggregate already split by direction upstream (sniffer), oriented as (s,d)
+            ep,eb=int(e.get("fwd_packets",0)),float(e.get("fwd_bytes",0.0))
+            rp,rb=int(e.get("bwd_packets",0)),float(e.get("bwd_bytes",0.0))
+            if not is_fwd:
+                ep,eb,rp,rb=rp,rb,ep,eb
+            fwd_pkts+=ep; fwd_bytes+=eb; bwd_pkts+=rp; bwd_bytes+=rb
+        elif is_fwd:
             fwd_pkts+=int(p); fwd_bytes+=float(b)
         else:
             bwd_pkts+=int(p); bwd_bytes+=float(b)
@@ -132,24 +194,40 @@ def features_to_ordered_list(feat_map:Dict[str,float],feature_order:List[str]):
     if not feature_order:
         return [float(v) for k,v in sorted(feat_map.items())]
     return [float(feat_map.get(k,0.0)) for k in feature_order]
-def make_flow_key(evt:Dict[str,Any])->str:
+def _port(v)->int:
+    try: return int(v or 0)
+    except (TypeError,ValueError): return 0
+def make_flow_key(evt:Dict[str,Any])->tuple:
+    # bidirectional: lower (ip,port) endpoint first so both directions share one flow;
+    # the flow's meta.canonical_forward keeps which side spoke first
     src=evt.get("src_ip","0.0.0.0"); dst=evt.get("dst_ip","0.0.0.0")
-    sport=str(evt.get("src_port","0")); dport=str(evt.get("dst_port","0"))
+    sport=_port(evt.get("src_port")); dport=_port(evt.get("dst_port"))
     proto=str(evt.get("proto","TCP")).upper()
-    return "|".join([src,dst,sport,dport,proto])
-def add_event_to_flow(evt:Dict[str,Any]):
+    if (src,sport)<=(dst,dport):
+        return (src,dst,sport,dport,proto)
+    return (dst,src,dport,sport,proto)
+def flow_key_str(k:tuple)->str:
+    return "|".join(str(x) for x in k)
+def add_event_to_flow(evt:Dict[str,Any])->bool:
     k=make_flow_key(evt); now=time.time()
     with flows_lock:
         f=flows.get(k)
         if f is None:
+            if len(flows)>=MAX_TRACKED_FLOWS and not is_alerted(evt.get("src_ip")):
+                count_shed("new_flows_capped")
+                return False
             canonical_forward=(evt.get("src_ip"),evt.get("dst_ip"))
             f={"events":deque(),"last_ts":now,"meta":{"src_ip":evt.get("src_ip"),"dst_ip":evt.get("dst_ip"),"src_port":evt.get("src_port"),"dst_port":evt.get("dst_port"),"proto":evt.get("proto"),"user_agent":evt.get("user_agent"),"path":evt.get("path"),"canonical_forward":canonical_forward}}
             flows[k]=f
-        f["events"].append({"timestamp":float(evt.get("timestamp",now)),"bytes":float(evt.get("bytes",0)),"packets":int(evt.get("packets",1)),"flags":evt.get("flags",""),"src_ip":evt.get("src_ip"),"dst_ip":evt.get("dst_ip")})
+        e={"timestamp":float(evt.get("timestamp",now)),"bytes":float(evt.get("bytes",0)),"packets":int(evt.get("packets",1)),"flags":evt.get("flags",""),"src_ip":evt.get("src_ip"),"dst_ip":evt.get("dst_ip")}
+        if "fwd_packets" in evt:
+            e.update({"fwd_packets":evt.get("fwd_packets",0),"bwd_packets":evt.get("bwd_packets",0),"fwd_bytes":evt.get("fwd_bytes",0.0),"bwd_bytes":evt.get("bwd_bytes",0.0)})
+        f["events"].append(e)
         f["last_ts"]=now
         if len(f["events"])>=MAX_EVENTS_PER_FLOW:
             logger.info("Flow %s reached max events -> flushing",k)
             threading.Thread(target=flush_flow,args=(k,),daemon=True).start()
+    return True
 _retry_lock=threading.Lock()
 def enqueue_retry(endpoint:str,payload:Dict[str,Any],meta:Dict[str,Any]=None):
     key=f"{time.time():.6f}"; rec={"endpoint":endpoint,"payload":payload,"meta":meta or {}}
@@ -187,7 +265,7 @@ def process_retry_queue():
         except Exception as e:
             logger.exception("process_retry_queue loop error: %s",e)
         time.sleep(RETRY_PROCESS_INTERVAL)
-def flush_flow(k:str):
+def flush_flow(k:tuple):
     with flows_lock:
         f=flows.pop(k,None)
     if not f:
@@ -195,6 +273,12 @@ def flush_flow(k:str):
     events=list(f["events"]); meta=f.get("meta",{})
     try:
         feat_map=compute_flow_features(events,meta)
+    except Exception as e:
+        logger.exception("Failed to compute features for flow %s: %s",k,e)
+        return
+    score_flow(k,feat_map,meta)
+def score_flow(k:tuple,feat_map:Dict[str,float],meta:Dict[str,Any]):
+    try:
         if not feat_map:
             logger.warning("Flow %s computed empty features",k)
         missing=[x for x in REQUIRED_FEATURES if x not in feat_map]
@@ -211,7 +295,9 @@ def flush_flow(k:str):
         hdrs={"Content-Type":"application/json"}
         if FLOWCOLLECTOR_TOKEN: hdrs["Authorization"]=f"Bearer {FLOWCOLLECTOR_TOKEN}"
         try:
+            t0=time.time()
             r=requests.post(PREDICT_URL,json=payload,headers=hdrs,timeout=8.0)
+            record_lag("predict_rtt",time.time()-t0)
             if not r.ok:
                 logger.warning("Predict endpoint returned status=%s; enqueuing",r.status_code)
                 enqueue_retry(PREDICT_URL,payload,meta)
@@ -221,7 +307,9 @@ def flush_flow(k:str):
             try: prob_f=float(prob) if prob is not None else 0.0
             except Exception: prob_f=0.0
             label=j.get("label",None) or ("Attack" if prob_f>=0.5 else "Benign")
-            alert_payload={"type":"ensemble_flow","time":time.time(),"flow_key":k,"prob":prob_f,"label":label,"meta":meta}
+            if prob_f>=ALERT_THRESHOLD:
+                mark_alerted(meta.get("src_ip"))
+            alert_payload={"type":"ensemble_flow","time":time.time(),"flow_key":flow_key_str(k),"prob":prob_f,"label":label,"meta":meta}
             try:
                 ra=requests.post(ALERTS_URL,json=alert_payload,headers=hdrs,timeout=4.0)
                 if not ra.ok:
@@ -232,7 +320,7 @@ def flush_flow(k:str):
                 enqueue_retry(ALERTS_URL,alert_payload,meta)
             logger.info("Flow %s -> prob=%.4f label=%s",k,prob_f,label)
             if prob_f>=BLOCK_THRESHOLD:
-                block_payload={"ip":meta.get("src_ip"),"key":k,"ttl":BLOCK_TTL,"reason":"ml_high_confidence","prob":prob_f}
+                block_payload={"ip":meta.get("src_ip"),"key":flow_key_str(k),"ttl":BLOCK_TTL,"reason":"ml_high_confidence","prob":prob_f}
                 try:
                     rb=requests.post(BLOCK_URL,json=block_payload,headers=hdrs,timeout=4.0)
                     if not rb.ok:
@@ -249,6 +337,60 @@ def flush_flow(k:str):
             return
     except Exception as e:
         logger.exception("Failed to flush flow %s: %s",k,e)
+def summary_to_features(s:Dict[str,Any],meta:Dict[str,Any])->Dict[str,float]:
+    # features straight from the sniffer's streaming stats; pkt_len/iat are [n,mean,std,min,max]
+    duration=max(0.0,float(s.get("last_ts",0.0))-float(s.get("first_ts",0.0)))
+    total_pkts=float(s.get("packets",0)); total_bytes=float(s.get("bytes",0.0))
+    fwd_pkts=float(s.get("fwd_packets",total_pkts)); bwd_pkts=float(s.get("bwd_packets",0))
+    ln=list(s.get("pkt_len") or [0,0.0,0.0,0.0,0.0])+[0.0]*5
+    iat=list(s.get("iat") or [0,0.0,0.0,0.0,0.0])+[0.0]*5
+    fc=s.get("flag_counts") or {}
+    rate=(lambda x:x/duration) if duration>0 else (lambda x:x)
+    features={
+        "Flow Duration":duration,
+        "Total Fwd Packets":fwd_pkts,
+        "Total Backward Packets":bwd_pkts,
+        "Flow Packets/s":float(rate(total_pkts)),
+        "Flow Bytes/s":float(rate(total_bytes)),
+        "Min Packet Length":float(ln[3]),
+        "Max Packet Length":float(ln[4]),
+        "Packet Length Mean":float(ln[1]),
+        "Packet Length Std":float(ln[2]),
+        "Packet Length Variance":float(ln[2])**2,
+        "Flow IAT Mean":float(iat[1]),
+        "Flow IAT Std":float(iat[2]),
+        "Flow IAT Max":float(iat[4]),
+        "Flow IAT Min":float(iat[3]),
+        "SYN Flag Count":float(fc.get("S",0)),
+        "ACK Flag Count":float(fc.get("A",0)),
+        "RST Flag Count":float(fc.get("R",0)),
+        "FIN Flag Count":float(fc.get("F",0)),
+        "Fwd Packets/s":float(rate(fwd_pkts)),
+        "Bwd Packets/s":float(rate(bwd_pkts)),
+    }
+    ua=meta.get("user_agent","") if meta else ""
+    features["UA_Length"]=float(len(ua or ""))
+    return features
+def add_flow_summary(evt:Dict[str,Any])->bool:
+    k=make_flow_key(evt)
+    meta={"src_ip":evt.get("src_ip"),"dst_ip":evt.get("dst_ip"),"src_port":evt.get("src_port"),"dst_port":evt.get("dst_port"),"proto":evt.get("proto"),"user_agent":evt.get("user_agent"),"path":evt.get("path"),"canonical_forward":(evt.get("src_ip"),evt.get("dst_ip"))}
+    try:
+        summary_q.put_nowait((k,evt,meta))
+        return True
+    except queue.Full:
+        count_shed("summaries_dropped")
+        return False
+def ingest_event(evt:Dict[str,Any])->bool:
+    if evt.get("type")=="flow_summary":
+        return add_flow_summary(evt)
+    return add_event_to_flow(evt)
+def summary_worker():
+    while True:
+        k,evt,meta=summary_q.get()
+        try:
+            score_flow(k,summary_to_features(evt,meta),meta)
+        except Exception:
+            logger.exception("summary_worker failed for flow %s",k)
 def background_flusher():
     while True:
         try:
@@ -258,6 +400,7 @@ def background_flusher():
                 for k, f in list(flows.items()):
                     if f["last_ts"] < cutoff:
                         to_flush.append(k)
+                        record_lag("flush", cutoff - f["last_ts"])
             for k in to_flush:
                 try:
                     flush_flow(k)
@@ -274,13 +417,17 @@ def route_collect_event():
     if not payload:
         return jsonify({"error":"invalid json"}),400
     try:
-        if isinstance(payload,list):
-            for evt in payload:
-                add_event_to_flow(evt)
-            return jsonify({"status":"ok","ingested":len(payload)})
-        else:
-            add_event_to_flow(payload)
-            return jsonify({"status":"ok","ingested":1})
+        events=payload if isinstance(payload,list) else [payload]
+        if under_pressure():
+            # keep events from sources that already alerted, shed the rest and tell the sender to back off
+            ingested=sum(1 for evt in events if is_alerted(evt.get("src_ip")) and ingest_event(evt))
+            shed=len(events)-ingested
+            count_shed("events_rejected",shed); count_shed("batches_429")
+            resp=jsonify({"error":"overloaded","ingested":ingested,"shed":shed,"retry_after":SHED_RETRY_AFTER,"priority_srcs":priority_snapshot()})
+            resp.headers["Retry-After"]=str(SHED_RETRY_AFTER)
+            return resp,429
+        ingested=sum(1 for evt in events if ingest_event(evt))
+        return jsonify({"status":"ok","ingested":ingested,"priority_srcs":priority_snapshot()})
     except Exception as e:
         logger.exception("route_collect_event error: %s",e)
         return jsonify({"error":str(e)}),500
@@ -288,7 +435,9 @@ def route_collect_event():
 def health():
     with flows_lock:
         n=len(flows)
-    return jsonify({"status":"ok","tracked_flows":n})
+    with _bp_lock:
+        counters=dict(shed_counters); shedding=_shedding
+    return jsonify({"status":"ok","tracked_flows":n,"pending_summaries":summary_q.qsize(),"shedding":shedding,"shed":counters,"lag":lag_summary()})
 def parse_args():
     p=argparse.ArgumentParser(description="FlowCollector sidecar")
     p.add_argument("--host",default=os.environ.get("HOST","0.0.0.0"))
@@ -307,6 +456,8 @@ def main():
     FLOW_TIMEOUT=args.flow_timeout
     t_retry=threading.Thread(target=process_retry_queue,daemon=True); t_retry.start()
     t_flusher=threading.Thread(target=background_flusher,daemon=True); t_flusher.start()
+    for _ in range(max(1,SUMMARY_WORKERS)):
+        threading.Thread(target=summary_worker,daemon=True).start()
     logger.info("FlowCollector starting: predict=%s alerts=%s block=%s feature_order=%s",PREDICT_URL,ALERTS_URL,BLOCK_URL,bool(FEATURE_ORDER))
     logger.info("FLOW_TIMEOUT=%s MAX_EVENTS_PER_FLOW=%s",FLOW_TIMEOUT,MAX_EVENTS_PER_FLOW)
     flask_app.run(host=args.host,port=args.port,debug=False,threaded=True)
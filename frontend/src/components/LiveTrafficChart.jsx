@@ -248,8 +248,8 @@ export default function LiveTrafficChart({ initialData = [], height = 220 }) {
       console.warn("[LiveTrafficChart] socket disconnected:", reason);
     });
 
-    // handler for new_alert
-    socket.on("new_alert", (payload) => {
+    // handler for new_alert (single events or items of an alerts_batch)
+    const onAlert = (payload) => {
       try {
         const t = new Date().toLocaleTimeString();
 
@@ -287,6 +287,13 @@ export default function LiveTrafficChart({ initialData = [], height = 220 }) {
         });
       } catch (e) {
       }
+    };
+    socket.on("new_alert", onAlert);
+    socket.on("alerts_batch", (batch) => {
+      const items = (batch && batch.items) || [];
+      for (const item of items) {
+        if (item.event === "new_alert") onAlert(item.payload);
+      }
     });
 
     socket.on("realtime_rate_block", (payload) => {
@@ -322,6 +329,7 @@ export default function LiveTrafficChart({ initialData = [], height = 220 }) {
     return () => {
       try {
         socket.off("new_alert");
+        socket.off("alerts_batch");
         socket.off("realtime_rate_block");
         socket.off("connect");
         socket.off("connect_error");
@@ -3,7 +3,12 @@
 import { io } from "socket.io-client";
 import { getStoredToken } from "./auth";
 
-export function connectSocket(onAlert, onMousePrediction) {
+// filters: { models, min_prob, src_prefix, labels } - the server only sends matching alerts
+export function subscribeAlerts(socket, filters) {
+  socket.emit("subscribe_alerts", filters || {});
+}
+
+export function connectSocket(onAlert, onMousePrediction, filters) {
   const token = getStoredToken();
 
   const socket = io("/", {
@@ -15,6 +20,12 @@ export function connectSocket(onAlert, onMousePrediction) {
 
   socket.on("connect", () => {
     console.info("Socket connected:", socket.id);
+    // subscriptions are per connection: restore them after a reconnect
+    if (filters) subscribeAlerts(socket, filters);
+  });
+
+  socket.on("subscribe_error", (err) => {
+    console.warn("subscribe_alerts rejected:", err && err.error ? err.error : err);
   });
 
   socket.on("disconnect", (reason) => {
@@ -41,6 +52,23 @@ export function connectSocket(onAlert, onMousePrediction) {
     }
   });
 
+  // server coalesces alerts into batches; each item carries the latest payload plus a count
+  socket.on("alerts_batch", (batch) => {
+    const items = (batch && batch.items) || [];
+    for (const item of items) {
+      const payload = Object.assign({}, item.payload, { count: item.count, first_ts: item.first_ts, last_ts: item.last_ts });
+      try {
+        if (item.event === "mouse_prediction") {
+          if (typeof onMousePrediction === "function") onMousePrediction(payload);
+        } else if (typeof onAlert === "function") {
+          onAlert(payload);
+        }
+      } catch (e) {
+        console.warn("alerts_batch handler error:", e);
+      }
+    }
+  });
+
   socket.on("message", (m) => {
     console.debug("socket message:", m);
   });
@@ -0,0 +1,94 @@
+# gunicorn.conf.py
+"""
+Multi-worker serving with the models shared between workers.
+Usage (from the repo root):
+  MODEL_MMAP=1 gunicorn -c gunicorn.conf.py backend.app:app
+With GUNICORN_PRELOAD=1 (default) the master imports the app and loads the fork-safe
+models once, then forks: workers inherit those pages copy-on-write instead of each
+unpickling its own forest / booster. The master does nothing else: import-time DB
+queries and background threads are skipped there (backend.startup.preloading_master())
+and run in each worker from post_fork, after it has dropped the inherited DB pool. gc.freeze() keeps the collector from touching
+(and so copying) the inherited objects. MODEL_MMAP=1 additionally serves the random
+forests from memory-mapped .npy exports, which stay shared whatever the workers do.
+The LSTM is never loaded in the master (TensorFlow does not survive a fork); each
+worker loads it on first use. Every worker logs its RSS / PSS once it is ready.
+
+One worker by default. Socket.IO keeps each client's session in the worker that
+accepted it, so GUNICORN_WORKERS > 1 also needs
+  - SOCKETIO_MESSAGE_QUEUE (or STATE_BACKEND=redis, whose server is then used; needs
+    the `redis` package) so emits reach clients held by other workers, and
+  - sticky sessions at the load balancer, or long-polling requests land in a worker
+    that does not know the sid.
+Even then the alert fanout batches what its own worker detected: dashboards see the
+live alerts of the worker their socket is on, and /api/alerts has all of them.
+"""
+import os
+import gc
+
+bind = "%s:%s" % (os.environ.get("HOST", "0.0.0.0"), os.environ.get("PORT", 5000))
+workers = int(os.environ.get("GUNICORN_WORKERS", 1))
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+# Socket.IO must use the worker's concurrency model, not whatever it finds installed
+_ASYNC_MODES = {"gthread": "threading", "sync": "threading", "eventlet": "eventlet", "gevent": "gevent",
+                "geventwebsocket.gunicorn.workers.GeventWebSocketWorker": "gevent"}
+if worker_class in _ASYNC_MODES:
+    os.environ.setdefault("SOCKETIO_ASYNC_MODE", _ASYNC_MODES[worker_class])
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 60))
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1").lower() in ("1", "true", "yes")
+if preload_app:
+    os.environ["GUNICORN_PRELOADING"] = "1"
+# comma list of registry names, "fork-safe" (default) or "" for none
+PRELOAD_MODELS = os.environ.get("GUNICORN_PRELOAD_MODELS", "fork-safe")
+
+_models_preloaded = False
+
+
+def on_starting(server):
+    from backend.shared_state import socketio_queue_from_env
+
+    if workers > 1 and socketio_queue_from_env() is None:
+        server.log.warning("%d workers without SOCKETIO_MESSAGE_QUEUE: Socket.IO clients only get emits from "
+                           "the worker holding their session (see gunicorn.conf.py)", workers)
+
+
+def pre_fork(server, worker):
+    global _models_preloaded
+    if not preload_app or _models_preloaded:
+        return
+    _models_preloaded = True
+    from backend.model_registry import MODELS, FORK_SAFE_MODELS, memory_report
+
+    # a MODEL_PRELOAD thread still loading at fork time would leave its lock held in the child
+    if MODELS.preload_thread is not None:
+        MODELS.preload_thread.join()
+    spec = PRELOAD_MODELS.strip()
+    names = FORK_SAFE_MODELS if spec == "fork-safe" else [n.strip() for n in spec.split(",") if n.strip()]
+    if names:
+        MODELS.preload(names, background=False)
+    gc.collect()
+    gc.freeze()
+    server.log.info("master preloaded %s: %s", ", ".join(n for n in names if MODELS.peek(n) is not None) or "nothing",
+                    memory_report())
+
+
+def post_fork(server, worker):
+    if not preload_app:
+        return
+    # the master skipped the import-time DB work and threads (preloading_master()); do them here
+    os.environ.pop("GUNICORN_PRELOADING", None)
+    from backend import app as app_module, auth, db
+
+    # pooled connections opened by the master's import (create_all) are its own, not ours
+    if db.ENGINE is not None:
+        db.ENGINE.dispose(close=False)
+    try:
+        auth.start_background()
+    except Exception as e:
+        server.log.warning("revocation sync not started in worker %s: %s", worker.pid, e)
+    app_module.start_background()
+
+
+def post_worker_init(worker):
+    from backend.model_registry import memory_report
+    worker.log.info("worker %s ready: %s", worker.pid, memory_report())
@@ -1,11 +1,15 @@
 #!/usr/bin/env python3
-import time, threading, queue, os, json, requests, argparse, logging
-from collections import defaultdict, deque
+import time, threading, queue, os, sys, json, socket, requests, argparse, logging, random
+from array import array
 
+# pyshark is only required by the default engine; the raw engine works without tshark
 try:
     import pyshark
 except Exception as e:
-    raise SystemExit("pyshark import failed: install with `pip install pyshark` and ensure tshark is installed. Err: %s" % e)
+    pyshark = None
+    PYSHARK_IMPORT_ERROR = e
+
+import rawcapture
 
 CAPTURE_INTERFACE = os.environ.get("SNIF_IFACE", "eth0")   # change to your interface (e.g. ens3, eth0)
 BPF_FILTER = os.environ.get("SNIF_FILTER", "tcp")         # BPF expression for tshark (tcp by default)
@@ -13,6 +17,19 @@ FLOWCOLLECTOR_URL = os.environ.get("FLOWCOLLECTOR_URL", "http://127.0.0.1:5100/c
 BATCH_INTERVAL = float(os.environ.get("SNIF_BATCH_INTERVAL", 1.0))   # seconds to flush aggregated events
 BATCH_SIZE = int(os.environ.get("SNIF_BATCH_SIZE", 200))             # max events per POST
 VERBOSE = os.environ.get("SNIF_VERBOSE", "1") != "0"
+CAPTURE_ENGINE = os.environ.get("SNIF_ENGINE", "pyshark")           # "pyshark" (tshark decode) or "raw" (AF_PACKET)
+CAPTURE_WORKERS = int(os.environ.get("SNIF_WORKERS", 1))            # >1: sharded multi-process capture (raw engine)
+
+# backpressure / load-shedding knobs
+OUT_Q_MAX = int(os.environ.get("SNIF_OUT_Q_MAX", 1000))                      # max batches buffered for POST
+OUT_Q_HIGH = int(os.environ.get("SNIF_OUT_Q_HIGH", int(OUT_Q_MAX * 0.8)))    # start shedding at this depth
+OUT_Q_LOW = int(os.environ.get("SNIF_OUT_Q_LOW", int(OUT_Q_MAX * 0.5)))      # stop shedding at this depth
+MAX_FLOWS = int(os.environ.get("SNIF_MAX_FLOWS", 200000))                    # cap on concurrently tracked flows
+SHED_KEEP_RATIO = float(os.environ.get("SNIF_SHED_KEEP_RATIO", 0.1))         # fraction of flows kept while shedding
+MAX_POST_RETRIES = int(os.environ.get("SNIF_MAX_POST_RETRIES", 5))           # attempts before a batch is dropped
+PRIORITY_RESERVE = int(os.environ.get("SNIF_PRIORITY_RESERVE", max(1024, MAX_FLOWS // 20)))  # extra flow slots only priority sources may use
+PRIORITY_TTL = float(os.environ.get("SNIF_PRIORITY_TTL", 300.0))             # how long collector-reported sources stay prioritized
+STATS_INTERVAL = float(os.environ.get("SNIF_STATS_INTERVAL", 30.0))          # seconds between shed-counter log lines
 
 # logging
 log = logging.getLogger("pyshark_sniffer")
@@ -21,16 +38,288 @@ ch = logging.StreamHandler()
 ch.setFormatter(logging.Formatter("[%(asctime)s] %(levelname)s - %(message)s"))
 log.addHandler(ch)
 
-# basic flow key: src|dst|sport|dport|proto
+# bidirectional flow key packed into one int: the lower (ip, port) endpoint goes first so
+# request and response packets land in the same flow; which side spoke first is kept in the
+# flow row. Bit layout (low -> high): v6 flag, proto number, port_b, port_a, ip_b, ip_a.
+_PROTO_NUM = {"TCP": 6, "UDP": 17}
+_PROTO_NAME = {6: "TCP", 17: "UDP", 0: "UNK"}
+
+# address text -> int; capture sees the same few hosts over and over
+_ip_int_cache = {}
+IP_CACHE_MAX = 16384
+
+def _ip_int(ip, family):
+    v = _ip_int_cache.get(ip)
+    if v is None:
+        try:
+            v = int.from_bytes(socket.inet_pton(family, ip), "big")
+        except (OSError, TypeError, ValueError):
+            v = 0
+        if len(_ip_int_cache) >= IP_CACHE_MAX:
+            _ip_int_cache.clear()
+        _ip_int_cache[ip] = v
+    return v
+
+def _proto_num(proto):
+    p = _PROTO_NUM.get(proto)
+    if p is None:
+        name = str(proto).upper()
+        p = _PROTO_NUM.get(name, int(name) & 0xFF if name.isdigit() else 0)
+    return p
+
 def make_flow_key(src, dst, sport, dport, proto):
-    return "|".join([str(src), str(dst), str(sport), str(dport), str(proto).upper()])
+    # returns (key, src_is_a); src_is_a tells which canonical endpoint sent this packet
+    v6 = ":" in src
+    family, width = (socket.AF_INET6, 128) if v6 else (socket.AF_INET, 32)
+    a = _ip_int(src, family)
+    b = _ip_int(dst, family)
+    src_is_a = a < b or (a == b and sport <= dport)
+    if not src_is_a:
+        a, b, sport, dport = b, a, dport, sport
+    return ((((((a << width) | b) << 16 | sport) << 16 | dport) << 8 | _proto_num(proto)) << 1 | v6), src_is_a
+
+def split_flow_key(key):
+    # inverse of make_flow_key: (ip_a, ip_b, port_a, port_b, proto)
+    v6 = key & 1
+    key >>= 1
+    proto = key & 0xFF
+    key >>= 8
+    port_b = key & 0xFFFF
+    key >>= 16
+    port_a = key & 0xFFFF
+    key >>= 16
+    family, width = (socket.AF_INET6, 128) if v6 else (socket.AF_INET, 32)
+    ip_b = socket.inet_ntop(family, (key & ((1 << width) - 1)).to_bytes(width // 8, "big"))
+    ip_a = socket.inet_ntop(family, (key >> width).to_bytes(width // 8, "big"))
+    return ip_a, ip_b, port_a, port_b, _PROTO_NAME.get(proto, str(proto))
+
+# per-flow streaming stats (offsets inside the flow row, see FlowTable) instead of per-packet
+# samples: Welford moments + min/max for packet length and inter-arrival time, per-flag counts
+ST_LEN_N, ST_LEN_MEAN, ST_LEN_M2, ST_LEN_MIN, ST_LEN_MAX = 0, 1, 2, 3, 4
+ST_IAT_N, ST_IAT_MEAN, ST_IAT_M2, ST_IAT_MIN, ST_IAT_MAX = 5, 6, 7, 8, 9
+ST_PREV_TS = 10
+ST_FLAG0 = 11
+FLAG_ORDER = "SAFRPU"          # SYN ACK FIN RST PSH URG -> ST_FLAG0 + index ("S" counts bare SYNs only)
+ST_SIZE = ST_FLAG0 + len(FLAG_ORDER)
+
+_TCP_BITS = {"F": 0x01, "S": 0x02, "R": 0x04, "P": 0x08, "A": 0x10, "U": 0x20}
+_flag_bits_cache = {}
+
+def flag_bits(flags):
+    # accepts raw-engine designators ("SA"), tshark flags_str ("·······A·S··") or hex ("0x0012")
+    b = _flag_bits_cache.get(flags)
+    if b is None:
+        try:
+            b = int(flags, 16) if flags.lower().startswith("0x") else sum(v for k, v in _TCP_BITS.items() if k in flags)
+        except ValueError:
+            b = 0
+        if len(_flag_bits_cache) < 4096:
+            _flag_bits_cache[flags] = b
+    return b
+
+# bits -> FLAG_ORDER positions set in them; a SYN-ACK is not counted as a SYN, matching
+# the collector's per-packet "SYN Flag Count" the models were trained on
+_flag_slots = {}
+
+def flag_slots(bits):
+    return tuple(j for j, ch in enumerate(FLAG_ORDER)
+                 if bits & _TCP_BITS[ch] and not (ch == "S" and bits & _TCP_BITS["A"]))
+
+def update_stats(st, o, ts, length, bits):
+    # `o` is the offset of the stats block inside `st`; each moment block is laid out
+    # n, mean, m2, min, max, so only its base index is computed
+    i = o + ST_LEN_N
+    n = st[i] + 1.0
+    st[i] = n
+    mean = st[i + 1]
+    d = length - mean
+    mean += d / n
+    st[i + 1] = mean
+    st[i + 2] += d * (length - mean)
+    if n == 1.0 or length < st[i + 3]:
+        st[i + 3] = length
+    if length > st[i + 4]:
+        st[i + 4] = length
+    p = o + ST_PREV_TS
+    prev = st[p]
+    if n > 1.0:
+        iat = ts - prev
+        if iat < 0.0:
+            iat = 0.0
+        i = o + ST_IAT_N
+        m = st[i] + 1.0
+        st[i] = m
+        mean = st[i + 1]
+        d = iat - mean
+        mean += d / m
+        st[i + 1] = mean
+        st[i + 2] += d * (iat - mean)
+        if m == 1.0 or iat < st[i + 3]:
+            st[i + 3] = iat
+        if iat > st[i + 4]:
+            st[i + 4] = iat
+    if ts > prev:
+        st[p] = ts
+    if bits:
+        slots = _flag_slots.get(bits)
+        if slots is None:
+            slots = _flag_slots[bits] = flag_slots(bits)
+        i = o + ST_FLAG0
+        for j in slots:
+            st[i + j] += 1.0
+
+def stats_moments(st, base):
+    # [n, mean, std (sample), min, max] for the block starting at `base`
+    n = st[base]
+    std = (st[base + 2] / (n - 1.0)) ** 0.5 if n > 1.0 else 0.0
+    return [int(n), st[base + 1], std, st[base + 3], st[base + 4]]
+
+# flow row layout (doubles); counters are exact in a double up to 2**53
+F_FIRST_TS, F_LAST_TS, F_BYTES, F_PKTS, F_FWD_PKTS, F_BWD_PKTS, F_FWD_BYTES, F_BWD_BYTES, F_INIT_IS_A = range(9)
+F_STATS = 9
+ROW = F_STATS + ST_SIZE
+_ZERO_ROW = array("d", bytes(8 * ROW))
+
+class FlowTable:
+    """Array-of-structs flow store: packed key -> slot, one fixed row of doubles per slot.
+
+    All rows share one array('d') that grows in chunks up to `capacity`; released slots
+    go on a free list and are reused, so a tracked flow costs its key int, one index
+    entry and ROW doubles instead of a dict of boxed values.
+    """
+    __slots__ = ("index", "rows", "free", "capacity", "chunk", "allocated")
+
+    def __init__(self, capacity, chunk=4096):
+        self.capacity = capacity
+        self.chunk = chunk
+        self.clear()
 
-# aggregator: hold list of packet records per flow (small summary)
-flows = {}
+    def clear(self):
+        self.index = {}
+        self.rows = array("d")
+        self.free = array("q")
+        self.allocated = 0
+
+    def __len__(self):
+        return len(self.index)
+
+    def get(self, key):
+        return self.index.get(key)
+
+    def add(self, key):
+        # returns the new slot, or -1 when the table is at capacity
+        if not self.free:
+            n = min(self.chunk, self.capacity - self.allocated)
+            if n <= 0:
+                return -1
+            self.rows.frombytes(bytes(8 * ROW * n))
+            self.free.extend(range(self.allocated + n - 1, self.allocated - 1, -1))
+            self.allocated += n
+        slot = self.free.pop()
+        b = slot * ROW
+        self.rows[b:b + ROW] = _ZERO_ROW
+        self.index[key] = slot
+        return slot
+
+    def release(self, key):
+        slot = self.index.pop(key, None)
+        if slot is not None:
+            self.free.append(slot)
+
+    def items(self):
+        return list(self.index.items())
+
+# aggregator: one row per flow; ingest_packet admits ordinary flows up to MAX_FLOWS, the
+# PRIORITY_RESERVE slots above that are kept for sources the collector flagged
+flows = FlowTable(MAX_FLOWS + PRIORITY_RESERVE)
 flows_lock = threading.Lock()
 
-# queue for batched POSTs to flow collector
-out_q = queue.Queue()
+# queue for batched POSTs to flow collector (bounded: a slow backend must not grow memory forever)
+out_q = queue.Queue(maxsize=OUT_Q_MAX)
+
+# backpressure state: shedding switches on at OUT_Q_HIGH and off again at OUT_Q_LOW,
+# and the collector can force it on for a while by answering 429 + Retry-After
+bp_lock = threading.Lock()
+shedding = False
+throttle_until = 0.0
+# src_ip -> expiry ts, sources the collector told us already produced alerts (never sampled away)
+priority_srcs = {}
+# how much was shed at each stage
+shed_counters = {
+    "capture_new_flows": 0,   # packets of new flows refused because the flow table was full
+    "flush_sampled": 0,       # idle flows dropped by sampling while shedding
+    "queue_full": 0,          # flow events dropped because out_q was full
+    "post_dropped": 0,        # flow events dropped after MAX_POST_RETRIES failed POSTs
+    "collector_shed": 0,      # flow events the collector refused with 429
+}
+
+def count_shed(stage, n=1):
+    with bp_lock:
+        shed_counters[stage] += n
+
+def is_priority(src_ip):
+    exp = priority_srcs.get(src_ip)
+    return exp is not None and exp > time.time()
+
+def learn_priority(resp):
+    # collector replies carry the sources it has alerted on; keep them out of sampling
+    try:
+        srcs = resp.json().get("priority_srcs") or []
+    except Exception:
+        return
+    exp = time.time() + PRIORITY_TTL
+    with bp_lock:
+        for ip in srcs:
+            priority_srcs[ip] = exp
+        if len(priority_srcs) > 4096:
+            now = time.time()
+            for ip in [k for k, v in priority_srcs.items() if v <= now]:
+                del priority_srcs[ip]
+
+def under_pressure():
+    global shedding
+    depth = out_q.qsize()
+    with bp_lock:
+        if shedding and depth <= OUT_Q_LOW:
+            shedding = False
+            log.info("out_q drained to %d batches; shedding off", depth)
+        elif not shedding and depth >= OUT_Q_HIGH:
+            shedding = True
+            log.warning("out_q at %d batches; shedding on", depth)
+        return shedding or time.time() < throttle_until
+
+def throttle_for(seconds):
+    global throttle_until
+    with bp_lock:
+        throttle_until = max(throttle_until, time.time() + seconds)
+
+# per-stage lag: stage -> [count, total_seconds, max_seconds]
+lag_stats = {}
+
+def record_lag(stage, seconds):
+    with bp_lock:
+        st = lag_stats.get(stage)
+        if st is None:
+            st = lag_stats[stage] = [0, 0.0, 0.0]
+        st[0] += 1
+        st[1] += seconds
+        if seconds > st[2]:
+            st[2] = seconds
+
+def lag_summary():
+    with bp_lock:
+        return {k: {"n": n, "mean_ms": round(tot / n * 1000.0, 3) if n else 0.0, "max_ms": round(mx * 1000.0, 3)}
+                for k, (n, tot, mx) in lag_stats.items()}
+
+# flow clock: wall time for live capture, packet time during --replay so idle
+# timeouts follow the original capture instead of the replay wall clock
+clock = time.time
+
+def retry_after_seconds(resp, default=1.0):
+    try:
+        return max(0.0, float(resp.headers.get("Retry-After", default)))
+    except Exception:
+        return default
 
 # minimal parser helpers
 def safe_get(pkt, attr_path):
@@ -113,67 +402,113 @@ def pkt_to_record(pkt):
 
 # ingest packet into flows map
 def ingest_packet(rec):
-    k = make_flow_key(rec["src_ip"], rec["dst_ip"], rec["src_port"], rec["dst_port"], rec["proto"])
-    now = time.time()
+    k, src_is_a = make_flow_key(rec["src_ip"], rec["dst_ip"], rec["src_port"], rec["dst_port"], rec["proto"])
+    ts = rec["timestamp"]
+    nbytes = rec["bytes"]
+    npkts = rec["packets"]
+    flags = rec.get("flags")
     with flows_lock:
-        f = flows.get(k)
-        if not f:
-            f = {"first_ts": rec["timestamp"], "last_ts": rec["timestamp"], "bytes": 0, "pkts": 0, "flags": set(), "events": deque()}
-            flows[k] = f
-        f["bytes"] += rec["bytes"]
-        f["pkts"] += rec["packets"]
-        f["last_ts"] = rec["timestamp"]
-        if rec.get("flags"):
-            # collect unique flag designators (S, A, R, F etc.)
-            f["flags"].add(rec["flags"])
-        # keep a small tail of timestamped samples to compute iats if needed
-        f["events"].append((rec["timestamp"], rec["bytes"]))
-        # cap events stored to avoid memory blow
-        while len(f["events"]) > 500:
-            f["events"].popleft()
+        slot = flows.get(k)
+        if slot is None:
+            slot = flows.add(k) if (len(flows) < MAX_FLOWS or is_priority(rec["src_ip"])) else -1
+            if slot < 0:
+                count_shed("capture_new_flows")
+                return
+            c = flows.rows
+            b = slot * ROW
+            # the first packet seen defines the forward direction
+            c[b + F_FIRST_TS] = ts
+            c[b + F_INIT_IS_A] = 1.0 if src_is_a else 0.0
+        else:
+            c = flows.rows
+            b = slot * ROW
+        c[b + F_LAST_TS] = ts
+        c[b + F_BYTES] += nbytes
+        c[b + F_PKTS] += npkts
+        if (c[b + F_INIT_IS_A] == 1.0) == src_is_a:
+            c[b + F_FWD_PKTS] += npkts
+            c[b + F_FWD_BYTES] += nbytes
+        else:
+            c[b + F_BWD_PKTS] += npkts
+            c[b + F_BWD_BYTES] += nbytes
+        update_stats(c, b + F_STATS, ts, float(nbytes), flag_bits(flags) if flags else 0)
 
 # flusher: periodically convert idle flows to events and push to out_q
 FLOW_TIMEOUT = float(os.environ.get("FLOW_TIMEOUT", 5.0))
 
+def flush_flows(cutoff, final=False):
+    # one flusher pass: every flow whose last packet is older than `cutoff` becomes an event.
+    # final=True (shutdown) takes every flow left, records no flush lag (none timed out)
+    # and never sheds: nothing comes after it to send them later
+    to_send = []
+    sampled_out = 0
+    pressure = under_pressure() and not final
+    with flows_lock:
+        c = flows.rows
+        for k, slot in flows.items():
+            r = slot * ROW
+            last_ts = c[r + F_LAST_TS]
+            if final or last_ts < cutoff:
+                if not final:
+                    record_lag("flush", cutoff - last_ts)
+                ip_a, ip_b, port_a, port_b, proto = split_flow_key(k)
+                # orient initiator -> responder
+                if c[r + F_INIT_IS_A]:
+                    src_ip, dst_ip, src_port, dst_port = ip_a, ip_b, port_a, port_b
+                else:
+                    src_ip, dst_ip, src_port, dst_port = ip_b, ip_a, port_b, port_a
+                st = r + F_STATS
+                # summarized-flow message: the collector builds features from it directly
+                flow_event = {
+                    "type": "flow_summary",
+                    "first_ts": c[r + F_FIRST_TS],
+                    "last_ts": last_ts,
+                    "bytes": c[r + F_BYTES],
+                    "packets": int(c[r + F_PKTS]),
+                    "src_ip": src_ip,
+                    "dst_ip": dst_ip,
+                    "src_port": src_port,
+                    "dst_port": dst_port,
+                    "proto": proto,
+                    "fwd_packets": int(c[r + F_FWD_PKTS]),
+                    "bwd_packets": int(c[r + F_BWD_PKTS]),
+                    "fwd_bytes": c[r + F_FWD_BYTES],
+                    "bwd_bytes": c[r + F_BWD_BYTES],
+                    "pkt_len": stats_moments(c, st + ST_LEN_N),
+                    "iat": stats_moments(c, st + ST_IAT_N),
+                    "flag_counts": {ch: int(c[st + ST_FLAG0 + i]) for i, ch in enumerate(FLAG_ORDER)},
+                    # metadata for flow_collector
+                    "path": "",
+                    "user_agent": "",
+                }
+                if pressure and not is_priority(src_ip) and random.random() >= SHED_KEEP_RATIO:
+                    sampled_out += 1
+                else:
+                    to_send.append(flow_event)
+                # remove flow (its slot is reused)
+                flows.release(k)
+    if sampled_out:
+        count_shed("flush_sampled", sampled_out)
+    if to_send:
+        # batch and push
+        batches = [to_send[i:i+BATCH_SIZE] for i in range(0, len(to_send), BATCH_SIZE)]
+        for b in batches:
+            try:
+                out_q.put_nowait((time.time(), b))
+            except queue.Full:
+                count_shed("queue_full", len(b))
+    return len(to_send)
+
 def flush_idle_flows():
+    last_stats = time.time()
     while True:
-        cutoff = time.time() - FLOW_TIMEOUT
-        to_send = []
-        with flows_lock:
-            keys = list(flows.keys())
-            for k in keys:
-                f = flows.get(k)
-                if not f:
-                    continue
-                if f["last_ts"] < cutoff:
-                    # prepare event payload compatible with flow_collector
-                    first_ts = f.get("first_ts", time.time())
-                    last_ts = f.get("last_ts", first_ts)
-                    flow_event = {
-                        "timestamp": last_ts,
-                        "bytes": float(f["bytes"]),
-                        "packets": int(f["pkts"]),
-                        "flags": ",".join(sorted(list(f["flags"]))),
-                        "src_ip": k.split("|")[0],
-                        "dst_ip": k.split("|")[1],
-                        "src_port": int(k.split("|")[2]) if len(k.split("|"))>2 else 0,
-                        "dst_port": int(k.split("|")[3]) if len(k.split("|"))>3 else 0,
-                        "proto": k.split("|")[4] if len(k.split("|"))>4 else "UNK",
-                        # metadata for flow_collector
-                        "path": "",
-                        "user_agent": "",
-                    }
-                    to_send.append(flow_event)
-                    # remove flow
-                    try:
-                        del flows[k]
-                    except Exception:
-                        pass
-        if to_send:
-            # batch and push
-            batches = [to_send[i:i+BATCH_SIZE] for i in range(0, len(to_send), BATCH_SIZE)]
-            for b in batches:
-                out_q.put(b)
+        flush_flows(clock() - FLOW_TIMEOUT)
+        if time.time() - last_stats >= STATS_INTERVAL:
+            last_stats = time.time()
+            with bp_lock:
+                snap = dict(shed_counters)
+            if any(snap.values()):
+                log.info("shed counters: %s (flows=%d out_q=%d)", snap, len(flows), out_q.qsize())
         time.sleep(BATCH_INTERVAL)
 
 # poster thread: takes batches from out_q and posts to FlowCollector
@@ -181,24 +516,45 @@ def poster_loop():
     session = requests.Session()
     session.headers.update({"Content-Type":"application/json"})
     while True:
-        batch = out_q.get()
-        try:
-            r = session.post(FLOWCOLLECTOR_URL, json=batch, timeout=6.0)
-            if r.ok:
-                log.info("Posted %d flow events -> %s", len(batch), FLOWCOLLECTOR_URL)
-            else:
-                log.warning("POST returned %s; requeueing", r.status_code)
-                # naive retry: requeue at end (consider shelve for persistence)
-                time.sleep(1.0)
-                out_q.put(batch)
-        except Exception as e:
-            log.warning("Failed to post batch: %s; requeueing", e)
+        enq_ts, batch = out_q.get()
+        record_lag("queue_wait", time.time() - enq_ts)
+        # retry the same batch in place instead of requeueing it behind newer ones
+        for attempt in range(1, MAX_POST_RETRIES + 1):
+            try:
+                t0 = time.time()
+                r = session.post(FLOWCOLLECTOR_URL, json=batch, timeout=6.0)
+                record_lag("post_rtt", time.time() - t0)
+                if r.ok:
+                    log.info("Posted %d flow events -> %s", len(batch), FLOWCOLLECTOR_URL)
+                    learn_priority(r)
+                    break
+                if r.status_code == 429:
+                    # collector kept what it considers important and shed the rest; back off
+                    delay = retry_after_seconds(r)
+                    try:
+                        shed = int(r.json().get("shed", len(batch)))
+                    except Exception:
+                        shed = len(batch)
+                    count_shed("collector_shed", shed)
+                    learn_priority(r)
+                    throttle_for(delay)
+                    log.warning("Collector overloaded (429); shed=%d, throttling %.1fs", shed, delay)
+                    time.sleep(delay)
+                    break
+                log.warning("POST returned %s; retry %d/%d", r.status_code, attempt, MAX_POST_RETRIES)
+            except Exception as e:
+                log.warning("Failed to post batch: %s; retry %d/%d", e, attempt, MAX_POST_RETRIES)
             time.sleep(1.0)
-            out_q.put(batch)
+        else:
+            count_shed("post_dropped", len(batch))
+            log.warning("Dropping batch of %d flow events after %d attempts", len(batch), MAX_POST_RETRIES)
+        out_q.task_done()
         time.sleep(0.01)
 
 # capture loop using pyshark LiveCapture
 def capture_loop(interface=CAPTURE_INTERFACE, bpf=BPF_FILTER):
+    if pyshark is None:
+        raise SystemExit("pyshark import failed: install with `pip install pyshark` and ensure tshark is installed, or use --engine raw. Err: %s" % PYSHARK_IMPORT_ERROR)
     log.info("Starting capture on %s filter=%s", interface, bpf)
     # Use only_summaries False to get richer fields; use display_filter to limit more if needed
     capture = pyshark.LiveCapture(interface=interface, bpf_filter=bpf)
@@ -219,22 +575,167 @@ def capture_loop(interface=CAPTURE_INTERFACE, bpf=BPF_FILTER):
         except Exception:
             pass
 
+# capture loop using the raw AF_PACKET engine (header-only decode, no tshark)
+def raw_capture_loop(interface=CAPTURE_INTERFACE, bpf=BPF_FILTER):
+    log.info("Starting raw capture on %s filter=%s", interface, bpf)
+    try:
+        for rec in rawcapture.iter_af_packet(interface, bpf=bpf):
+            ingest_packet(rec)
+    except PermissionError:
+        raise SystemExit("raw engine needs CAP_NET_RAW (run as root or grant the capability)")
+    except Exception as e:
+        log.exception("raw capture loop ended: %s", e)
+
+CAPTURE_ENGINES = {"pyshark": capture_loop, "raw": raw_capture_loop}
+
+# -------------------------
+# Offline replay: push a recorded pcap through ingest -> flusher -> poster -> collector
+# -------------------------
+def parse_speed(value):
+    # "max" -> None (as fast as possible), "10x"/"10" -> 10.0
+    v = str(value).strip().lower()
+    if v == "max":
+        return None
+    speed = float(v[:-1] if v.endswith("x") else v)
+    if speed <= 0:
+        raise argparse.ArgumentTypeError("speed must be > 0 or 'max'")
+    return speed
+
+class ReplayClock:
+    def __init__(self, speed):
+        self.speed = speed
+        self.first_ts = None
+        self.wall0 = None
+        self.last_ts = None
+
+    def start(self, ts):
+        self.first_ts = self.last_ts = ts
+        self.wall0 = time.time()
+
+    def advance(self, ts):
+        self.last_ts = ts
+
+    def now(self):
+        if self.first_ts is None:
+            return time.time()
+        if self.speed is None:
+            return self.last_ts
+        return self.first_ts + (time.time() - self.wall0) * self.speed
+
+def replay_loop(path, speed=None, bpf=BPF_FILTER):
+    global clock
+    wanted = rawcapture.make_proto_filter(bpf)
+    rclock = ReplayClock(speed)
+    clock = rclock.now
+    n = 0
+    log.info("Replaying %s at %s", path, "max speed" if speed is None else "%gx" % speed)
+    with rawcapture.PcapReader(path) as rd:
+        for rec in rd.records():
+            if wanted is not None and rec["proto"] not in wanted:
+                continue
+            ts = rec["timestamp"]
+            if rclock.first_ts is None:
+                rclock.start(ts)
+            if speed is not None:
+                due = rclock.wall0 + (ts - rclock.first_ts) / speed
+                delay = due - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    record_lag("replay_schedule", -delay)
+            rclock.advance(ts)
+            ingest_packet(rec)
+            n += 1
+    wall = time.time() - rclock.wall0 if rclock.wall0 else 0.0
+    span = (rclock.last_ts - rclock.first_ts) if rclock.first_ts is not None else 0.0
+    return n, wall, span
+
+def drain_pipeline(poll=0.2):
+    # let every remaining flow time out, then wait until the poster has sent everything
+    global clock
+    end = clock() + FLOW_TIMEOUT + 1.0
+    clock = lambda: end
+    while True:
+        with flows_lock:
+            left = len(flows)
+        if not left:
+            break
+        time.sleep(poll)
+    # flows leave the table before their batch is queued; give the flusher one more cycle
+    time.sleep(BATCH_INTERVAL + poll)
+    out_q.join()
+
+def wait_posted(timeout, poll=0.1):
+    # wait (at most `timeout` seconds) until every queued batch has been posted or dropped
+    deadline = time.time() + timeout
+    while out_q.unfinished_tasks and time.time() < deadline:
+        time.sleep(poll)
+    return out_q.unfinished_tasks == 0
+
+def replay_report(n_pkts, replay_wall, span, total_wall):
+    with bp_lock:
+        shed = dict(shed_counters)
+    collector_health = None
+    try:
+        base = FLOWCOLLECTOR_URL.rsplit("/", 1)[0]
+        collector_health = requests.get(base + "/health", timeout=3.0).json()
+    except Exception as e:
+        log.debug("collector /health unavailable: %s", e)
+    report = {
+        "packets": n_pkts,
+        "capture_span_s": round(span, 3),
+        "replay_wall_s": round(replay_wall, 3),
+        "end_to_end_wall_s": round(total_wall, 3),
+        "ingest_pps": round(n_pkts / replay_wall, 1) if replay_wall > 0 else None,
+        "end_to_end_pps": round(n_pkts / total_wall, 1) if total_wall > 0 else None,
+        "achieved_speedup": round(span / replay_wall, 2) if replay_wall > 0 else None,
+        "lag": lag_summary(),
+        "shed": shed,
+        "collector": collector_health,
+    }
+    log.info("Replay report:\n%s", json.dumps(report, indent=2))
+    return report
+
 # CLI main
 def main():
+    global CAPTURE_INTERFACE, BPF_FILTER, FLOWCOLLECTOR_URL, FLOW_TIMEOUT
     parser = argparse.ArgumentParser()
     parser.add_argument("--iface", default=os.environ.get("SNIF_IFACE", CAPTURE_INTERFACE))
     parser.add_argument("--filter", default=os.environ.get("SNIF_FILTER", BPF_FILTER))
     parser.add_argument("--collector", default=os.environ.get("FLOWCOLLECTOR_URL", FLOWCOLLECTOR_URL))
     parser.add_argument("--timeout", type=float, default=float(os.environ.get("FLOW_TIMEOUT", FLOW_TIMEOUT)))
+    parser.add_argument("--replay", default=None, metavar="FILE.pcap",
+                        help="replay a recorded capture through the pipeline instead of sniffing live")
+    parser.add_argument("--speed", type=parse_speed, default="1x",
+                        help="replay rate: Nx of the original timing, or 'max' for as fast as possible")
+    parser.add_argument("--workers", type=int, default=CAPTURE_WORKERS,
+                        help="shard flows across N worker processes by 5-tuple hash (implies --engine raw)")
+    parser.add_argument("--engine", choices=sorted(CAPTURE_ENGINES), default=CAPTURE_ENGINE,
+                        help="pyshark: full tshark decode; raw: AF_PACKET socket with header-only parsing")
     args = parser.parse_args()
-    global CAPTURE_INTERFACE, BPF_FILTER, FLOWCOLLECTOR_URL, FLOW_TIMEOUT
     CAPTURE_INTERFACE = args.iface; BPF_FILTER = args.filter; FLOWCOLLECTOR_URL = args.collector; FLOW_TIMEOUT = args.timeout
 
+    if args.workers > 1:
+        if args.replay:
+            raise SystemExit("--replay runs in a single process; drop --workers")
+        # workers are forked with this module's config and run their own flusher/poster threads
+        import shardcapture
+        shardcapture.run_sharded(sys.modules[__name__], rawcapture.iter_af_packet_frames(CAPTURE_INTERFACE),
+                                 args.workers, bpf=BPF_FILTER)
+        return
+
     t_flush = threading.Thread(target=flush_idle_flows, daemon=True); t_flush.start()
     t_post = threading.Thread(target=poster_loop, daemon=True); t_post.start()
 
+    if args.replay:
+        t0 = time.time()
+        n, replay_wall, span = replay_loop(args.replay, speed=args.speed, bpf=BPF_FILTER)
+        drain_pipeline()
+        replay_report(n, replay_wall, span, time.time() - t0)
+        return
+
     try:
-        capture_loop(interface=CAPTURE_INTERFACE, bpf=BPF_FILTER)
+        CAPTURE_ENGINES[args.engine](interface=CAPTURE_INTERFACE, bpf=BPF_FILTER)
     except KeyboardInterrupt:
         log.info("Stopping capture (keyboard interrupt)")
 
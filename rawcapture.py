@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+# rawcapture.py
+# Lightweight capture backend for packet_sniffer_pyshark: reads frames straight from an
+# AF_PACKET socket or a libpcap file and decodes only Ethernet/IPv4/IPv6/TCP/UDP headers.
+import mmap, socket, struct, time, zlib
+
+ETH_P_ALL = 0x0003
+ETH_P_IP = 0x0800
+ETH_P_IPV6 = 0x86DD
+ETH_P_8021Q = 0x8100
+ETH_P_8021AD = 0x88A8
+
+# pcap link types we know how to strip
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_LINUX_SLL = 113
+
+IPPROTO_TCP = 6
+IPPROTO_UDP = 17
+# IPv6 extension headers walked over to reach the transport header
+_IPV6_EXT = (0, 43, 60)
+_IPV6_FRAG = 44
+
+_u16 = struct.Struct("!H")
+_ports = struct.Struct("!HH")
+
+# TCP flag bits -> designators, emitted in this order (SYN+ACK -> "SA")
+_TCP_FLAG_BITS = ((0x02, "S"), (0x10, "A"), (0x01, "F"), (0x04, "R"), (0x08, "P"), (0x20, "U"), (0x40, "E"), (0x80, "C"))
+_flag_cache = {}
+
+def tcp_flags_str(bits):
+    s = _flag_cache.get(bits)
+    if s is None:
+        s = "".join(ch for b, ch in _TCP_FLAG_BITS if bits & b)
+        _flag_cache[bits] = s
+    return s
+
+def locate_headers(mv, linktype=LINKTYPE_ETHERNET):
+    """Find the network/transport headers of a frame without copying anything.
+
+    Returns (family, addr_off, addr_len, proto, l4_off) or None for non-IP frames;
+    l4_off is -1 when the transport header is not present (non-first fragments).
+    """
+    n = len(mv)
+    off = 0
+    if linktype == LINKTYPE_ETHERNET:
+        if n < 14:
+            return None
+        etype = _u16.unpack_from(mv, 12)[0]
+        off = 14
+        # up to two VLAN tags (802.1Q / QinQ)
+        while etype in (ETH_P_8021Q, ETH_P_8021AD) and off + 4 <= n:
+            etype = _u16.unpack_from(mv, off + 2)[0]
+            off += 4
+    elif linktype == LINKTYPE_LINUX_SLL:
+        if n < 16:
+            return None
+        etype = _u16.unpack_from(mv, 14)[0]
+        off = 16
+    elif linktype == LINKTYPE_RAW:
+        if n < 1:
+            return None
+        etype = ETH_P_IP if (mv[0] >> 4) == 4 else ETH_P_IPV6
+    else:
+        return None
+
+    if etype == ETH_P_IP:
+        if n < off + 20:
+            return None
+        ihl = (mv[off] & 0x0F) * 4
+        proto = mv[off + 9]
+        # non-first fragments carry no transport header
+        frag_off = _u16.unpack_from(mv, off + 6)[0] & 0x1FFF
+        return socket.AF_INET, off + 12, 4, proto, (off + ihl if frag_off == 0 else -1)
+    if etype == ETH_P_IPV6:
+        if n < off + 40:
+            return None
+        proto = mv[off + 6]
+        l4 = off + 40
+        while proto in _IPV6_EXT and l4 + 8 <= n:
+            proto = mv[l4]
+            l4 += (mv[l4 + 1] + 1) * 8
+        if proto == _IPV6_FRAG and l4 + 8 <= n:
+            frag_off = _u16.unpack_from(mv, l4 + 2)[0] >> 3
+            proto = mv[l4]
+            l4 = l4 + 8 if frag_off == 0 else -1
+        return socket.AF_INET6, off + 8, 16, proto, l4
+    return None
+
+def parse_frame(buf, ts, wire_len=None, linktype=LINKTYPE_ETHERNET):
+    """Decode one captured frame into the same record shape as pkt_to_record().
+
+    `buf` may be bytes, bytearray or a memoryview; header fields are read in place with
+    struct.unpack_from and only the address bytes are copied. Returns None for frames
+    that are not IPv4/IPv6.
+    """
+    mv = buf if isinstance(buf, memoryview) else memoryview(buf)
+    loc = locate_headers(mv, linktype)
+    if loc is None:
+        return None
+    family, a, alen, proto, l4 = loc
+    n = len(mv)
+    src_ip = socket.inet_ntop(family, mv[a:a + alen].tobytes())
+    dst_ip = socket.inet_ntop(family, mv[a + alen:a + 2 * alen].tobytes())
+
+    src_port = dst_port = 0
+    flags = ""
+    if proto == IPPROTO_TCP:
+        if 0 <= l4 and l4 + 14 <= n:
+            src_port, dst_port = _ports.unpack_from(mv, l4)
+            flags = tcp_flags_str(mv[l4 + 13])
+        proto_s = "TCP"
+    elif proto == IPPROTO_UDP:
+        if 0 <= l4 and l4 + 4 <= n:
+            src_port, dst_port = _ports.unpack_from(mv, l4)
+        proto_s = "UDP"
+    else:
+        # pyshark reports the numeric ip.proto for anything that is not TCP/UDP
+        proto_s = str(proto)
+
+    return {
+        "timestamp": ts,
+        "bytes": wire_len if wire_len is not None else n,
+        "packets": 1,
+        "flags": flags,
+        "src_ip": src_ip,
+        "dst_ip": dst_ip,
+        "src_port": src_port,
+        "dst_port": dst_port,
+        "proto": proto_s,
+    }
+
+def flow_hash(buf, linktype=LINKTYPE_ETHERNET):
+    """Direction-independent hash of a frame's 5-tuple (A->B and B->A hash alike).
+
+    Uses crc32 rather than hash() so every process agrees on the value. Returns -1
+    for frames that are not IPv4/IPv6.
+    """
+    mv = buf if isinstance(buf, memoryview) else memoryview(buf)
+    loc = locate_headers(mv, linktype)
+    if loc is None:
+        return -1
+    family, a, alen, proto, l4 = loc
+    if proto in (IPPROTO_TCP, IPPROTO_UDP) and 0 <= l4 and l4 + 4 <= len(mv):
+        src = mv[a:a + alen].tobytes() + mv[l4:l4 + 2].tobytes()
+        dst = mv[a + alen:a + 2 * alen].tobytes() + mv[l4 + 2:l4 + 4].tobytes()
+    else:
+        src = mv[a:a + alen].tobytes()
+        dst = mv[a + alen:a + 2 * alen].tobytes()
+    lo, hi = (src, dst) if src <= dst else (dst, src)
+    return zlib.crc32(hi, zlib.crc32(lo, proto))
+
+# tiny protocol filter for the raw engine: there is no BPF compiler here, so only the
+# common sniffer filters ("tcp", "udp", "tcp or udp", "") are honoured
+def make_proto_filter(expr):
+    expr = (expr or "").strip().lower()
+    if not expr:
+        return None
+    wanted = set()
+    for tok in expr.replace("(", " ").replace(")", " ").split():
+        if tok in ("tcp", "udp"):
+            wanted.add(tok.upper())
+        elif tok not in ("or", "ip", "ip6"):
+            raise ValueError("raw engine only supports 'tcp'/'udp' filters, got %r" % expr)
+    return wanted or None
+
+def iter_af_packet_frames(interface, snaplen=65535):
+    """Yield (ts, wire_len, frame_memoryview) from a Linux AF_PACKET socket (needs CAP_NET_RAW).
+
+    The view aliases one receive buffer and is overwritten by the next frame.
+    """
+    sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ALL))
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 8 * 1024 * 1024)
+    except OSError:
+        pass
+    sock.bind((interface, 0))
+    buf = bytearray(snaplen)
+    view = memoryview(buf)
+    try:
+        while True:
+            n = sock.recv_into(buf)
+            yield time.time(), n, view[:n]
+    finally:
+        sock.close()
+
+def iter_af_packet(interface, snaplen=65535, bpf=None):
+    """Yield records for frames received on a Linux AF_PACKET socket (needs CAP_NET_RAW)."""
+    wanted = make_proto_filter(bpf)
+    for ts, n, frame in iter_af_packet_frames(interface, snaplen):
+        rec = parse_frame(frame, ts, n, LINKTYPE_ETHERNET)
+        if rec is not None and (wanted is None or rec["proto"] in wanted):
+            yield rec
+
+# ---- libpcap file reader (mmap-backed, zero-copy frame slices) ----
+_PCAP_MAGIC = {
+    b"\xd4\xc3\xb2\xa1": ("<", 1e-6),
+    b"\xa1\xb2\xc3\xd4": (">", 1e-6),
+    b"\x4d\x3c\xb2\xa1": ("<", 1e-9),
+    b"\xa1\xb2\x3c\x4d": (">", 1e-9),
+}
+
+class PcapReader:
+    """Iterate (ts, wire_len, frame_memoryview) over a classic libpcap file via mmap.
+
+    Frame views point into the mapping, so they are only valid until the reader is closed.
+    pcapng is not supported (convert with `editcap -F pcap`).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._fh = open(path, "rb")
+        self._mm = mmap.mmap(self._fh.fileno(), 0, access=mmap.ACCESS_READ)
+        self._mv = memoryview(self._mm)
+        magic = bytes(self._mv[:4])
+        if magic not in _PCAP_MAGIC:
+            self.close()
+            raise ValueError("%s: not a libpcap file (pcapng is not supported)" % path)
+        endian, self.ts_scale = _PCAP_MAGIC[magic]
+        self._rec = struct.Struct(endian + "IIII")
+        self.snaplen, self.linktype = struct.unpack_from(endian + "II", self._mv, 16)
+
+    def __iter__(self):
+        mv = self._mv
+        rec = self._rec
+        scale = self.ts_scale
+        off = 24
+        end = len(mv)
+        while off + 16 <= end:
+            sec, frac, incl, orig = rec.unpack_from(mv, off)
+            off += 16
+            if off + incl > end:
+                break
+            yield sec + frac * scale, orig, mv[off:off + incl]
+            off += incl
+
+    def records(self):
+        linktype = self.linktype
+        for ts, wire_len, frame in self:
+            r = parse_frame(frame, ts, wire_len, linktype)
+            if r is not None:
+                yield r
+
+    def close(self):
+        try:
+            self._mv.release()
+        except Exception:
+            pass
+        try:
+            self._mm.close()
+        except Exception:
+            pass
+        self._fh.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def write_pcap(path, frames, linktype=LINKTYPE_ETHERNET, snaplen=65535):
+    """Write (ts, frame_bytes) pairs as a little-endian microsecond pcap (used by the benchmarks)."""
+    with open(path, "wb") as fh:
+        fh.write(struct.pack("<IHHiIII", 0xA1B2C3D4, 2, 4, 0, 0, snaplen, linktype))
+        for ts, frame in frames:
+            sec = int(ts)
+            usec = int(round((ts - sec) * 1e6))
+            fh.write(struct.pack("<IIII", sec, usec, len(frame), len(frame)))
+            fh.write(frame)
+
+def build_tcp_frame(src_ip, dst_ip, sport, dport, flags=0x10, payload_len=0):
+    """Build a minimal Ethernet/IPv4/TCP frame (for synthetic benchmark captures)."""
+    ip_len = 20 + 20 + payload_len
+    eth = b"\x00\x11\x22\x33\x44\x55\x66\x77\x88\x99\xaa\xbb" + _u16.pack(ETH_P_IP)
+    ip = struct.pack("!BBHHHBBH4s4s", 0x45, 0, ip_len, 0, 0, 64, IPPROTO_TCP, 0,
+                     socket.inet_aton(src_ip), socket.inet_aton(dst_ip))
+    tcp = struct.pack("!HHIIBBHHH", sport, dport, 0, 0, 5 << 4, flags, 65535, 0, 0)
+    return eth + ip + tcp + b"\x00" * payload_len
@@ -0,0 +1,113 @@
+# scripts/bench_capture.py
+"""
+Packets/sec benchmark for the sniffer capture engines on a replayed pcap.
+Usage:
+  python scripts/bench_capture.py --pcap capture.pcap
+or (no capture at hand) synthesize one:
+  python scripts/bench_capture.py --synth 200000
+Measures raw-engine header parsing alone, raw parsing + ingest_packet, and (if pyshark/tshark
+are installed) pyshark decoding of the same file for comparison.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+import rawcapture  # noqa: E402
+
+
+def synth_pcap(path, n_packets, n_flows=5000, seed=7):
+    rnd = random.Random(seed)
+    flows = [("10.%d.%d.%d" % (rnd.randrange(256), rnd.randrange(256), rnd.randrange(1, 255)),
+              "192.168.1.%d" % rnd.randrange(1, 255), rnd.randrange(1024, 65535), rnd.choice((80, 443, 22, 53)))
+             for _ in range(n_flows)]
+    ts = time.time() - n_packets * 1e-4
+    frames = []
+    for i in range(n_packets):
+        src, dst, sport, dport = flows[rnd.randrange(n_flows)]
+        flags = rnd.choice((0x02, 0x10, 0x18, 0x11))
+        frames.append((ts + i * 1e-4, rawcapture.build_tcp_frame(src, dst, sport, dport, flags, rnd.choice((0, 64, 512, 1400)))))
+    rawcapture.write_pcap(path, frames)
+
+
+def bench_raw_parse(path):
+    with rawcapture.PcapReader(path) as rd:
+        t0 = time.perf_counter()
+        n = sum(1 for _ in rd.records())
+        dt = time.perf_counter() - t0
+    return n, dt
+
+
+def bench_raw_ingest(path):
+    import packet_sniffer_pyshark as sniffer
+    sniffer.flows.clear()
+    with rawcapture.PcapReader(path) as rd:
+        t0 = time.perf_counter()
+        n = 0
+        for rec in rd.records():
+            sniffer.ingest_packet(rec)
+            n += 1
+        dt = time.perf_counter() - t0
+    sniffer.flows.clear()
+    return n, dt
+
+
+def bench_pyshark(path, limit):
+    try:
+        import pyshark
+    except Exception as e:
+        print("pyshark: skipped (%s)" % e)
+        return None
+    import packet_sniffer_pyshark as sniffer
+    cap = pyshark.FileCapture(path, keep_packets=False)
+    n = 0
+    t0 = time.perf_counter()
+    try:
+        for pkt in cap:
+            sniffer.pkt_to_record(pkt)
+            n += 1
+            if n >= limit:
+                break
+    finally:
+        cap.close()
+    return n, time.perf_counter() - t0
+
+
+def report(name, res):
+    if res is None:
+        return
+    n, dt = res
+    print("%-22s %10d pkts %8.3fs %12.0f pps" % (name, n, dt, n / dt if dt > 0 else float("inf")))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--pcap", default=None, help="libpcap file to replay")
+    ap.add_argument("--synth", type=int, default=200000, help="packets to synthesize when --pcap is not given")
+    ap.add_argument("--pyshark-limit", type=int, default=20000, help="cap on packets decoded by pyshark (it is slow)")
+    args = ap.parse_args()
+
+    path = args.pcap
+    tmp = None
+    if not path:
+        tmp = tempfile.NamedTemporaryFile(suffix=".pcap", delete=False)
+        tmp.close()
+        path = tmp.name
+        synth_pcap(path, args.synth)
+        print("synthesized %d packets -> %s" % (args.synth, path))
+    try:
+        report("raw parse", bench_raw_parse(path))
+        report("raw parse + ingest", bench_raw_ingest(path))
+        report("pyshark decode", bench_pyshark(path, args.pyshark_limit))
+    finally:
+        if tmp is not None:
+            os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+# scripts/bench_flow_memory.py
+"""
+Per-flow memory of the sniffer's flow table.
+Usage:
+  python scripts/bench_flow_memory.py --flows 50000 --pkts 20
+Feeds the same synthetic packets into three layouts and reports tracemalloc bytes per connection:
+  legacy     - string key, dict per flow with a flag set and a deque of (ts, bytes) samples
+  dict+stats - tuple key, dict per flow with an array('d') of streaming stats
+  FlowTable  - packed int key, one row in the shared array('d') (what the sniffer uses now)
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tracemalloc
+from array import array
+from collections import deque
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+import packet_sniffer_pyshark as sniffer  # noqa: E402
+
+
+def synth_packets(n_flows, pkts_per_flow, seed=7):
+    rnd = random.Random(seed)
+    ts = time.time()
+    for i in range(n_flows):
+        src = "10.%d.%d.%d" % ((i >> 16) & 255, (i >> 8) & 255, i & 255)
+        dst = "192.168.%d.%d" % (rnd.randrange(256), rnd.randrange(1, 255))
+        sport, dport = rnd.randrange(1024, 65535), rnd.choice((80, 443, 22, 53))
+        for j in range(pkts_per_flow):
+            ts += 1e-5
+            fwd = j % 2 == 0
+            yield {"timestamp": ts, "bytes": rnd.choice((60, 64, 512, 1400)), "packets": 1,
+                   "flags": rnd.choice(("S", "SA", "A", "PA")),
+                   "src_ip": src if fwd else dst, "dst_ip": dst if fwd else src,
+                   "src_port": sport if fwd else dport, "dst_port": dport if fwd else sport, "proto": "TCP"}
+
+
+def ingest_legacy(table, rec):
+    k = "|".join([str(rec["src_ip"]), str(rec["dst_ip"]), str(rec["src_port"]), str(rec["dst_port"]), str(rec["proto"]).upper()])
+    f = table.get(k)
+    if not f:
+        f = {"first_ts": rec["timestamp"], "last_ts": rec["timestamp"], "bytes": 0, "pkts": 0, "flags": set(), "events": deque()}
+        table[k] = f
+    f["bytes"] += rec["bytes"]
+    f["pkts"] += rec["packets"]
+    f["last_ts"] = rec["timestamp"]
+    if rec.get("flags"):
+        f["flags"].add(rec["flags"])
+    f["events"].append((rec["timestamp"], rec["bytes"]))
+    while len(f["events"]) > 500:
+        f["events"].popleft()
+
+
+def ingest_dict_stats(table, rec):
+    src, dst, sport, dport = rec["src_ip"], rec["dst_ip"], rec["src_port"], rec["dst_port"]
+    k = (src, dst, sport, dport, "TCP") if (src, sport) <= (dst, dport) else (dst, src, dport, sport, "TCP")
+    f = table.get(k)
+    if not f:
+        f = {"first_ts": rec["timestamp"], "last_ts": rec["timestamp"], "bytes": 0, "pkts": 0,
+             "src_ip": src, "dst_ip": dst, "src_port": sport, "dst_port": dport, "proto": k[4],
+             "fwd_pkts": 0, "bwd_pkts": 0, "fwd_bytes": 0, "bwd_bytes": 0, "stats": array("d", [0.0] * sniffer.ST_SIZE)}
+        table[k] = f
+    f["bytes"] += rec["bytes"]
+    f["pkts"] += rec["packets"]
+    if sport == f["src_port"] and src == f["src_ip"]:
+        f["fwd_pkts"] += rec["packets"]
+        f["fwd_bytes"] += rec["bytes"]
+    else:
+        f["bwd_pkts"] += rec["packets"]
+        f["bwd_bytes"] += rec["bytes"]
+    f["last_ts"] = rec["timestamp"]
+    st = f["stats"]
+    sniffer.update_stats(st, 0, rec["timestamp"], float(rec["bytes"]), sniffer.flag_bits(rec["flags"]))
+
+
+def measure(name, build, packets, n_conns):
+    # bytes per bidirectional connection (the legacy key is directional, so it keeps two entries)
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    table = build(packets)
+    used = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    print("%-11s %8d entries %12d bytes %8.1f B/conn" % (name, len(table), used, used / n_conns))
+    del table
+    return used / n_conns
+
+
+def build_with(ingest):
+    def build(packets):
+        table = {}
+        for rec in packets:
+            ingest(table, rec)
+        return table
+    return build
+
+
+def build_flow_table(packets):
+    sniffer.flows.clear()
+    for rec in packets:
+        sniffer.ingest_packet(rec)
+    return sniffer.flows
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--flows", type=int, default=50000, help="distinct bidirectional flows to track")
+    ap.add_argument("--pkts", type=int, default=20, help="packets per flow")
+    args = ap.parse_args()
+    if args.flows > sniffer.MAX_FLOWS:
+        ap.error("--flows exceeds SNIF_MAX_FLOWS=%d" % sniffer.MAX_FLOWS)
+
+    # materialize the packets first so their allocation is not charged to any layout
+    packets = list(synth_packets(args.flows, args.pkts))
+    legacy = measure("legacy", build_with(ingest_legacy), packets, args.flows)
+    dict_stats = measure("dict+stats", build_with(ingest_dict_stats), packets, args.flows)
+    table = measure("FlowTable", build_flow_table, packets, args.flows)
+    sniffer.flows.clear()
+    print("FlowTable vs legacy: %.1fx smaller, vs dict+stats: %.1fx smaller" % (legacy / table, dict_stats / table))
+
+
+if __name__ == "__main__":
+    main()
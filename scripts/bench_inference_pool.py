@@ -0,0 +1,68 @@
+# scripts/bench_inference_pool.py
+"""
+Mouse-session scoring throughput: request threads vs the inference process pool.
+Usage:
+  python scripts/bench_inference_pool.py --threads 8 --sessions 64 --workers 4 --events 400
+Scores the same synthetic sessions through InferenceExecutor(workers=0) (the window
+loop on the calling thread, GIL-bound) and InferenceExecutor(workers=N) (shared-memory
+input, models preloaded per process), checks both give identical results, and prints
+sessions/s. Uses whatever mouse models backend/model_registry.py finds; without any,
+only feature extraction is measured.
+"""
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+import numpy as np  # noqa: E402
+
+from backend.inference_pool import InferenceExecutor  # noqa: E402
+from backend.mouse_model import events_to_array  # noqa: E402
+
+
+def synth_session(n, seed):
+    rnd = np.random.RandomState(seed)
+    t0 = 1700000000000
+    return [{"x": float(i * 3 + rnd.rand() * 5), "y": float(200 + 50 * np.sin(i / 15.0) + rnd.rand()),
+             "t": t0 + i * 16 + int(rnd.rand() * 8)} for i in range(n)]
+
+
+def bench(ex, sessions, threads, kw):
+    with ThreadPoolExecutor(threads) as tp:
+        t0 = time.time()
+        out = list(tp.map(lambda s: ex.run("mouse_windows", s, **kw), sessions))
+        return out, time.time() - t0
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--threads", type=int, default=8)
+    ap.add_argument("--sessions", type=int, default=64)
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    ap.add_argument("--events", type=int, default=400)
+    ap.add_argument("--window", type=int, default=20)
+    args = ap.parse_args()
+
+    sessions = [events_to_array(synth_session(args.events, i)) for i in range(args.sessions)]
+    kw = dict(window_size=args.window, stride=max(1, args.window // 2))
+    inline = InferenceExecutor(workers=0)
+    pool = InferenceExecutor(workers=args.workers)
+    pool.run("mouse_windows", sessions[0], **kw)    # start processes + load models outside the timing
+    inline.run("mouse_windows", sessions[0], **kw)
+
+    ref, t_inline = bench(inline, sessions, args.threads, kw)
+    got, t_pool = bench(pool, sessions, args.threads, kw)
+    pool.shutdown()
+    print("%d sessions x %d events, %d request threads, %d cores" % (args.sessions, args.events, args.threads,
+                                                                    os.cpu_count() or 1))
+    print("inline        %7.2fs  %8.1f sessions/s" % (t_inline, args.sessions / t_inline))
+    print("pool x%-3d     %7.2fs  %8.1f sessions/s" % (args.workers, t_pool, args.sessions / t_pool))
+    print("models: %s; results identical: %s" % (", ".join(ref[0]["models"]) or "none", ref == got))
+
+
+if __name__ == "__main__":
+    main()
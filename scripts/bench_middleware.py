@@ -0,0 +1,109 @@
+# scripts/bench_middleware.py
+"""
+Per-request overhead of the app.py middleware logic, before and after backend/middleware.py.
+Usage:
+  python scripts/bench_middleware.py --requests 200000
+Replays a mix of paths / User-Agents through the legacy hook bodies (lowercase + keyword
+scan per request, per-hook prefix checks, str decode + replace of HTML bodies) and through
+the current helpers (precompiled regex with per-UA LRU, one exempt table, cached bytes
+injection). Flask itself is not involved, so this isolates the hook logic.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+from backend import middleware  # noqa: E402
+
+PATHS = ["/", "/dashboard", "/api/predict_mouse", "/collect_and_check", "/static/app.js",
+         "/socket.io/", "/health", "/alerts", "/blocks"]
+UAS = [
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 14_1) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.1 Safari/605.1.15",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:121.0) Gecko/20100101 Firefox/121.0",
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) HeadlessChrome/120.0 Safari/537.36",
+    "python-requests/2.31.0",
+]
+HTML = ("<!doctype html><html><head><meta charset='utf-8'><title>AI-ML CyberDefense</title>"
+        "<link rel='stylesheet' href='/static/app.css'></head><body>" + "<div class='row'>x</div>" * 400
+        + "</body></html>")
+
+
+def legacy_request(path, headers, html):
+    # check_blocklist prefix test
+    if not (path.startswith("/static") or path.startswith("/socket.io") or path.startswith("/health")
+            or path.startswith("/collect_flow_event")):
+        headers.get("X-Real-IP")
+    # block_automation
+    if not (path.startswith("/static") or path.startswith("/socket.io")):
+        ua = headers.get("User-Agent", "").lower()
+        bad_keywords = ["selenium", "webdriver", "headless", "phantomjs", "puppeteer", "playwright", "automation"]
+        if any(k in ua for k in bad_keywords):
+            return 403
+        if headers.get("Sec-Fetch-Mode", "") == "navigate" and "chrome" not in ua:
+            return 403
+        if headers.get("X-Selenium") == "1":
+            return 403
+    # inject_flow_report
+    if html is not None:
+        body = html.decode("utf-8")
+        if "id=\"flow-report-js\"" not in body and "</head>" in body:
+            body = body.replace("</head>", '<script id="flow-report-js" src="/static/flow_report.js" defer></script></head>')
+        body.encode("utf-8")
+    return 200
+
+
+_cache = middleware.InjectedHTMLCache()
+
+
+def current_request(path, headers, html):
+    if not middleware.is_exempt(path, "blocklist"):
+        headers.get("X-Real-IP")
+    if not middleware.is_exempt(path, "automation") and middleware.is_automation_headers(headers):
+        return 403
+    if html is not None:
+        key = (path, "etag-1")
+        body = _cache.get(key)
+        if body is None:
+            body = middleware.inject_flow_report_tag(html)
+            if body is not None:
+                _cache.put(key, body)
+    return 200
+
+
+def workload(n, seed=3):
+    rnd = random.Random(seed)
+    html = HTML.encode("utf-8")
+    out = []
+    for _ in range(n):
+        path = rnd.choice(PATHS)
+        headers = {"User-Agent": rnd.choice(UAS), "Sec-Fetch-Mode": rnd.choice(("navigate", "cors", "no-cors"))}
+        out.append((path, headers, html if path in ("/", "/dashboard") else None))
+    return out
+
+
+def run(name, fn, reqs):
+    t0 = time.perf_counter()
+    for path, headers, html in reqs:
+        fn(path, headers, html)
+    dt = time.perf_counter() - t0
+    print("%-8s %8d requests %8.3fs %8.2f us/request" % (name, len(reqs), dt, dt / len(reqs) * 1e6))
+    return dt
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=200000)
+    args = ap.parse_args()
+    reqs = workload(args.requests)
+    before = run("legacy", legacy_request, reqs)
+    after = run("current", current_request, reqs)
+    print("speedup: %.1fx" % (before / after))
+
+
+if __name__ == "__main__":
+    main()
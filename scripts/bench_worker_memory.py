@@ -0,0 +1,119 @@
+# scripts/bench_worker_memory.py
+"""
+RSS / PSS per forked worker for the three ways of holding a random forest.
+Usage:
+  python scripts/bench_worker_memory.py --workers 4 --model data/processed/rf_model.save
+  python scripts/bench_worker_memory.py --workers 4 --synthetic 300
+Modes (each forks --workers children that score --requests batches, then report):
+  per-worker - every child joblib.load()s its own copy (gunicorn without --preload)
+  preload    - the parent loads once and forks, gc.freeze() first (gunicorn preload)
+  mmap       - children open the MmapForest export (MODEL_MMAP=1); no unpickling
+PSS splits shared pages between the processes that map them, so "sum pss" is the
+workers' combined footprint; RSS counts every shared page in full in each worker.
+"""
+import os
+import gc
+import sys
+import time
+import argparse
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+import numpy as np  # noqa: E402
+import joblib  # noqa: E402
+
+from backend.forest_mmap import load_forest_mmap  # noqa: E402
+
+
+def smaps(pid):
+    out = {}
+    with open("/proc/%d/smaps_rollup" % pid) as fh:
+        for line in fh:
+            parts = line.split()
+            if len(parts) == 3 and parts[0] in ("Rss:", "Pss:", "Shared_Clean:", "Private_Dirty:"):
+                out[parts[0].rstrip(":").lower()] = int(parts[1])
+    return out
+
+
+def synthetic_model(path, n_estimators, n_features=18):
+    from sklearn.ensemble import RandomForestClassifier
+    rnd = np.random.RandomState(0)
+    X = rnd.normal(size=(20000, n_features))
+    y = (X[:, 0] + 0.5 * X[:, 1] * X[:, 2] + rnd.normal(scale=0.5, size=len(X)) > 0).astype(int)
+    model = RandomForestClassifier(n_estimators=n_estimators, n_jobs=-1, random_state=0).fit(X, y)
+    joblib.dump(model, path)
+    return path
+
+
+def run_mode(mode, path, cache_dir, workers, requests):
+    shared = None
+    if mode == "preload":
+        shared = joblib.load(path)
+        gc.collect()
+        gc.freeze()
+    pids, ready = [], []
+    for _ in range(workers):
+        r, w = os.pipe()
+        go_r, go_w = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(r)
+            os.close(go_w)
+            if mode == "per-worker":
+                model = joblib.load(path)
+            elif mode == "mmap":
+                model = load_forest_mmap(path, cache_dir)
+            else:
+                model = shared
+            X = np.random.RandomState(os.getpid()).normal(size=(32, model.n_features_in_))
+            for _ in range(requests):
+                model.predict_proba(X)
+            os.write(w, b"r")
+            os.read(go_r, 1)    # stay alive until the parent has read our smaps
+            os._exit(0)
+        os.close(w)
+        os.close(go_r)
+        pids.append(pid)
+        ready.append((r, go_w))
+    for r, _ in ready:
+        os.read(r, 1)
+    stats = [smaps(pid) for pid in pids]
+    for r, go_w in ready:
+        os.write(go_w, b"g")
+        os.close(r)
+        os.close(go_w)
+    for pid in pids:
+        os.waitpid(pid, 0)
+    if mode == "preload":
+        gc.unfreeze()
+    return stats
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--requests", type=int, default=50)
+    ap.add_argument("--model", default=os.path.join(ROOT, "data", "processed", "rf_model.save"))
+    ap.add_argument("--synthetic", type=int, default=0, help="train a forest with this many trees instead")
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench_worker_memory-")
+    path = synthetic_model(os.path.join(tmp, "rf_synthetic.save"), args.synthetic) if args.synthetic else args.model
+    cache_dir = os.path.join(tmp, "mmap")
+    load_forest_mmap(path, cache_dir)    # export once, as the first worker would
+    print("model: %s (%.1f MB on disk), %d workers" % (path, os.path.getsize(path) / 1e6, args.workers))
+    print("%-11s %12s %12s %12s %14s" % ("mode", "rss/worker", "pss/worker", "sum pss", "private dirty"))
+    for mode in ("per-worker", "preload", "mmap"):
+        t0 = time.time()
+        stats = run_mode(mode, path, cache_dir, args.workers, args.requests)
+        rss = sum(s["rss"] for s in stats) / len(stats) / 1024.0
+        pss = sum(s["pss"] for s in stats) / 1024.0
+        dirty = sum(s["private_dirty"] for s in stats) / len(stats) / 1024.0
+        print("%-11s %9.1f MB %9.1f MB %9.1f MB %11.1f MB   (%.1fs)" % (
+            mode, rss, pss / len(stats), pss, dirty, time.time() - t0))
+
+
+if __name__ == "__main__":
+    main()
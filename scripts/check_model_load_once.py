@@ -0,0 +1,98 @@
+# scripts/check_model_load_once.py
+"""
+Memory regression check: every model artifact is loaded at most once per process.
+Usage:
+  python scripts/check_model_load_once.py --threads 8 --max-extra-mb 16
+Counts loader calls in the shared registry (backend/model_registry.py) while both
+consumers ask for the mouse models from several threads at once:
+  app.py         - MODELS.get_many(*MOUSE_MODELS), as _predict_mouse_from_events does
+  mouse_model.py - predict_mouse_features(), as routes/collect.py does
+Fails (exit 1) if any artifact's loader ran more than once, if mouse_model.py holds its
+own model objects, or if the second consumer grows RSS by more than --max-extra-mb.
+Artifacts that are not on disk show up as "missing" and are not counted.
+"""
+import os
+import sys
+import argparse
+import threading
+from collections import Counter
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+from backend import model_registry  # noqa: E402
+from backend.model_registry import MODELS, MOUSE_MODELS, rss_bytes  # noqa: E402
+
+CALLS = Counter()
+
+
+def count_loads(registry):
+    for name, entry in registry._entries.items():
+        def _counted(path, _name=name, _loader=entry.loader):
+            CALLS[_name] += 1
+            return _loader(path)
+        entry.loader = _counted
+
+
+def hammer(fn, threads):
+    gate = threading.Barrier(threads)
+
+    def _run():
+        gate.wait()
+        fn()
+
+    ts = [threading.Thread(target=_run) for _ in range(threads)]
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--threads", type=int, default=8)
+    ap.add_argument("--max-extra-mb", type=float, default=16.0)
+    args = ap.parse_args()
+
+    count_loads(MODELS)
+    from backend import mouse_model  # noqa: E402
+
+    failures = []
+    if mouse_model.MODELS is not MODELS:
+        failures.append("mouse_model.py uses a different registry instance")
+    for attr in ("rf_model", "rf_scaler", "lstm_model", "lstm_scaler"):
+        if getattr(mouse_model, attr, None) is not None:
+            failures.append("mouse_model.%s is a private model copy" % attr)
+
+    rss0 = rss_bytes()
+    hammer(lambda: MODELS.get_many(*MOUSE_MODELS), args.threads)
+    rss1 = rss_bytes()
+    hammer(lambda: mouse_model.predict_mouse_features([0.0] * 20), args.threads)
+    rss2 = rss_bytes()
+
+    status = MODELS.status()
+    print("%-22s %-9s %6s %10s  %s" % ("artifact", "state", "loads", "load_ms", "path"))
+    for name in MODELS.names():
+        st = status[name]
+        print("%-22s %-9s %6d %10s  %s" % (name, st["state"], CALLS[name], st["load_ms"], st["path"]))
+        if CALLS[name] > 1:
+            failures.append("%s loaded %d times" % (name, CALLS[name]))
+
+    if rss0 is not None:
+        first_mb = (rss1 - rss0) / 1e6
+        extra_mb = (rss2 - rss1) / 1e6
+        print("\nrss: app.py consumer %+.1f MB, mouse_model.py consumer %+.1f MB" % (first_mb, extra_mb))
+        if extra_mb > args.max_extra_mb:
+            failures.append("mouse_model.py consumer grew RSS by %.1f MB (> %.1f)" % (extra_mb, args.max_extra_mb))
+    print("data dir: %s" % model_registry.DATA_DIR)
+
+    if failures:
+        print("\nFAIL")
+        for f in failures:
+            print(" - " + f)
+        sys.exit(1)
+    print("\nOK: each artifact loaded at most once")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# scripts/startup_time.py
+"""
+Time-to-first-healthy for the backend, for CI.
+Usage:
+  python scripts/startup_time.py --max-seconds 10
+  python scripts/startup_time.py --cmd "gunicorn -c gunicorn.conf.py backend.app:app" --port 5000
+Starts the server (default: python -m backend.app on a free port), polls /health until
+it answers 200, then prints the wall time from spawn and the server's own
+/admin/startup report: slowest imports, startup phases, deferred imports. Exits 1 if
+the server was not healthy within --max-seconds (or died first).
+"""
+import os
+import sys
+import json
+import time
+import shlex
+import socket
+import argparse
+import tempfile
+import subprocess
+import urllib.request
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def get_json(url, timeout=1.0):
+    with urllib.request.urlopen(url, timeout=timeout) as resp:
+        return resp.status, json.loads(resp.read().decode("utf-8"))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--cmd", default=None, help="server command (default: python -m backend.app)")
+    ap.add_argument("--port", type=int, default=0)
+    ap.add_argument("--max-seconds", type=float, default=30.0)
+    ap.add_argument("--top", type=int, default=10)
+    ap.add_argument("--json", action="store_true", help="print the raw /admin/startup report")
+    args = ap.parse_args()
+
+    port = args.port or free_port()
+    env = dict(os.environ, PORT=str(port), HOST="127.0.0.1", FLASK_ENV="production", PYTHONPATH=ROOT)
+    cmd = shlex.split(args.cmd) if args.cmd else [sys.executable, "-m", "backend.app"]
+    base = "http://127.0.0.1:%d" % port
+
+    t0 = time.time()
+    log = tempfile.TemporaryFile()     # not a pipe: a chatty server would block on a full one
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+    healthy_s = None
+    try:
+        while time.time() - t0 < args.max_seconds:
+            if proc.poll() is not None:
+                log.seek(0)
+                sys.stderr.write(log.read().decode("utf-8", "replace")[-4000:])
+                print("FAIL: server exited with %s before becoming healthy" % proc.returncode)
+                sys.exit(1)
+            try:
+                status, _ = get_json(base + "/health")
+                if status == 200:
+                    healthy_s = time.time() - t0
+                    break
+            except Exception:
+                pass
+            time.sleep(0.05)
+        if healthy_s is None:
+            print("FAIL: not healthy after %.1fs" % args.max_seconds)
+            sys.exit(1)
+
+        _, report = get_json(base + "/admin/startup?top=%d" % args.top, timeout=5.0)
+        if args.json:
+            print(json.dumps(report, indent=2))
+        else:
+            print("time to first healthy: %.2fs (spawn -> /health 200)" % healthy_s)
+            print("server view: app import %s ms, ready at %s ms, first healthy at %s ms after process start" % (
+                report.get("app_import_ms"), report.get("time_to_ready_ms"), report.get("time_to_first_healthy_ms")))
+            print("\nslowest imports (inclusive ms):")
+            for i in report.get("imports", []):
+                print("  %9.1f  %s%s" % (i["ms"], i["module"], "  (via %s)" % i["parent"] if i["parent"] else ""))
+            print("\nphases:")
+            for p in report.get("phases", []):
+                print("  %9.1f  %s" % (p["ms"], p["phase"]))
+            print("\ndeferred until first use:", ", ".join(i["module"] for i in report.get("deferred_imports", [])) or "-")
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+if __name__ == "__main__":
+    main()
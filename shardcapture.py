@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# shardcapture.py
+# Multi-process capture for packet_sniffer_pyshark: the capture process hashes every frame's
+# direction-normalized 5-tuple and hands it to one of N worker processes through a
+# shared-memory ring. Each worker owns its flow table, flusher and poster threads, so both
+# directions of a flow always land in the same worker and capture scales with cores.
+import os, time, struct, signal, logging, multiprocessing
+from multiprocessing import shared_memory
+
+import rawcapture
+
+SHARD_SNAPLEN = int(os.environ.get("SNIF_SHARD_SNAPLEN", 128))       # header bytes copied per frame
+SHARD_RING_SLOTS = int(os.environ.get("SNIF_SHARD_RING_SLOTS", 65536))  # frames buffered per worker (power of two)
+SHARD_STATS_INTERVAL = float(os.environ.get("SNIF_STATS_INTERVAL", 30.0))
+SHARD_DRAIN_TIMEOUT = float(os.environ.get("SNIF_SHARD_DRAIN_TIMEOUT", 15.0))  # seconds a worker may spend posting at exit
+
+log = logging.getLogger("pyshark_sniffer")
+
+# ring header: producer fields and consumer field live on separate cache lines
+_HEAD_OFF = 0      # uint64 frames written (producer)
+_DROPS_OFF = 8     # uint64 frames dropped because the ring was full (producer)
+_TAIL_OFF = 64     # uint64 frames consumed (consumer)
+_HDR_SIZE = 128
+_u64 = struct.Struct("<Q")
+_slot_hdr = struct.Struct("<dIH")   # ts, wire_len, caplen
+
+
+class ShmRing:
+    """Single-producer / single-consumer ring of fixed-size frame slots in shared memory."""
+
+    def __init__(self, slots=SHARD_RING_SLOTS, snaplen=SHARD_SNAPLEN):
+        if slots & (slots - 1):
+            raise ValueError("ring slots must be a power of two, got %d" % slots)
+        self.slots = slots
+        self.mask = slots - 1
+        self.snaplen = snaplen
+        self.slot_size = (_slot_hdr.size + snaplen + 7) & ~7
+        self.shm = shared_memory.SharedMemory(create=True, size=_HDR_SIZE + slots * self.slot_size)
+        self.buf = self.shm.buf
+        self.buf[:_HDR_SIZE] = bytes(_HDR_SIZE)
+        # producer-side cache of the consumer position (refreshed only when the ring looks full)
+        self._tail_cache = 0
+
+    def push(self, ts, wire_len, frame):
+        buf = self.buf
+        head = _u64.unpack_from(buf, _HEAD_OFF)[0]
+        if head - self._tail_cache >= self.slots:
+            self._tail_cache = _u64.unpack_from(buf, _TAIL_OFF)[0]
+            if head - self._tail_cache >= self.slots:
+                _u64.pack_into(buf, _DROPS_OFF, _u64.unpack_from(buf, _DROPS_OFF)[0] + 1)
+                return False
+        off = _HDR_SIZE + (head & self.mask) * self.slot_size
+        caplen = min(len(frame), self.snaplen)
+        _slot_hdr.pack_into(buf, off, ts, wire_len, caplen)
+        start = off + _slot_hdr.size
+        buf[start:start + caplen] = frame[:caplen]
+        # publish only after the slot is fully written
+        _u64.pack_into(buf, _HEAD_OFF, head + 1)
+        return True
+
+    def drain(self, handle, max_frames=4096):
+        """Call handle(ts, wire_len, frame_view) for up to max_frames pending frames."""
+        buf = self.buf
+        tail = _u64.unpack_from(buf, _TAIL_OFF)[0]
+        head = _u64.unpack_from(buf, _HEAD_OFF)[0]
+        n = min(head - tail, max_frames)
+        hs = _slot_hdr.size
+        for i in range(tail, tail + n):
+            off = _HDR_SIZE + (i & self.mask) * self.slot_size
+            ts, wire_len, caplen = _slot_hdr.unpack_from(buf, off)
+            handle(ts, wire_len, buf[off + hs:off + hs + caplen])
+        if n:
+            # release the slots only once they have been consumed
+            _u64.pack_into(buf, _TAIL_OFF, tail + n)
+        return n
+
+    def stats(self):
+        buf = self.buf
+        head = _u64.unpack_from(buf, _HEAD_OFF)[0]
+        return {"written": head, "depth": head - _u64.unpack_from(buf, _TAIL_OFF)[0],
+                "dropped": _u64.unpack_from(buf, _DROPS_OFF)[0]}
+
+    def close(self, unlink=False):
+        try:
+            self.buf.release()
+        except Exception:
+            pass
+        self.shm.close()
+        if unlink:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def worker_main(idx, ring, sniffer, linktype, bpf, stop):
+    # runs in a forked child: the sniffer module (and its config) is inherited, but its
+    # flow table is private to this worker and its threads are started fresh here
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    import threading
+    threading.Thread(target=sniffer.flush_idle_flows, daemon=True).start()
+    threading.Thread(target=sniffer.poster_loop, daemon=True).start()
+    wanted = rawcapture.make_proto_filter(bpf)
+    parse = rawcapture.parse_frame
+    ingest = sniffer.ingest_packet
+
+    def handle(ts, wire_len, frame):
+        rec = parse(frame, ts, wire_len, linktype)
+        if rec is not None and (wanted is None or rec["proto"] in wanted):
+            ingest(rec)
+
+    log.info("shard worker %d started (pid=%d)", idx, os.getpid())
+    idle = 0.0
+    while not stop.is_set():
+        if ring.drain(handle):
+            idle = 0.0
+        else:
+            # back off gently while the ring is empty
+            idle = min(0.005, idle + 0.0002)
+            time.sleep(idle)
+    ring.drain(handle, max_frames=ring.slots)
+    ring.close()
+    # flows still inside their active window would die with this process: emit them all
+    n = sniffer.flush_flows(sniffer.clock(), final=True)
+    if not sniffer.wait_posted(SHARD_DRAIN_TIMEOUT):
+        log.warning("shard worker %d: %d batches still unposted at exit", idx, sniffer.out_q.unfinished_tasks)
+    log.info("shard worker %d stopped (flushed %d flows at exit)", idx, n)
+
+
+def run_sharded(sniffer, frames, n_workers, linktype=rawcapture.LINKTYPE_ETHERNET, bpf=None):
+    """Fan frames out to n_workers processes by flow hash.
+
+    `frames` yields (ts, wire_len, frame) tuples (e.g. rawcapture.iter_af_packet_frames)
+    and `sniffer` is the packet_sniffer_pyshark module whose ingest/flush/post loops the
+    workers run. Blocks until `frames` is exhausted or KeyboardInterrupt.
+    """
+    ctx = multiprocessing.get_context("fork")
+    stop = ctx.Event()
+    rings = [ShmRing() for _ in range(n_workers)]
+    procs = []
+    for i, ring in enumerate(rings):
+        p = ctx.Process(target=worker_main, args=(i, ring, sniffer, linktype, bpf, stop),
+                        name="sniffer-shard-%d" % i, daemon=True)
+        p.start()
+        procs.append(p)
+    log.info("Sharded capture: %d workers, %d slots x %d bytes per ring", n_workers, rings[0].slots, rings[0].snaplen)
+
+    flow_hash = rawcapture.flow_hash
+    unparsed = 0
+    last_stats = time.time()
+    try:
+        for ts, wire_len, frame in frames:
+            h = flow_hash(frame, linktype)
+            if h < 0:
+                unparsed += 1
+                continue
+            rings[h % n_workers].push(ts, wire_len, frame)
+            if ts - last_stats >= SHARD_STATS_INTERVAL:
+                last_stats = ts
+                log.info("shard rings: %s (non-IP frames=%d)", [r.stats() for r in rings], unparsed)
+    except KeyboardInterrupt:
+        log.info("Stopping sharded capture (keyboard interrupt)")
+    finally:
+        stop.set()
+        for p in procs:
+            p.join(timeout=SHARD_DRAIN_TIMEOUT + 10.0)
+        log.info("shard rings at exit: %s", [r.stats() for r in rings])
+        for r in rings:
+            r.close(unlink=True)